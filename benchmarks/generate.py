@@ -0,0 +1,158 @@
+# SPDX-FileCopyrightText: 2024 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+generates synthetic PDF files for benchmarks
+The generated file has a title with a large font at the top of the first page
+and many lines of body text on every page. Pages are kept in a balanced page tree
+and content streams are compressed, like in the files produced by common tools.
+"""
+
+import argparse
+import zlib
+from typing import List
+
+
+TITLE = "A Synthetic Document for Benchmarking pdftitle"
+BODY_LINE = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod "
+    + "tempor incididunt ut labore"
+)
+
+
+def __page_content(page_number: int, lines: int, paths: int) -> bytes:
+    content = []
+    # vector graphics, like figures or maps, a grid of small rectangles
+    for i in range(paths):
+        content.append(f"{72 + (i % 40) * 12} {100 + (i // 40) % 50 * 12} 10 10 re f")
+
+    content.append("BT")
+    if page_number == 1:
+        content.append("/F1 24 Tf 72 740 Td")
+        content.append(f"({TITLE}) Tj")
+        content.append("/F1 10 Tf 0 -40 Td 12 TL")
+
+    else:
+        content.append("/F1 10 Tf 72 740 Td 12 TL")
+
+    for line in range(lines):
+        content.append(f"({BODY_LINE} {page_number}.{line}) Tj T*")
+
+    content.append("ET")
+    return "\n".join(content).encode("latin-1")
+
+
+# pylint: disable=too-many-locals
+def generate_pdf(
+    path: str, pages: int = 1, lines: int = 50, paths: int = 0, fanout: int = 16
+) -> None:
+    """
+    writes a PDF file with the given number of pages to path
+    every page has lines of text and paths number of filled rectangles
+    """
+    # objects are collected as bytes, object number is index + 1
+    objects: List[bytes] = []
+
+    def add(obj: bytes) -> int:
+        objects.append(obj)
+        return len(objects)
+
+    def stream(data: bytes) -> bytes:
+        compressed = zlib.compress(data)
+        return (
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(compressed)
+            + compressed
+            + b"\nendstream"
+        )
+
+    catalog = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    # pages are created first with placeholders, filled when parents are known
+    page_objs = []
+    page_contents = []
+    for page_number in range(1, pages + 1):
+        page_contents.append(add(stream(__page_content(page_number, lines, paths))))
+        page_objs.append(add(b""))
+
+    # build a balanced page tree bottom-up
+    level = page_objs
+    parents = {}
+    while True:
+        nodes = []
+        for i in range(0, len(level), fanout):
+            kids = level[i : i + fanout]
+            node = add(b"")
+            nodes.append(node)
+            for kid in kids:
+                parents[kid] = node
+
+        level = nodes
+        if len(level) == 1:
+            break
+
+    root = level[0]
+    # count of leaves of each node
+    counts = {page_obj: 1 for page_obj in page_objs}
+    children = {}
+    for kid, parent in parents.items():
+        children.setdefault(parent, []).append(kid)
+
+    def count(node: int) -> int:
+        if node not in counts:
+            counts[node] = sum(count(kid) for kid in children[node])
+        return counts[node]
+
+    for node, kids in children.items():
+        objects[node - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            b" ".join(b"%d 0 R" % kid for kid in kids),
+            count(node),
+        )
+
+    for page_obj, contents in zip(page_objs, page_contents):
+        objects[
+            page_obj - 1
+        ] = b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] " % parents[
+            page_obj
+        ] + b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (
+            font,
+            contents,
+        )
+
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % root
+
+    with open(path, "wb") as pdf_file:
+        pdf_file.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for objid, obj in enumerate(objects, start=1):
+            offsets.append(pdf_file.tell())
+            pdf_file.write(b"%d 0 obj\n" % objid + obj + b"\nendobj\n")
+
+        xref = pdf_file.tell()
+        pdf_file.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            pdf_file.write(b"%010d 00000 n \n" % offset)
+
+        pdf_file.write(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objects) + 1, catalog, xref)
+        )
+
+
+def run() -> None:
+    """run command line"""
+    parser = argparse.ArgumentParser(
+        description="generates a synthetic PDF file for benchmarks"
+    )
+    parser.add_argument("output", help="output pdf file")
+    parser.add_argument("--pages", type=int, default=1, help="number of pages")
+    parser.add_argument("--lines", type=int, default=50, help="text lines per page")
+    parser.add_argument(
+        "--paths", type=int, default=0, help="filled rectangles per page"
+    )
+    args = parser.parse_args()
+    generate_pdf(args.output, args.pages, args.lines, args.paths)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,63 @@
+# SPDX-FileCopyrightText: 2024 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+compares the latency of title extraction with and without resolving all objects
+Before v0.21, all objects were resolved (for logging) on every title extraction.
+"""
+
+import argparse
+import os
+import tempfile
+import timeit
+
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfparser import PDFParser
+
+from pdftitle import GetTitleParameters, get_title_from_file
+from pdftitle.pdftitle import iter_pdf_objects
+
+from generate import generate_pdf
+
+
+def __title_and_all_objects(pdf_file: str, params: GetTitleParameters) -> None:
+    # this is what every title extraction did before v0.21
+    with open(pdf_file, "rb") as file_reader:
+        for _ in iter_pdf_objects(PDFDocument(PDFParser(file_reader))):
+            pass
+
+    get_title_from_file(pdf_file, params)
+
+
+def run() -> None:
+    """run command line"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    params = GetTitleParameters()
+    print("pages  title only (ms)  title + all objects (ms)")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for pages in args.pages:
+            pdf_file = os.path.join(tmpdir, f"{pages}.pdf")
+            generate_pdf(pdf_file, pages)
+            title_only = min(
+                timeit.repeat(
+                    lambda f=pdf_file: get_title_from_file(f, params),
+                    number=1,
+                    repeat=args.repeat,
+                )
+            )
+            with_objects = min(
+                timeit.repeat(
+                    lambda f=pdf_file: __title_and_all_objects(f, params),
+                    number=1,
+                    repeat=args.repeat,
+                )
+            )
+            print(f"{pages:5d}  {title_only * 1000:15.1f}  {with_objects * 1000:24.1f}")
+
+
+if __name__ == "__main__":
+    run()
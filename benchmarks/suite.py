@@ -0,0 +1,304 @@
+# SPDX-FileCopyrightText: 2024 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+micro-benchmarks of the hot paths of title extraction
+The benchmarks run on the PDF files in cli_tests and on the files generated by
+generate.py. The results (seconds per call, the minimum of the repeats) are saved to a
+JSON file, and compare reports the benchmarks slower than the baseline by more than
+the threshold.
+
+  python suite.py run --output baseline.json
+  python suite.py compare baseline.json
+  python suite.py compare baseline.json current.json
+"""
+
+# the internal functions of pdftitle are measured
+# pylint: disable=protected-access
+
+import argparse
+import copy
+from importlib.metadata import version
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFResourceManager
+from pdfminer.pdfparser import PDFParser
+
+from pdftitle import pdftitle as core
+from pdftitle.device import TextOnlyDevice
+from pdftitle.interpreter import TextOnlyInterpreter
+from pdftitle.metadata import get_title_from_document_information_dictionary
+from pdftitle.metadata import get_title_from_metadata_stream
+from pdftitle.normalize import convert_ligatures
+from pdftitle.pagetree import get_page
+
+from generate import generate_pdf
+
+
+CLI_TESTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cli_tests")
+
+# the files to extract the titles from, generated files are added when running
+PDF_FILES = {
+    "knuth65": os.path.join(CLI_TESTS, "knuth65.pdf"),
+    "paran2010": os.path.join(CLI_TESTS, "paran2010.pdf"),
+    "why_does_social": os.path.join(CLI_TESTS, "why_does_social.pdf"),
+}
+
+# (name, generate_pdf arguments) of the generated files
+GENERATED_FILES = [
+    ("dense", {"pages": 1, "lines": 400}),
+    ("vector", {"pages": 1, "lines": 50, "paths": 20000}),
+]
+
+# the files with a title in the metadata
+METADATA_FILES = {
+    "metadata_stream": os.path.join(CLI_TESTS, "metadata-sample.pdf"),
+    "document_information_dictionary": os.path.join(CLI_TESTS, "did-utf16be.pdf"),
+}
+
+LIGATURES = "ﬀﬁﬂﬃﬄﬅﬆ"
+
+
+class RecordingDevice(TextOnlyDevice):
+    """TextOnlyDevice recording the arguments of process_string to replay them"""
+
+    def __init__(self, rsrcmgr):
+        super().__init__(rsrcmgr, " ", False)
+        self.strings = []
+
+    def process_string(self, ts, array):
+        # text state is changed by process_string, so a copy is recorded
+        self.strings.append((copy.copy(ts), list(array), self.ctm))
+        super().process_string(ts, array)
+
+
+def __read_file(pdf_file: str) -> bytes:
+    with open(pdf_file, "rb") as file_reader:
+        return file_reader.read()
+
+
+def __get_page(pdf_data: bytes):
+    return get_page(PDFDocument(PDFParser(io.BytesIO(pdf_data))), 1)
+
+
+def __process_page(pdf_data: bytes) -> Tuple[PDFResourceManager, RecordingDevice]:
+    resource_manager = PDFResourceManager()
+    device = RecordingDevice(resource_manager)
+    TextOnlyInterpreter(resource_manager, device).process_page(__get_page(pdf_data))
+    return (resource_manager, device)
+
+
+def __replay(resource_manager: PDFResourceManager, strings: list) -> None:
+    device = TextOnlyDevice(resource_manager, " ", False)
+    for ts, array, ctm in strings:
+        device.set_ctm(ctm)
+        device.process_string(copy.copy(ts), array)
+
+
+def __interpret(resource_manager: PDFResourceManager, page) -> None:
+    device = TextOnlyDevice(resource_manager, " ", False)
+    TextOnlyInterpreter(resource_manager, device).process_page(page)
+
+
+def __iter_benchmarks(
+    pdf_files: Dict[str, str],
+) -> Iterator[Tuple[str, Callable[[], object]]]:
+    # yields (name, function to measure)
+    for name, pdf_file in pdf_files.items():
+        pdf_data = __read_file(pdf_file)
+        (resource_manager, device) = __process_page(pdf_data)
+        # fonts are already in resource_manager, they are not created again
+        page = __get_page(pdf_data)
+        yield (
+            f"process_string/{name}",
+            lambda r=resource_manager, s=device.strings: __replay(r, s),
+        )
+        yield (
+            f"interpreter/{name}",
+            lambda r=resource_manager, p=page: __interpret(r, p),
+        )
+        yield (
+            f"algorithm/original/{name}",
+            lambda d=device: core.__get_title_by_original_algorithm(d),
+        )
+        yield (
+            f"algorithm/max2/{name}",
+            lambda d=device: core.__get_title_by_max2_algorithm(d),
+        )
+        yield (
+            f"algorithm/eliot/{name}",
+            lambda d=device: core.__get_title_by_eliot_algorithm(d, [0, 1]),
+        )
+        # the title without spaces in the text of the page, like get_title_from_doc
+        (title, title_blocks) = core.__get_title_by_original_algorithm(device)
+        page_text = core.__get_page_text(
+            resource_manager,
+            page,
+            core.__get_region(device.blocks, title_blocks),
+        )
+        yield (
+            f"retrieve_spaces/{name}",
+            lambda p=page_text, t=title.replace(" ", ""): core.__retrieve_spaces(p, t),
+        )
+
+    text = " ".join(f"{LIGATURES} {n} Signi{LIGATURES[1]}cant" for n in range(100))
+    yield ("convert_ligatures", lambda: convert_ligatures(text))
+
+    # a new document every time, pdfminer caches the resolved objects
+    pdf_data = __read_file(METADATA_FILES["metadata_stream"])
+    yield (
+        "metadata/metadata_stream",
+        lambda: get_title_from_metadata_stream(
+            PDFDocument(PDFParser(io.BytesIO(pdf_data)))
+        ),
+    )
+    pdf_data = __read_file(METADATA_FILES["document_information_dictionary"])
+    yield (
+        "metadata/document_information_dictionary",
+        lambda: get_title_from_document_information_dictionary(
+            PDFDocument(PDFParser(io.BytesIO(pdf_data)))
+        ),
+    )
+
+
+def __measure(func: Callable[[], object], repeat: int) -> float:
+    # seconds per call, calls are repeated to run at least 0.2 seconds
+    timer = timeit.Timer(func)
+    (number, _) = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def __run_benchmarks(args: argparse.Namespace, names: Optional[set] = None) -> dict:
+    # runs the benchmarks in names, or all (matching --filter) if names is None
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        pdf_files = dict(PDF_FILES)
+        for name, kwargs in GENERATED_FILES:
+            pdf_files[name] = os.path.join(tmpdir, f"{name}.pdf")
+            generate_pdf(pdf_files[name], **kwargs)
+
+        for name, func in __iter_benchmarks(pdf_files):
+            if args.filter is not None and args.filter not in name:
+                continue
+
+            if names is not None and name not in names:
+                continue
+
+            results[name] = __measure(func, args.repeat)
+            print(f"{name:50s} {results[name] * 1e6:12.1f} us", file=sys.stderr)
+
+    return {
+        "python": platform.python_version(),
+        "pdfminer.six": version("pdfminer.six"),
+        "pdftitle": version("pdftitle"),
+        "results": results,
+    }
+
+
+def __get_slower(baseline: dict, current: dict, threshold: float) -> set:
+    # returns the names of the benchmarks slower than the baseline
+    slower = set()
+    for name, baseline_time in baseline["results"].items():
+        current_time = current["results"].get(name)
+        if current_time is not None and current_time > baseline_time * (
+            1 + threshold / 100
+        ):
+            slower.add(name)
+
+    return slower
+
+
+def __compare(baseline: dict, current: dict, threshold: float) -> int:
+    # returns the number of regressions
+    regressions = 0
+    print(f"{'benchmark':50s} {'baseline':>12s} {'current':>12s} {'change':>8s}")
+    for name, baseline_time in baseline["results"].items():
+        current_time = current["results"].get(name)
+        if current_time is None:
+            print(f"{name:50s} {baseline_time * 1e6:12.1f} {'-':>12s}")
+            continue
+
+        change = (current_time - baseline_time) / baseline_time * 100
+        regression = change > threshold
+        regressions = regressions + (1 if regression else 0)
+        print(
+            f"{name:50s} {baseline_time * 1e6:12.1f} {current_time * 1e6:12.1f} "
+            + f"{change:+7.1f}%"
+            + (" REGRESSION" if regression else "")
+        )
+
+    return regressions
+
+
+def run() -> int:
+    """run command line"""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", help="run the benchmarks with this in the name")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--output", help="save the results to this JSON file")
+    compare_parser = commands.add_parser(
+        "compare",
+        help="compare the results with the baseline, "
+        + "the benchmarks are run if the results are not given",
+    )
+    compare_parser.add_argument("baseline", help="JSON file of the baseline")
+    compare_parser.add_argument("current", nargs="?", help="JSON file of the results")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10,
+        help="slower than the baseline by more than this is a regression "
+        + "(percent, default is 10)",
+    )
+    args = parser.parse_args()
+    if args.command == "run":
+        results = __run_benchmarks(args)
+        if args.output is not None:
+            with open(args.output, "w", encoding="utf-8") as file_writer:
+                json.dump(results, file_writer, indent=2)
+
+        else:
+            json.dump(results, sys.stdout, indent=2)
+
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as file_reader:
+        baseline = json.load(file_reader)
+
+    if args.current is None:
+        current = __run_benchmarks(args)
+        # the results are noisy on a busy machine, so the slower benchmarks are run
+        # again and the faster result is used
+        slower = __get_slower(baseline, current, args.threshold)
+        if len(slower) > 0:
+            print(f"running {len(slower)} slower benchmarks again", file=sys.stderr)
+            for name, result in __run_benchmarks(args, slower)["results"].items():
+                current["results"][name] = min(current["results"][name], result)
+
+    else:
+        with open(args.current, encoding="utf-8") as file_reader:
+            current = json.load(file_reader)
+
+    regressions = __compare(baseline, current, args.threshold)
+    if regressions > 0:
+        print(f"{regressions} regressions", file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
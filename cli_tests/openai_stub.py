@@ -0,0 +1,327 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+a local stub of the OpenAI API endpoints used by pdftitle, for the cli tests
+The client is pointed to it with OPENAI_BASE_URL=http://127.0.0.1:PORT/v1, the
+port is printed when the server is started. Every request is appended to the log
+file as a line of its method and path.
+
+usage: python openai_stub.py LOG_FILE
+
+Batch API: a batch is in_progress when it is retrieved the first time, then it
+is completed. The title of a request is "Stub Title CUSTOM_ID", except that the
+requests of custom_id 1 are failed and written to the error file. These exist
+when the server is started, to continue a job (the input files have a request
+of custom_id 0):
+- the batch batch_resume of the input file file_resume_input
+- the batch batch_unsaved of the input file file_unsaved_input
+- the input file file_uploaded (pdftitle.batch.uploaded.0.jsonl) with no batch
+
+Chat completions: every other request (the first, the third etc.) is rate limited,
+it is responded with 429 and retry-after-ms header, the others are responded with
+the title "Stub Title".
+"""
+
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import sys
+import threading
+import time
+
+
+# a request of custom_id 0
+INPUT = (
+    json.dumps(
+        {"custom_id": "0", "method": "POST", "url": "/v1/chat/completions", "body": {}}
+    ).encode("utf-8")
+    + b"\n"
+)
+# file id to (file object, content)
+FILES = {
+    file_id: (
+        {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(INPUT),
+            "created_at": 0,
+            "filename": filename,
+            "purpose": "batch",
+            "status": "processed",
+        },
+        INPUT,
+    )
+    for file_id, filename in (
+        ("file_resume_input", "pdftitle.batch.resume.0.jsonl"),
+        ("file_unsaved_input", "pdftitle.batch.unsaved.0.jsonl"),
+        ("file_uploaded", "pdftitle.batch.uploaded.0.jsonl"),
+    )
+}
+BATCHES = {
+    batch_id: {
+        "id": batch_id,
+        "object": "batch",
+        "endpoint": "/v1/chat/completions",
+        "input_file_id": input_file_id,
+        "completion_window": "24h",
+        "status": "in_progress",
+        "created_at": 0,
+        "output_file_id": None,
+        "error_file_id": None,
+    }
+    for batch_id, input_file_id in (
+        ("batch_resume", "file_resume_input"),
+        ("batch_unsaved", "file_unsaved_input"),
+    )
+}
+LOCK = threading.Lock()
+IDS = itertools.count()
+# the number of the chat completion requests
+COMPLETIONS = itertools.count()
+# the client waits this many milliseconds before retrying a rate limited request
+RETRY_AFTER_MS = 500
+
+
+def get_completion(title: str) -> dict:
+    """returns a chat completion of title"""
+    return {
+        "id": f"chatcmpl_{next(IDS)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "gpt-4o-mini",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": title},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    }
+
+
+def put_file(content: bytes, filename: str, purpose: str) -> dict:
+    """stores a file, returns its file object"""
+    file_id = f"file_{next(IDS)}"
+    file_object = {
+        "id": file_id,
+        "object": "file",
+        "bytes": len(content),
+        "created_at": int(time.time()),
+        "filename": filename,
+        "purpose": purpose,
+        "status": "processed",
+    }
+    FILES[file_id] = (file_object, content)
+    return file_object
+
+
+def get_list(objects: list) -> dict:
+    """returns a list response (a single page) of objects"""
+    return {
+        "object": "list",
+        "data": objects,
+        "first_id": objects[0]["id"] if len(objects) > 0 else None,
+        "last_id": objects[-1]["id"] if len(objects) > 0 else None,
+        "has_more": False,
+    }
+
+
+def complete_batch(batch: dict) -> None:
+    """completes batch, its output and error files are created"""
+    output = []
+    errors = []
+    for line in FILES[batch["input_file_id"]][1].decode("utf-8").splitlines():
+        custom_id = json.loads(line)["custom_id"]
+        if custom_id == "1":
+            error = {"code": "stub_error", "message": "stub error"}
+            errors.append({"custom_id": custom_id, "response": None, "error": error})
+
+        else:
+            response = {
+                "status_code": 200,
+                "request_id": f"req_{next(IDS)}",
+                "body": get_completion(f"Stub Title {custom_id}"),
+            }
+            output.append({"custom_id": custom_id, "response": response})
+
+    for records, name in ((output, "output_file_id"), (errors, "error_file_id")):
+        if len(records) > 0:
+            content = "".join(json.dumps(record) + "\n" for record in records)
+            batch[name] = put_file(
+                content.encode("utf-8"), f"{batch['id']}_{name}.jsonl", "batch_output"
+            )["id"]
+
+    batch["status"] = "completed"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """handles the requests of the OpenAI client"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def __send(self, status: int, body, headers=None) -> None:
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode("utf-8")
+            content_type = "application/json"
+
+        else:
+            content_type = "application/octet-stream"
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+
+        self.end_headers()
+        self.wfile.write(body)
+
+    def __read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def __log(self, path: str) -> None:
+        with LOCK:
+            with open(sys.argv[1], "a", encoding="utf-8") as log_file:
+                log_file.write(f"{self.command} {path}\n")
+
+    def __path(self) -> list:
+        # the query is not used, e.g. the files are listed with purpose=batch
+        path = self.path.split("?")[0]
+        if path.startswith("/v1/"):
+            path = path[3:]
+
+        self.__log(path)
+        return path.strip("/").split("/")
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """lists or retrieves the batches, lists the files or gets their content"""
+        path = self.__path()
+        with LOCK:
+            if path == ["batches"]:
+                # the newest first
+                batches = sorted(
+                    BATCHES.values(), key=lambda batch: -batch["created_at"]
+                )
+                self.__send(
+                    200,
+                    get_list(
+                        [
+                            {k: v for k, v in batch.items() if k != "polled"}
+                            for batch in batches
+                        ]
+                    ),
+                )
+                return
+
+            if path == ["files"]:
+                self.__send(
+                    200, get_list([file_object for file_object, _ in FILES.values()])
+                )
+                return
+
+            if len(path) == 2 and path[0] == "batches" and path[1] in BATCHES:
+                batch = BATCHES[path[1]]
+                if batch["status"] == "in_progress" and batch.get("polled"):
+                    complete_batch(batch)
+
+                batch["polled"] = True
+                self.__send(200, {k: v for k, v in batch.items() if k != "polled"})
+                return
+
+            if len(path) == 3 and path[0] == "files" and path[1] in FILES:
+                self.__send(200, FILES[path[1]][1])
+                return
+
+        self.__send(404, {"error": {"message": "not found", "type": "not_found"}})
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """uploads a file, creates a batch or a chat completion"""
+        path = self.__path()
+        body = self.__read_body()
+        with LOCK:
+            if path == ["files"]:
+                message = BytesParser(policy=HTTP).parsebytes(
+                    b"Content-Type: "
+                    + self.headers["Content-Type"].encode("ascii")
+                    + b"\r\n\r\n"
+                    + body
+                )
+                fields = {
+                    part.get_param("name", header="content-disposition"): part
+                    for part in message.iter_parts()
+                }
+                self.__send(
+                    200,
+                    put_file(
+                        fields["file"].get_payload(decode=True),
+                        fields["file"].get_filename(),
+                        fields["purpose"].get_content().strip(),
+                    ),
+                )
+                return
+
+            if path == ["chat", "completions"]:
+                if next(COMPLETIONS) % 2 == 0:
+                    error = {
+                        "message": "rate limit reached",
+                        "type": "requests",
+                        "code": "rate_limit_exceeded",
+                    }
+                    self.__send(
+                        429,
+                        {"error": error},
+                        {"retry-after-ms": str(RETRY_AFTER_MS)},
+                    )
+                    return
+
+                self.__send(200, get_completion("Stub Title"))
+                return
+
+            if path == ["batches"]:
+                request = json.loads(body)
+                batch_id = f"batch_{next(IDS)}"
+                BATCHES[batch_id] = {
+                    "id": batch_id,
+                    "object": "batch",
+                    "endpoint": request["endpoint"],
+                    "input_file_id": request["input_file_id"],
+                    "completion_window": request["completion_window"],
+                    "status": "in_progress",
+                    "created_at": int(time.time()),
+                    "output_file_id": None,
+                    "error_file_id": None,
+                }
+                self.__send(200, BATCHES[batch_id])
+                return
+
+        self.__send(404, {"error": {"message": "not found", "type": "not_found"}})
+
+    def do_DELETE(self):  # pylint: disable=invalid-name
+        """deletes a file"""
+        path = self.__path()
+        with LOCK:
+            if len(path) == 2 and path[0] == "files" and path[1] in FILES:
+                del FILES[path[1]]
+                self.__send(200, {"id": path[1], "object": "file", "deleted": True})
+                return
+
+        self.__send(404, {"error": {"message": "not found", "type": "not_found"}})
+
+
+def main():
+    """starts the server and prints its port"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    print(server.server_address[1], flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/bin/bash
+echo "testing: asyncio api"
+python - <<'EOF' || exit 1
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import io
+import threading
+import time
+
+import pdftitle
+from pdftitle import async_api
+
+KNUTH = "On the Translation of Languages from Left to Right"
+WHY = "WhyDoesSocialExclusionHurt?TheRelationshipBetweenSocialandPhysicalPain"
+params = pdftitle.GetTitleParameters()
+with open("knuth65.pdf", "rb") as pdf_file:
+    knuth_data = pdf_file.read()
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    # records the maximum number of calls running at the same time
+    def __init__(self):
+        super().__init__(max_workers=8)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def submit(self, fn, *args, **kwargs):
+        def counted():
+            with self.lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            try:
+                time.sleep(0.05)
+                return fn(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.running -= 1
+
+        return super().submit(counted)
+
+
+class RecordingExecutor(ProcessPoolExecutor):
+    # records the types of the arguments sent to the worker processes
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.arg_types = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.arg_types.append(type(args[0]))
+        return super().submit(fn, *args, **kwargs)
+
+
+async def main():
+    title = await pdftitle.get_title_from_file_async("knuth65.pdf", params)
+    assert title == KNUTH, title
+
+    with open("knuth65.pdf", "rb") as pdf_file:
+        title = await pdftitle.get_title_from_io_async(pdf_file, params)
+    assert title == KNUTH, title
+
+    title = await pdftitle.get_title_from_io_async(io.BytesIO(knuth_data), params)
+    assert title == KNUTH, title
+
+    # bounded concurrency
+    files = ["knuth65.pdf", "why_does_social.pdf", "does-not-exist.pdf"] * 3
+    with CountingExecutor() as executor:
+        results = [
+            result
+            async for result in pdftitle.get_titles_from_files_async(
+                files, params, executor=executor, max_concurrency=2
+            )
+        ]
+        assert executor.max_running == 2, executor.max_running
+    assert len(results) == len(files)
+    titles = sorted(str(result.title) for result in results)
+    assert titles == sorted([KNUTH, WHY, "None"] * 3), titles
+    assert all(
+        result.error_class is not None
+        for result in results
+        if result.path == "does-not-exist.pdf"
+    )
+
+    # cancellation when the caller stops early
+    with CountingExecutor() as executor:
+        results = pdftitle.get_titles_from_files_async(
+            ["knuth65.pdf"] * 8, params, executor=executor, max_concurrency=4
+        )
+        async for result in results:
+            assert result.title == KNUTH
+            break
+        # the cancelled tasks are finished when aclose returns
+        await results.aclose()
+        others = [
+            task for task in asyncio.all_tasks() if task is not asyncio.current_task()
+        ]
+        assert all(task.done() for task in others), others
+
+    # custom (process) executor gets the paths, not the content of the files
+    with RecordingExecutor() as executor:
+        title = await pdftitle.get_title_from_file_async(
+            "knuth65.pdf", params, executor=executor
+        )
+        assert title == KNUTH, title
+        with open("knuth65.pdf", "rb") as pdf_file:
+            title = await pdftitle.get_title_from_io_async(
+                pdf_file, params, executor=executor
+            )
+        assert title == KNUTH, title
+        async for result in pdftitle.get_titles_from_files_async(
+            ["knuth65.pdf", "why_does_social.pdf"], params, executor=executor
+        ):
+            assert result.title in (KNUTH, WHY), result
+        assert executor.arg_types == [str] * 4, executor.arg_types
+
+    # the file is uploaded to OpenAI from an open file, not read at once
+    uploaded = []
+
+    async def get_title_from_openai_async(pdf_data, *args):
+        uploaded.append(pdf_data)
+        if not isinstance(pdf_data, bytes):
+            assert not pdf_data.closed
+            pdf_data = pdf_data.read()
+        assert pdf_data == knuth_data
+        return KNUTH
+
+    async_api.get_title_from_openai_async = get_title_from_openai_async
+    openai_params = pdftitle.GetTitleParameters(algorithm="openai")
+    title = await pdftitle.get_title_from_file_async("knuth65.pdf", openai_params)
+    assert title == KNUTH, title
+    assert isinstance(uploaded[0], io.BufferedReader) and uploaded[0].closed, uploaded
+    # the content is uploaded if it is already read
+    title = await pdftitle.get_title_from_io_async(
+        io.BytesIO(knuth_data), openai_params
+    )
+    assert title == KNUTH, title
+    assert isinstance(uploaded[1], bytes), uploaded
+
+
+asyncio.run(main())
+print("ok")
+EOF
+exit 0
@@ -0,0 +1,22 @@
+#!/bin/bash
+echo "testing: pdftitle -b knuth65.pdf why_does_social.pdf does-not-exist.pdf -j 2"
+output=$(pdftitle -b knuth65.pdf why_does_social.pdf does-not-exist.pdf -j 2)
+# one of the files does not exist, so the batch should fail
+if [ $? -eq 0 ]; then
+  exit 1
+fi
+# results are printed as they complete, so sort them
+output=$(echo "$output" | sort)
+echo "$output"
+expected=$(printf "knuth65.pdf\tOn the Translation of Languages from Left to Right\nwhy_does_social.pdf\tWhyDoesSocialExclusionHurt?TheRelationshipBetweenSocialandPhysicalPain")
+if [ ! "$output" = "$expected" ]; then
+  exit 1
+fi
+echo "testing: pdftitle -b knuth65.pdf -j 0"
+output=$(pdftitle -b knuth65.pdf -j 0 2>&1)
+# an argument error (2), not a traceback
+if [ $? -ne 2 ] || echo "$output" | grep -q Traceback; then
+  echo "$output"
+  exit 1
+fi
+exit 0
@@ -0,0 +1,41 @@
+#!/bin/bash
+echo "testing: pdftitle -p knuth65.pdf --max-text-depth 0.2"
+title=$(pdftitle -p knuth65.pdf --max-text-depth 0.2)
+if [ $? -eq 0 ]; then
+  echo "\"$title\""
+  if [ ! "$title" = "On the Translation of Languages from Left to Right" ]; then
+    exit 1
+  fi
+else
+  exit 1
+fi
+echo "testing: pdftitle -p woo2019.pdf --replace-missing-char x --max-text-depth 0.15"
+# a glyph below the depth is drawn first, it is skipped and the text above is found
+title=$(pdftitle -p woo2019.pdf --replace-missing-char x --max-text-depth 0.15)
+if [ $? -eq 0 ]; then
+  echo "\"$title\""
+  if [ ! "$title" = "JOURNAL OF MEDICINAL FOOD" ]; then
+    exit 1
+  fi
+else
+  exit 1
+fi
+echo "testing: pdftitle -p knuth65.pdf --max-text-depth 0"
+# every glyph is skipped
+if pdftitle -p knuth65.pdf --max-text-depth 0 2>&1 >/dev/null |
+  grep -q "no text found within the extraction budget"; then
+  :
+else
+  exit 1
+fi
+echo "testing: pdftitle -p knuth65.pdf --max-glyphs 60"
+title=$(pdftitle -p knuth65.pdf --max-glyphs 60)
+if [ $? -eq 0 ]; then
+  echo "\"$title\""
+  if [ ! "$title" = "On the Translation" ]; then
+    exit 1
+  fi
+  exit 0
+else
+  exit 1
+fi
@@ -0,0 +1,63 @@
+#!/bin/bash
+echo "testing: get_title_from_bytes and open_pdf_file"
+python - <<'EOF' || exit 1
+import io
+import mmap
+
+import pdftitle
+from pdftitle import buffer
+
+KNUTH = "On the Translation of Languages from Left to Right"
+params = pdftitle.GetTitleParameters()
+
+with open("knuth65.pdf", "rb") as pdf_file:
+    pdf_data = pdf_file.read()
+
+for data in (pdf_data, bytearray(pdf_data), memoryview(pdf_data)):
+    title = pdftitle.get_title_from_bytes(data, params)
+    assert title == KNUTH, (type(data), title)
+
+# the buffer is released, so the bytearray can be resized
+data = bytearray(pdf_data)
+assert pdftitle.get_title_from_bytes(data, params) == KNUTH
+data.extend(b"\n")
+
+# the maps created by open_pdf_file are closed
+maps = []
+
+
+class RecordingMap(mmap.mmap):
+    def __new__(cls, *args, **kwargs):
+        file_map = super().__new__(cls, *args, **kwargs)
+        maps.append(file_map)
+        return file_map
+
+
+buffer.mmap.mmap = RecordingMap
+assert pdftitle.get_title_from_file("knuth65.pdf", params) == KNUTH
+assert len(maps) == 1 and maps[0].closed, maps
+
+# small files and use_mmap=False are not mapped
+assert len(pdf_data) >= buffer.MMAP_MIN_SIZE
+with buffer.open_pdf_file("knuth65.pdf") as file_reader:
+    assert isinstance(file_reader, buffer.BufferReader), file_reader
+with buffer.open_pdf_file("knuth65.pdf", use_mmap=False) as file_reader:
+    assert isinstance(file_reader, io.BufferedReader), file_reader
+with buffer.open_pdf_file("metadata-sample.pdf") as file_reader:
+    assert isinstance(file_reader, io.BufferedReader), file_reader
+assert len(maps) == 2 and maps[1].closed, maps
+
+# a map is closed also when the extraction fails
+try:
+    with buffer.open_pdf_file("knuth65.pdf") as file_reader:
+        raise RuntimeError()
+except RuntimeError:
+    pass
+assert len(maps) == 3 and maps[2].closed, maps
+
+# batch mode does not map the files
+results = list(pdftitle.get_titles_from_files(["knuth65.pdf"], params, jobs=1))
+assert results[0].title == KNUTH, results
+assert len(maps) == 3, maps
+EOF
+exit 0
@@ -0,0 +1,21 @@
+#!/bin/bash
+cache_file=$(mktemp -u)
+trap 'rm -f "$cache_file"' EXIT
+echo "testing: pdftitle -p knuth65.pdf --cache CACHE_FILE"
+output=$(pdftitle -p knuth65.pdf --cache "$cache_file")
+echo "$output"
+if [ ! "$output" = "On the Translation of Languages from Left to Right" ]; then
+  exit 1
+fi
+# the second time, the title should be found in the cache
+output=$(pdftitle -p knuth65.pdf --cache "$cache_file" -v 2>&1)
+if ! echo "$output" | grep -q "title found in the cache"; then
+  exit 1
+fi
+echo "testing: pdftitle --cache CACHE_FILE --cache-clear"
+pdftitle --cache "$cache_file" --cache-clear || exit 1
+output=$(pdftitle -p knuth65.pdf --cache "$cache_file" -v 2>&1)
+if echo "$output" | grep -q "title found in the cache"; then
+  exit 1
+fi
+exit 0
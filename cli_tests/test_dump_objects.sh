@@ -0,0 +1,9 @@
+#!/bin/bash
+echo "testing: pdftitle -p knuth65.pdf --dump-objects"
+catalog=$(pdftitle -p knuth65.pdf --dump-objects | grep "^pdfobj 713: /'Catalog'")
+if [ $? -eq 0 ]; then
+  echo "\"$catalog\""
+  exit 0
+else
+  exit 1
+fi
@@ -0,0 +1,22 @@
+#!/bin/bash
+echo "testing: pdftitle -b knuth65.pdf knuth65.pdf why_does_social.pdf -j 1 --font-cache-size 8"
+output=$(pdftitle -b knuth65.pdf knuth65.pdf why_does_social.pdf -j 1 --font-cache-size 8)
+if [ $? -ne 0 ]; then
+  exit 1
+fi
+echo "$output"
+# the fonts of knuth65.pdf are reused for the second file
+expected=$(printf "knuth65.pdf\tOn the Translation of Languages from Left to Right\nknuth65.pdf\tOn the Translation of Languages from Left to Right\nwhy_does_social.pdf\tWhyDoesSocialExclusionHurt?TheRelationshipBetweenSocialandPhysicalPain")
+if [ ! "$output" = "$expected" ]; then
+  exit 1
+fi
+echo "testing: pdftitle -b why_does_social.pdf why_does_social.pdf -j 1 --font-cache-size 8 -vv"
+log=$(pdftitle -b why_does_social.pdf why_does_social.pdf -j 1 --font-cache-size 8 -vv 2>&1 >/dev/null)
+created=$(echo "$log" | grep -c "creating font")
+found=$(echo "$log" | grep -c "found in the cache")
+echo "fonts created: $created, found in the cache: $found"
+# the fonts are created for the first file and found in the cache for the second
+if [ "$created" -eq 0 ] || [ "$found" -lt "$created" ]; then
+  exit 1
+fi
+exit 0
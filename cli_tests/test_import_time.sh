@@ -0,0 +1,30 @@
+#!/bin/bash
+# the modules not needed are not imported (PYTHONPROFILEIMPORTTIME=1 is the same as
+# python -X importtime), the import time of pdftitle is printed for information
+check_imports() {
+  imports=$(PYTHONPROFILEIMPORTTIME=1 pdftitle "$@" 2>&1 >/dev/null)
+  echo "$imports" | grep -E "\| pdftitle$"
+  for module in $unexpected_modules; do
+    if echo "$imports" | grep -qE "\| +$module$"; then
+      echo "$module is imported"
+      return 1
+    fi
+  done
+  return 0
+}
+echo "testing: pdftitle --version"
+unexpected_modules="pdfminer pdftitle.batch pdftitle.async_api pdftitle.openai_gateway pdftitle.cache sqlite3"
+if ! check_imports --version; then
+  exit 1
+fi
+echo "testing: pdftitle -p metadata-sample.pdf --use-metadata-stream"
+unexpected_modules="pdfminer.layout pdfminer.converter pdfminer.pdfinterp pdftitle.device pdftitle.interpreter pdftitle.openai_gateway pdftitle.cache sqlite3 asyncio multiprocessing"
+if ! check_imports -p metadata-sample.pdf --use-metadata-stream; then
+  exit 1
+fi
+echo "testing: pdftitle -p knuth65.pdf"
+unexpected_modules="pdftitle.openai_gateway asyncio multiprocessing"
+if ! check_imports -p knuth65.pdf; then
+  exit 1
+fi
+exit 0
@@ -0,0 +1,35 @@
+#!/bin/bash
+echo "testing: pdftitle -p knuth65.pdf --format jsonl"
+output=$(pdftitle -p knuth65.pdf --format jsonl)
+echo "$output"
+if ! echo "$output" | grep -q '^{"path": "knuth65.pdf", "title": "On the Translation of Languages from Left to Right", "source": "original", "page": 1, "elapsed": [0-9.e-]*, "error_class": null, "error": null}$'; then
+  exit 1
+fi
+echo "testing: pdftitle -b knuth65.pdf metadata-sample.pdf missing.pdf -m --format jsonl"
+output=$(pdftitle -b knuth65.pdf metadata-sample.pdf missing.pdf -m --format jsonl -j 2)
+retval=$?
+echo "$output"
+# a record per file, and the result is 1 because of missing.pdf
+if [ $retval -ne 1 ] || [ $(echo "$output" | wc -l) -ne 3 ]; then
+  exit 1
+fi
+if ! echo "$output" | grep -q '"path": "metadata-sample.pdf", "title": "PDF Metadata Sample", "source": "metadata_stream", "page": null'; then
+  exit 1
+fi
+if ! echo "$output" | grep -q '"path": "missing.pdf", "title": null, .*"error_class": "FileNotFoundError"'; then
+  exit 1
+fi
+echo "testing: pdftitle -p knuth65.pdf --format jsonl --timings"
+output=$(pdftitle -p knuth65.pdf --format jsonl --timings)
+echo "$output"
+if ! echo "$output" | grep -q '"timings": {"open": \[.*"interpretation": \[.*"counters": {"operators": [0-9]*, "glyphs": [0-9]*'; then
+  exit 1
+fi
+echo "testing: pdftitle -p missing.pdf --format jsonl --timings"
+output=$(pdftitle -p missing.pdf --format jsonl --timings)
+echo "$output"
+# the timings and the counters of an error have the same shape
+if ! echo "$output" | grep -q '"timings": {}, "counters": {}'; then
+  exit 1
+fi
+exit 0
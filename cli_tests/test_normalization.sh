@@ -0,0 +1,31 @@
+#!/bin/bash
+cache_file=$(mktemp -u)
+trap 'rm -f "$cache_file"' EXIT
+echo "testing: pdftitle -p knuth65.pdf --collapse-whitespace --fold-compatibility"
+title=$(pdftitle -p knuth65.pdf --collapse-whitespace --fold-compatibility)
+echo "\"$title\""
+if [ ! "$title" = "On the Translation of Languages from Left to Right" ]; then
+  exit 1
+fi
+# the title is normalized before it is cached, so -t should not use the title
+# cached without -t
+echo "testing: pdftitle -p knuth65.pdf -t --cache CACHE_FILE"
+pdftitle -p knuth65.pdf --cache "$cache_file" > /dev/null || exit 1
+title=$(pdftitle -p knuth65.pdf -t --cache "$cache_file")
+echo "\"$title\""
+if [ ! "$title" = "On The Translation Of Languages From Left To Right" ]; then
+  exit 1
+fi
+echo "testing: pdftitle -p knuth65.pdf -t --format jsonl"
+output=$(pdftitle -p knuth65.pdf -t --format jsonl)
+echo "$output"
+if ! echo "$output" | grep -q '"title": "On The Translation Of Languages From Left To Right"'; then
+  exit 1
+fi
+echo "testing: from pdftitle.pdftitle import convert_ligatures"
+python - <<'EOF' || exit 1
+from pdftitle.pdftitle import convert_ligatures
+
+assert convert_ligatures("\ufb01nal e\ufb00ect") == "final effect"
+EOF
+exit 0
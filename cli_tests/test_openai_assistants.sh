@@ -0,0 +1,50 @@
+#!/bin/bash
+# OpenAI is not used, the client deleting the assistants is replaced
+echo "testing: assistants are deleted by the process created them, also after fork"
+deleted_dir=$(mktemp -d)
+trap 'rm -rf "$deleted_dir"' EXIT
+DELETED_DIR="$deleted_dir" python - <<'EOF' || exit 1
+import os
+import sys
+
+from pdftitle import openai_gateway
+
+deleted_dir = os.environ["DELETED_DIR"]
+
+
+class FakeAssistants:
+    def delete(self, assistant_id):
+        with open(os.path.join(deleted_dir, str(os.getpid())), "a") as deleted_file:
+            deleted_file.write(assistant_id + "\n")
+
+
+class FakeClient:
+    class beta:
+        assistants = FakeAssistants()
+
+
+openai_gateway.get_openai_client = FakeClient
+put_assistant = getattr(openai_gateway, "__put_assistant")
+put_assistant("parent-model", "parent-assistant")
+
+pid = os.fork()
+if pid == 0:
+    # the assistant of the parent is reused
+    assert put_assistant("parent-model", "other") == "parent-assistant"
+    put_assistant("child-model", "child-assistant")
+    # finalizers are run at exit
+    sys.exit(0)
+
+(_, status) = os.waitpid(pid, 0)
+assert status == 0, status
+with open(os.path.join(deleted_dir, str(pid))) as deleted_file:
+    deleted = deleted_file.read().split()
+assert deleted == ["child-assistant"], deleted
+EOF
+# the parent deletes only its assistant when it exits
+deleted=$(cat "$deleted_dir"/* | sort | tr '\n' ' ')
+echo "$deleted"
+if [ ! "$deleted" = "child-assistant parent-assistant " ]; then
+  exit 1
+fi
+exit 0
@@ -0,0 +1,131 @@
+#!/bin/bash
+# the batch jobs are tested with a local stub of OpenAI (openai_stub.py)
+echo "testing: pdftitle -p knuth65.pdf -a openai --openai-batch STATE_FILE"
+if pdftitle -p knuth65.pdf -a openai --openai-batch state.json 2>/dev/null; then
+  exit 1
+fi
+echo "testing: pdftitle -b knuth65.pdf --openai-batch STATE_FILE"
+if pdftitle -b knuth65.pdf --openai-batch state.json 2>/dev/null; then
+  exit 1
+fi
+if [ -e state.json ]; then
+  exit 1
+fi
+if ! python -c "import openai" 2>/dev/null; then
+  echo "openai is not installed, the batch jobs are not tested"
+  exit 0
+fi
+stub_dir=$(mktemp -d)
+python openai_stub.py "$stub_dir/log" > "$stub_dir/port" &
+stub_pid=$!
+trap 'kill $stub_pid; rm -rf "$stub_dir"' EXIT
+for _ in $(seq 50); do
+  [ -s "$stub_dir/port" ] && break
+  sleep 0.1
+done
+export OPENAI_BASE_URL="http://127.0.0.1:$(cat "$stub_dir/port")/v1"
+export OPENAI_API_KEY=stub
+# count_requests METHOD PATH_REGEX
+count_requests() {
+  grep -c "^$1 $2\$" "$stub_dir/log"
+}
+echo "testing: pdftitle -b knuth65.pdf why_does_social.pdf -a openai --openai-batch STATE_FILE"
+output=$(pdftitle -b knuth65.pdf why_does_social.pdf -a openai -j 1 \
+  --openai-batch "$stub_dir/state.json" --openai-batch-interval 0.1 2>&1)
+# the request of why_does_social.pdf is failed by the stub
+if [ $? -eq 0 ]; then
+  exit 1
+fi
+echo "$output"
+expected=$(printf "knuth65.pdf\tStub Title 0\nwhy_does_social.pdf: OpenAIError: stub error")
+if [ ! "$output" = "$expected" ]; then
+  exit 1
+fi
+# submitted, polled until completed, the results are read and the files deleted
+if [ "$(count_requests POST /files)" -ne 1 ] ||
+  [ "$(count_requests POST /batches)" -ne 1 ] ||
+  [ "$(count_requests GET "/batches/[a-z_0-9]*")" -ne 2 ] ||
+  [ "$(count_requests GET "/files/[a-z_0-9]*/content")" -ne 2 ] ||
+  [ "$(count_requests DELETE "/files/[a-z_0-9]*")" -ne 3 ]; then
+  cat "$stub_dir/log"
+  exit 1
+fi
+# the job is done, running it again does not send any request
+: > "$stub_dir/log"
+output=$(pdftitle -b knuth65.pdf -a openai --openai-batch "$stub_dir/state.json")
+if [ ! "$output" = "$(printf "knuth65.pdf\tStub Title 0")" ] || [ -s "$stub_dir/log" ]; then
+  exit 1
+fi
+# write_state STATE_FILE BATCH, the state of a job of knuth65.pdf interrupted
+# when BATCH (the state of the batch without its requests) is saved
+write_state() {
+  cat > "$1" <<EOF
+{"model": "gpt-4o-mini", "parameters": {"page_number": 1, "replace_missing_char": null,
+"max_glyphs": null, "max_operators": null, "max_text_depth": null, "max_chars": 2000},
+"job": "test", "next_id": 2, "results": {},
+"batches": [$(echo "$2" | sed 's/}$/, "done": false, "requests": {"0": "knuth65.pdf"}}/')]}
+EOF
+}
+# continue_job STATE_FILE [CUSTOM_ID], the log is cleared before
+continue_job() {
+  : > "$stub_dir/log"
+  output=$(pdftitle -b knuth65.pdf -a openai --openai-batch "$1" --openai-batch-interval 0.1)
+  echo "$output"
+  [ "$output" = "$(printf "knuth65.pdf\tStub Title %s" "${2:-0}")" ]
+}
+echo "testing: pdftitle -b knuth65.pdf -a openai --openai-batch STATE_FILE (continued)"
+# batch_resume of the stub is saved
+write_state "$stub_dir/resume.json" '{"id": "batch_resume", "input_file": "pdftitle.batch.resume.0.jsonl",
+"input_file_id": "file_resume_input", "created_at": 0, "status": "in_progress"}'
+continue_job "$stub_dir/resume.json" || exit 1
+# the file is not submitted again, the batch is polled
+if [ "$(count_requests POST "/.*")" -ne 0 ] ||
+  [ "$(count_requests GET /batches/batch_resume)" -ne 2 ] ||
+  [ "$(count_requests DELETE /files/file_resume_input)" -ne 1 ]; then
+  cat "$stub_dir/log"
+  exit 1
+fi
+echo "testing: a job interrupted before the batch is saved"
+# batch_unsaved of the stub is created, but only its input file is saved
+write_state "$stub_dir/unsaved.json" '{"id": null, "input_file": "pdftitle.batch.unsaved.0.jsonl",
+"input_file_id": "file_unsaved_input", "created_at": 0, "status": null}'
+continue_job "$stub_dir/unsaved.json" || exit 1
+# the batch is found, it is not created again
+if [ "$(count_requests POST "/.*")" -ne 0 ] ||
+  [ "$(count_requests GET /batches)" -ne 1 ] ||
+  [ "$(count_requests GET /batches/batch_unsaved)" -ne 2 ] ||
+  [ "$(count_requests DELETE /files/file_unsaved_input)" -ne 1 ]; then
+  cat "$stub_dir/log"
+  exit 1
+fi
+echo "testing: a job interrupted before the input file is saved"
+# file_uploaded of the stub is uploaded, but it is not saved
+write_state "$stub_dir/uploaded.json" '{"id": null, "input_file": "pdftitle.batch.uploaded.0.jsonl",
+"input_file_id": null, "created_at": null, "status": null}'
+continue_job "$stub_dir/uploaded.json" || exit 1
+# the input file is found, it is not uploaded again but the batch is created
+if [ "$(count_requests POST /files)" -ne 0 ] ||
+  [ "$(count_requests GET /files)" -ne 1 ] ||
+  [ "$(count_requests POST /batches)" -ne 1 ] ||
+  [ "$(count_requests DELETE /files/file_uploaded)" -ne 1 ]; then
+  cat "$stub_dir/log"
+  exit 1
+fi
+echo "testing: a job interrupted before the input file is uploaded"
+write_state "$stub_dir/not_uploaded.json" '{"id": null, "input_file": "pdftitle.batch.test.0.jsonl",
+"input_file_id": null, "created_at": null, "status": null}'
+# the file is submitted again (with the next custom_id)
+continue_job "$stub_dir/not_uploaded.json" 2 || exit 1
+if [ "$(count_requests POST /files)" -ne 1 ] ||
+  [ "$(count_requests POST /batches)" -ne 1 ]; then
+  cat "$stub_dir/log"
+  exit 1
+fi
+echo "testing: pdftitle -b knuth65.pdf -a openai --openai-batch STATE_FILE --page-number 2"
+# a job is not continued with different parameters
+output=$(pdftitle -b knuth65.pdf -a openai --openai-batch "$stub_dir/state.json" --page-number 2 2>&1)
+if [ $? -eq 0 ] || ! echo "$output" | grep -q "different parameters: page_number"; then
+  echo "$output"
+  exit 1
+fi
+exit 0
@@ -0,0 +1,112 @@
+#!/bin/bash
+# the requests are tested with a local stub of OpenAI (openai_stub.py)
+echo "testing: pdftitle -p knuth65.pdf -a openai --openai-rpm 0"
+if pdftitle -p knuth65.pdf -a openai --openai-rpm 0 2>/dev/null; then
+  exit 1
+fi
+echo "testing: pdftitle -p knuth65.pdf -a openai --openai-tpm -1"
+if pdftitle -p knuth65.pdf -a openai --openai-tpm -1 2>/dev/null; then
+  exit 1
+fi
+echo "testing: pdftitle -p knuth65.pdf --openai-rpm 60 --openai-timeout 10 --openai-max-retries 3"
+title=$(pdftitle -p knuth65.pdf --openai-rpm 60 --openai-timeout 10 --openai-max-retries 3)
+if [ $? -ne 0 ]; then
+  exit 1
+fi
+echo "\"$title\""
+if [ ! "$title" = "On the Translation of Languages from Left to Right" ]; then
+  exit 1
+fi
+echo "testing: RateLimiter with a clock"
+python - <<'EOF' || exit 1
+from pdftitle.ratelimit import RateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+clock = Clock()
+rate_limiter = RateLimiter(rpm=60, clock=clock)
+# the bucket is full at the start
+assert [rate_limiter.reserve(0) for _ in range(60)] == [0.0] * 60
+# then a request is sent every second, in the order they are reserved
+assert rate_limiter.reserve(0) == 1.0
+assert rate_limiter.reserve(0) == 2.0
+clock.now += 2
+assert rate_limiter.reserve(0) == 1.0
+# the bucket is not filled more than rpm
+clock.now += 3600
+assert [rate_limiter.reserve(0) for _ in range(60)] == [0.0] * 60
+assert rate_limiter.reserve(0) == 1.0
+
+clock = Clock()
+rate_limiter = RateLimiter(tpm=1000, clock=clock)
+assert rate_limiter.reserve(600) == 0.0
+assert rate_limiter.reserve(600) == 12.0
+# the requests used 400 tokens less than estimated
+rate_limiter.adjust(-400)
+assert rate_limiter.reserve(0) == 0.0
+# 200 tokens are left, and 500 tokens are refilled in 30 seconds
+clock.now += 30
+# a request larger than tpm reserves tpm tokens, so it is not waiting forever
+assert rate_limiter.reserve(5000) == 18.0
+EOF
+if ! python -c "import openai" 2>/dev/null; then
+  echo "openai is not installed, the requests are not tested"
+  exit 0
+fi
+stub_dir=$(mktemp -d)
+python openai_stub.py "$stub_dir/log" > "$stub_dir/port" &
+stub_pid=$!
+trap 'kill $stub_pid; rm -rf "$stub_dir"' EXIT
+for _ in $(seq 50); do
+  [ -s "$stub_dir/port" ] && break
+  sleep 0.1
+done
+export OPENAI_BASE_URL="http://127.0.0.1:$(cat "$stub_dir/port")/v1"
+export OPENAI_API_KEY=stub
+echo "testing: pdftitle -p knuth65.pdf -a openai --openai-text --openai-max-retries 2"
+# the stub responds 429 (retry after 500 ms) and then 200
+start=$(date +%s%N)
+title=$(pdftitle -p knuth65.pdf -a openai --openai-text --openai-max-retries 2)
+if [ $? -ne 0 ]; then
+  exit 1
+fi
+elapsed_ms=$((($(date +%s%N) - start) / 1000000))
+echo "\"$title\" in $elapsed_ms ms"
+if [ ! "$title" = "Stub Title" ] ||
+  [ "$(grep -c "^POST /chat/completions$" "$stub_dir/log")" -ne 2 ] ||
+  [ "$elapsed_ms" -lt 500 ]; then
+  exit 1
+fi
+echo "testing: every attempt of a request is reserved on the rate limiter"
+# the stub responds 429 and then 200 again
+python - <<'EOF' || exit 1
+from pdftitle.openai_gateway import RequestOptions, get_title_from_openai_text
+from pdftitle.ratelimit import RateLimiter
+
+# the time is not changed, so the bucket is not refilled
+rate_limiter = RateLimiter(rpm=60, clock=lambda: 1000.0)
+for _ in range(58):
+    rate_limiter.reserve(0)
+options = RequestOptions(max_retries=2, rate_limiter=rate_limiter)
+title = get_title_from_openai_text("title", "gpt-4o-mini", False, options)
+assert title == "Stub Title", title
+# the 2 requests took the last 2 requests of the bucket
+assert rate_limiter.reserve(0) == 1.0
+EOF
+echo "testing: pdftitle -p knuth65.pdf -a openai --openai-text --openai-max-retries 0"
+# the request is not retried
+: > "$stub_dir/log"
+if pdftitle -p knuth65.pdf -a openai --openai-text --openai-max-retries 0 2>/dev/null; then
+  exit 1
+fi
+if [ "$(grep -c "^POST /chat/completions$" "$stub_dir/log")" -ne 1 ]; then
+  exit 1
+fi
+exit 0
@@ -0,0 +1,15 @@
+#!/bin/bash
+echo "testing: pdftitle -p knuth65.pdf --page-number 34"
+# knuth65.pdf has 33 pages
+pdftitle -p knuth65.pdf --page-number 34 2>&1 | grep "specified page does not exist"
+if [ $? -ne 0 ]; then
+  exit 1
+fi
+echo "testing: pdftitle -p knuth65.pdf --page-number 33"
+title=$(pdftitle -p knuth65.pdf --page-number 33)
+if [ $? -eq 0 ]; then
+  echo "\"$title\""
+  exit 0
+else
+  exit 1
+fi
@@ -0,0 +1,36 @@
+#!/bin/bash
+# spaces of the title are recovered from the text of the page (-t is not given)
+echo "testing: __retrieve_spaces"
+python - <<'EOF' || exit 1
+from pdftitle import pdftitle
+
+retrieve_spaces = getattr(pdftitle, "__retrieve_spaces")
+
+CASES = [
+    # (page text, title without spaces, title with spaces)
+    ("On the Translation", "OntheTranslation", "On the Translation"),
+    ("  On\nthe \t Translation\n", "onthetranslation", "On the Translation"),
+    # a partial prefix of the title is before the title
+    (
+        "The Trans The Translation of Languages",
+        "TheTranslationofLanguages",
+        "The Translation of Languages",
+    ),
+    ("On th On the\nTranslation", "OntheTranslation", "On the Translation"),
+    ("OnOnthe Translation", "OntheTranslation", "Onthe Translation"),
+    # U+0130 is two chars in lower case
+    ("İstanbul Guide", "İstanbulGuide", "İstanbul Guide"),
+    ("İİ Big Title here", "BigTitle", "Big Title"),
+    # and it is not the same as i in lower case (i and a combining dot)
+    ("İstan İstanbul Guide to İzmir", "istanbulguidetoizmir", ""),
+    ("İstan İstanbul Guide", "İstanbulGuide", "İstanbul Guide"),
+    ("Title İİ", "TitleİİX", ""),
+    # not found
+    ("On the Translation", "OntheTranslations", ""),
+    ("On the Translation", "", ""),
+]
+for page_text, title, expected in CASES:
+    actual = retrieve_spaces(page_text, title)
+    assert actual == expected, (page_text, title, actual)
+EOF
+exit 0
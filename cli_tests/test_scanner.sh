@@ -0,0 +1,191 @@
+#!/bin/bash
+# scanner.py (iter_operators and parse_operands) is compared with pdfminer's
+# PDFContentParser, which TextOnlyInterpreter used before
+echo "testing: scanner and PDFContentParser"
+python - <<'EOF' || exit 1
+import glob
+
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFContentParser
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import PDFStream, resolve1, stream_value
+from pdfminer.psparser import LIT, PSEOF, PSKeyword, keyword_name, literal_name
+
+from pdftitle.scanner import iter_operators, parse_operands
+
+
+def get_value(obj):
+    # inline images are compared with their dictionaries
+    if isinstance(obj, PDFStream):
+        return ("inline image", get_value(obj.attrs))
+
+    if isinstance(obj, list):
+        return [get_value(value) for value in obj]
+
+    if isinstance(obj, dict):
+        return {key: get_value(value) for key, value in obj.items()}
+
+    return obj
+
+
+def get_content_parser_operators(data):
+    # returns [(operator, operands)] like PDFPageInterpreter.execute gets them
+    # PDFContentParser returns an inline image as the operand of EI (no BI and ID)
+    parser = PDFContentParser([PDFStream({}, data)])
+    operators = []
+    operands = []
+    while True:
+        try:
+            (_, obj) = parser.nextobject()
+        except PSEOF:
+            break
+
+        if isinstance(obj, PSKeyword):
+            operators.append((keyword_name(obj), get_value(operands)))
+            operands = []
+
+        else:
+            operands.append(obj)
+
+    return operators
+
+
+def get_scanner_operators(data):
+    # returns [(operator, operands)] like get_content_parser_operators
+    operators = []
+    image = None
+    for operator, start, end in iter_operators(data):
+        operands = parse_operands(data, start, end)
+        if operator == b"BI":
+            continue
+
+        if operator == b"ID":
+            image = {
+                literal_name(key): resolve1(value)
+                for key, value in zip(operands[0::2], operands[1::2])
+            }
+            continue
+
+        if operator == b"EI" and image is not None:
+            operands = [PDFStream(image, b"")]
+            image = None
+
+        operators.append((operator.decode("latin-1"), get_value(operands)))
+
+    return operators
+
+
+def iter_content_streams(pdf_file):
+    # yields (name, data) of the content streams of the pages and their forms
+    with open(pdf_file, "rb") as file_reader:
+        doc = PDFDocument(PDFParser(file_reader))
+        for number, page in enumerate(PDFPage.create_pages(doc), 1):
+            # joined like TextOnlyInterpreter.execute
+            data = b"\n".join(stream_value(obj).get_data() for obj in page.contents)
+            yield (f"{pdf_file} page {number}", data)
+            xobjects = resolve1((page.resources or {}).get("XObject")) or {}
+            for name, xobject in xobjects.items():
+                xobject = resolve1(xobject)
+                if isinstance(xobject, PDFStream) and xobject.get("Subtype") is LIT(
+                    "Form"
+                ):
+                    yield (f"{pdf_file} page {number} {name}", xobject.get_data())
+
+
+# every page of the bundled files gives the same operators and operands
+count = 0
+for pdf_file in sorted(glob.glob("*.pdf")):
+    for name, data in iter_content_streams(pdf_file):
+        expected = get_content_parser_operators(data)
+        actual = get_scanner_operators(data)
+        assert actual == expected, name
+        count = count + len(expected)
+
+print(f"{count} operators are the same")
+assert count > 100000, count
+
+# the same as PDFContentParser
+SAME = [
+    b"BT (a (nested (deep)) string) Tj ET",
+    b"BT (\\( \\) \\\\ \\n \\r \\t \\b \\f \\101\\60\\7 \\q \\\ncontinued) Tj ET",
+    b"BT (unbalanced \\) ( () Tj ET) Tj ET",
+    b"BT % a comment (not a string\n/F1 12 Tf ET % at the end",
+    b"BT <> Tj < 41 42\n43 > Tj ET",
+    b"/Span <</ActualText (x) /MCID 3 /A [1 [2] <</B true>>]>> BDC EMC",
+    b"1. .5 -3 +4 -.2 false true d0",
+    b"/A#20B Do /C#2fD Do",
+    b"BT > (a) Tj ET",
+    # inline images, the data can contain EI not followed by white-space
+    b"q BI /W 4 /H 1 /BPC 8 /CS /G ID \x00EI\x01EIx\xff EI Q BT (t) Tj ET",
+    b"q BI /W 2 /H 2 /BPC 8 /CS /G /F /A85 ID 9jqo^EI Q~> EI Q",
+    b"q BI /W 2 /H 2 /BPC 8 /CS /G /F [/A85 /Fl] ID 9jqo^EI Q~> EI Q",
+    b"q BI /W 1 /H 1 /CS /RGB /BPC 8 /F /AHx ID 414243> EI Q",
+]
+for data in SAME:
+    expected = get_content_parser_operators(data)
+    assert get_scanner_operators(data) == expected, (data, expected)
+
+# the intended differences, (data, PDFContentParser, scanner)
+INLINE_IMAGE = {"W": 2, "H": 2, "BPC": 8, "CS": LIT("G")}
+DIFFERENT = [
+    # 7.3.4.3 the last digit of an odd length hexadecimal string is followed by 0
+    (
+        b"BT <414> Tj <41 42 4> Tj ET",
+        [("BT", []), ("Tj", [b"A\x04"]), ("Tj", [b"AB\x04"]), ("ET", [])],
+        [("BT", []), ("Tj", [b"A@"]), ("Tj", [b"AB@"]), ("ET", [])],
+    ),
+    # 7.3.9 null is an object (None), not an operator
+    (
+        b"/P null BDC EMC null 1 0 0 1 0 0 cm",
+        [
+            ("null", [LIT("P")]),
+            ("BDC", []),
+            ("EMC", []),
+            ("null", []),
+            ("cm", [1, 0, 0, 1, 0, 0]),
+        ],
+        [("BDC", [LIT("P"), None]), ("EMC", []), ("cm", [None, 1, 0, 0, 1, 0, 0])],
+    ),
+    # an unbalanced ) is skipped, not an operator
+    (
+        b"BT ) (a) Tj ET",
+        [("BT", []), (")", []), ("Tj", [b"a"]), ("ET", [])],
+        [("BT", []), ("Tj", [b"a"]), ("ET", [])],
+    ),
+    # the full name of the filter of an inline image is also used
+    (
+        b"q BI /W 2 /H 2 /BPC 8 /CS /G /Filter /ASCII85Decode ID 9jqo^EI Q~> EI Q",
+        [
+            ("q", []),
+            (
+                "EI",
+                [("inline image", dict(INLINE_IMAGE, Filter=LIT("ASCII85Decode")))],
+            ),
+            ("Q~", []),
+            ("EI", []),
+            ("Q", []),
+        ],
+        [
+            ("q", []),
+            (
+                "EI",
+                [("inline image", dict(INLINE_IMAGE, Filter=LIT("ASCII85Decode")))],
+            ),
+            ("Q", []),
+        ],
+    ),
+    # operators are not in arrays, an unterminated array ends at the operator
+    (
+        b"BT [(a) 10 (b) TJ ET",
+        [("BT", [])],
+        [("BT", []), ("TJ", [[b"a", 10, b"b"]]), ("ET", [])],
+    ),
+]
+for data, content_parser_operators, scanner_operators in DIFFERENT:
+    actual = get_content_parser_operators(data)
+    assert actual == content_parser_operators, (data, actual)
+    actual = get_scanner_operators(data)
+    assert actual == scanner_operators, (data, actual)
+EOF
+exit 0
@@ -0,0 +1,26 @@
+#!/bin/bash
+output_file=$(mktemp)
+pdftitle serve --port 0 -j 2 --allow-paths . >"$output_file" &
+pid=$!
+trap 'kill $pid 2>/dev/null; rm -f "$output_file"' EXIT
+for i in $(seq 100); do
+  grep -q "^serving on " "$output_file" && break
+  sleep 0.1
+done
+url=$(sed -n 's/^serving on //p' "$output_file")
+echo "testing: pdftitle serve, POST knuth65.pdf to $url/title"
+output=$(curl -s --data-binary @knuth65.pdf "$url/title")
+echo "$output"
+if [ ! "$output" = '{"title": "On the Translation of Languages from Left to Right", "source": "original"}' ]; then
+  exit 1
+fi
+echo "testing: pdftitle serve, POST path knuth65.pdf to $url/title"
+output=$(curl -s -H "Content-Type: application/json" -d '{"path": "knuth65.pdf", "algorithm": "max2"}' "$url/title")
+echo "$output"
+if [ ! "$output" = '{"title": "On the Translation of Languages from Left to Right DONALD E. KNUTtt ", "source": "max2"}' ]; then
+  exit 1
+fi
+# the service stops after SIGTERM
+kill -TERM $pid
+wait $pid || exit 1
+exit 0
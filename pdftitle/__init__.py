@@ -4,7 +4,43 @@
 
 """pdftitle module level imports"""
 
+import importlib
+
 from .constants import ALGO_ORIGINAL, ALGO_MAX2, ALGO_ELIOT
 from .pdftitle import get_title_from_doc, get_title_from_io, get_title_from_file
-from .pdftitle import GetTitleParameters
+from .pdftitle import GetTitleParameters, get_title_and_source_from_io
+from .pdftitle import get_title_and_source_from_file
+from .pdftitle import get_title_result_from_file, get_title_result_from_io
+from .pdftitle import get_title_from_bytes, get_title_and_source_from_bytes
+from .pdftitle import get_title_result_from_bytes
+from .result import TitleResult
+from .normalize import convert_ligatures, normalize_title
 from .pdftitle import run
+
+# batch (multiprocessing) and async_api (asyncio) are imported when these are
+# first used, not when pdftitle is imported (e.g. by the command line)
+__LAZY_IMPORTS = {
+    "BatchResult": "batch",
+    "get_titles_from_files": "batch",
+    "iter_pdf_files": "batch",
+    "get_title_from_file_async": "async_api",
+    "get_title_from_io_async": "async_api",
+    "get_titles_from_files_async": "async_api",
+    "get_title_and_source_from_file_async": "async_api",
+    "get_title_and_source_from_io_async": "async_api",
+}
+
+
+def __getattr__(name):
+    module_name = __LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    # cached in the module, so __getattr__ is not called again for this name
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(__LAZY_IMPORTS))
@@ -0,0 +1,287 @@
+# SPDX-FileCopyrightText: 2024 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+asyncio API
+The files are read and the titles are extracted in an executor, so the event loop
+is not blocked. The executor is the default executor of the loop (a thread pool)
+unless one is given. Title extraction is CPU-bound, so a ProcessPoolExecutor should
+be given to extract many titles in parallel, then the paths of the files are sent
+to the executor, not their content. The openai algorithm uses AsyncOpenAI, the
+executor is used only to interpret the page in text mode.
+"""
+
+import asyncio
+from concurrent.futures import Executor
+import contextlib
+import io
+import logging
+import os
+import time
+from typing import AsyncIterator, Iterable, Optional, Tuple, Union
+
+from .batch import BatchResult, get_error_batch_result
+from .buffer import BufferReader, open_pdf_file
+from .cache import get_cache_key, get_file_digest, get_title_cache
+from .constants import ALGO_OPENAI, SOURCE_CACHE
+from .normalize import normalize_title
+from .openai_gateway import get_request_options, get_title_from_openai_async
+from .openai_gateway import get_title_from_openai_text_async
+from .pdftitle import GetTitleParameters, get_title_and_source_from_bytes
+from .pdftitle import get_blocks_text_from_file, get_blocks_text_from_io
+from .pdftitle import get_title_and_source_from_file
+
+
+logger = logging.getLogger(__name__)
+
+
+def __open(pdf_source: Union[str, bytes]):
+    # pdf_source is the path or the content of the file
+    if isinstance(pdf_source, str):
+        return open_pdf_file(pdf_source)
+
+    return BufferReader(pdf_source)
+
+
+def __get_path(pdf_file: io.BufferedReader) -> Optional[str]:
+    # returns the path of pdf_file if it is a regular file read from the start
+    # then the path is sent to executor instead of the content of the file
+    name = getattr(pdf_file, "name", None)
+    if (
+        isinstance(name, str)
+        and os.path.isfile(name)
+        and pdf_file.seekable()
+        and pdf_file.tell() == 0
+    ):
+        return name
+
+    return None
+
+
+def __get_cached_title(pdf_source: Union[str, bytes], params: GetTitleParameters):
+    # returns (key, found, title)
+    with __open(pdf_source) as pdf_file:
+        key = get_cache_key(get_file_digest(pdf_file), params)
+
+    if params.cache_bypass:
+        return (key, False, None)
+
+    title_cache = get_title_cache(params.cache_path, params.cache_max_size)
+    return (key,) + title_cache.get(key)
+
+
+def __put_cached_title(key: str, title: Optional[str], params: GetTitleParameters):
+    get_title_cache(params.cache_path, params.cache_max_size).put(key, title)
+
+
+# this is run in the executor, so it is a module level function (can be pickled)
+def __get_blocks_text_from_data(pdf_data: bytes, params: GetTitleParameters) -> str:
+    with BufferReader(pdf_data) as buffer_reader:
+        return get_blocks_text_from_io(buffer_reader, params)
+
+
+async def __get_title_from_openai(
+    pdf_source: Union[str, bytes],
+    params: GetTitleParameters,
+    executor: Optional[Executor],
+) -> Optional[str]:
+    loop = asyncio.get_running_loop()
+    if not params.openai_text:
+        with contextlib.ExitStack() as stack:
+            # like get_title_from_openai, the file is uploaded in chunks (not read
+            # at once), it is opened in the default executor
+            if isinstance(pdf_source, str):
+                pdf_source = await loop.run_in_executor(
+                    None,
+                    stack.enter_context,
+                    open_pdf_file(pdf_source, use_mmap=False),
+                )
+
+            title = await get_title_from_openai_async(
+                pdf_source,
+                params.openai_model,
+                params.openai_show_usage,
+                get_request_options(params),
+            )
+
+        return normalize_title(title, params)
+
+    # the page is interpreted in executor like the other algorithms
+    # only the path is sent to executor if the content is not read
+    if isinstance(pdf_source, str):
+        text = await loop.run_in_executor(
+            executor, get_blocks_text_from_file, pdf_source, params
+        )
+
+    else:
+        text = await loop.run_in_executor(
+            executor, __get_blocks_text_from_data, pdf_source, params
+        )
+
+    if len(text) == 0:
+        return None
+
+    title = await get_title_from_openai_text_async(
+        text,
+        params.openai_model,
+        params.openai_show_usage,
+        get_request_options(params),
+    )
+    return normalize_title(title, params)
+
+
+async def __get_title_and_source_from_openai(
+    pdf_source: Union[str, bytes],
+    params: GetTitleParameters,
+    executor: Optional[Executor],
+) -> Tuple[Optional[str], str]:
+    if params.cache_path is None:
+        return (
+            await __get_title_from_openai(pdf_source, params, executor),
+            ALGO_OPENAI,
+        )
+
+    # cache is an SQLite database, it is used in the default executor
+    loop = asyncio.get_running_loop()
+    (key, found, title) = await loop.run_in_executor(
+        None, __get_cached_title, pdf_source, params
+    )
+    if found:
+        logger.info("title found in the cache: %s", title)
+        return (title, SOURCE_CACHE)
+
+    # like get_title_result_from_io, the title is normalized before it is cached
+    title = await __get_title_from_openai(pdf_source, params, executor)
+    # like get_title_result_from_io, no title from OpenAI is not cached
+    if title is not None:
+        await loop.run_in_executor(None, __put_cached_title, key, title, params)
+
+    return (title, ALGO_OPENAI)
+
+
+async def get_title_and_source_from_io_async(
+    pdf_file: io.BufferedReader,
+    params: GetTitleParameters,
+    executor: Optional[Executor] = None,
+) -> Tuple[Optional[str], str]:
+    """
+    asyncio version of get_title_and_source_from_io
+    if pdf_file is a regular file (and at its start) only its path is sent to
+    executor, otherwise pdf_file is read in the default executor and the title is
+    extracted in executor
+    """
+    path = __get_path(pdf_file)
+    if path is not None:
+        return await get_title_and_source_from_file_async(path, params, executor)
+
+    loop = asyncio.get_running_loop()
+    pdf_data = await loop.run_in_executor(None, pdf_file.read)
+    if params.algorithm == ALGO_OPENAI:
+        return await __get_title_and_source_from_openai(pdf_data, params, executor)
+
+    return await loop.run_in_executor(
+        executor, get_title_and_source_from_bytes, pdf_data, params
+    )
+
+
+async def get_title_from_io_async(
+    pdf_file: io.BufferedReader,
+    params: GetTitleParameters,
+    executor: Optional[Executor] = None,
+) -> Optional[str]:
+    """asyncio version of get_title_from_io"""
+    return (await get_title_and_source_from_io_async(pdf_file, params, executor))[0]
+
+
+async def get_title_and_source_from_file_async(
+    pdf_file: str,
+    params: GetTitleParameters,
+    executor: Optional[Executor] = None,
+) -> Tuple[Optional[str], str]:
+    """
+    asyncio version of get_title_and_source_from_file
+    only the path of pdf_file is sent to executor, not the content of the file
+    """
+    if params.algorithm == ALGO_OPENAI:
+        return await __get_title_and_source_from_openai(pdf_file, params, executor)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, get_title_and_source_from_file, pdf_file, params
+    )
+
+
+async def get_title_from_file_async(
+    pdf_file: str,
+    params: GetTitleParameters,
+    executor: Optional[Executor] = None,
+) -> Optional[str]:
+    """asyncio version of get_title_from_file"""
+    return (await get_title_and_source_from_file_async(pdf_file, params, executor))[0]
+
+
+async def __get_batch_result_async(
+    pdf_file: str,
+    params: GetTitleParameters,
+    executor: Optional[Executor],
+) -> BatchResult:
+    start = time.perf_counter()
+    try:
+        (title, source) = await get_title_and_source_from_file_async(
+            pdf_file, params, executor
+        )
+
+    # like batch.get_batch_result, one bad PDF should not stop the others
+    except Exception as exception:  # pylint: disable=broad-exception-caught
+        return get_error_batch_result(pdf_file, exception, time.perf_counter() - start)
+
+    elapsed = time.perf_counter() - start
+    return BatchResult(pdf_file, title, source=source, elapsed=elapsed)
+
+
+async def get_titles_from_files_async(
+    pdf_files: Iterable[str],
+    params: GetTitleParameters,
+    executor: Optional[Executor] = None,
+    max_concurrency: int = 16,
+) -> AsyncIterator[BatchResult]:
+    """
+    asyncio version of batch.get_titles_from_files
+    at most max_concurrency titles are extracted at the same time, and the results
+    are yielded as they complete (thus not in the order of pdf_files)
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency should be at least 1")
+
+    # tasks are created only when there is room, so pdf_files can be very long
+    pending = set()
+    try:
+        for pdf_file in pdf_files:
+            if len(pending) >= max_concurrency:
+                (done, pending) = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield task.result()
+
+            pending.add(
+                asyncio.ensure_future(
+                    __get_batch_result_async(pdf_file, params, executor)
+                )
+            )
+
+        while pending:
+            (done, pending) = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                yield task.result()
+
+    finally:
+        # if the caller stops early, the cancelled tasks are awaited so they are
+        # not left running (and their exceptions are not logged as never retrieved)
+        for task in pending:
+            task.cancel()
+
+        await asyncio.gather(*pending, return_exceptions=True)
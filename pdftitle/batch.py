@@ -0,0 +1,174 @@
+# SPDX-FileCopyrightText: 2024 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+batch mode implementation
+Titles of many PDF files are extracted by a pool of worker processes. Every worker
+imports pdftitle (and pdfminer) only once and then processes many files, and a
+failure in one file is reported in its result without stopping the others.
+With the openai algorithm the workers are threads waiting for OpenAI.
+"""
+
+import functools
+import logging
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import os
+import sys
+import time
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from .constants import ALGO_OPENAI
+from .pdftitle import GetTitleParameters, get_title_result_from_file
+
+
+logger = logging.getLogger(__name__)
+
+
+class BatchResult(NamedTuple):
+    """result of title extraction of a single file in batch mode"""
+
+    path: str
+    title: Optional[str]
+    # class name of the exception and its message if extraction failed
+    error_class: Optional[str] = None
+    error: Optional[str] = None
+    # source of the title, see get_title_and_source_from_io
+    source: Optional[str] = None
+    # time spent for the file in seconds
+    elapsed: Optional[float] = None
+    # timings of the stages and the counters, see TitleResult
+    timings: Optional[Dict[str, Tuple[float, float]]] = None
+    counters: Optional[Dict[str, int]] = None
+
+
+def iter_pdf_files(paths: Iterable[str]) -> Iterator[str]:
+    """
+    yields the given paths, directories are searched recursively for .pdf files
+    files given explicitly are yielded even if they do not have .pdf extension
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                # walk in a deterministic order
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if filename.lower().endswith(".pdf"):
+                        yield os.path.join(dirpath, filename)
+
+        else:
+            yield path
+
+
+def read_file_list(file_list: str, null_separated: bool = False) -> Iterator[str]:
+    """
+    yields the paths listed in file_list (- means stdin)
+    paths are separated by newline, or by NUL if null_separated is True
+    """
+    if file_list == "-":
+        data = sys.stdin.buffer.read()
+
+    else:
+        with open(file_list, "rb") as file_reader:
+            data = file_reader.read()
+
+    separator = b"\0" if null_separated else b"\n"
+    for path in data.split(separator):
+        if not null_separated:
+            path = path.rstrip(b"\r")
+
+        if len(path) > 0:
+            yield os.fsdecode(path)
+
+
+# parameters of the worker process, set by __init_worker
+__WORKER_PARAMS = None
+
+
+def __init_worker(params: GetTitleParameters, logging_level: int) -> None:
+    # pylint: disable=global-statement
+    global __WORKER_PARAMS
+    __WORKER_PARAMS = params
+    # worker processes are not forked on every platform
+    # so logging level is set explicitly
+    logging.getLogger("pdftitle").setLevel(logging_level)
+
+
+def __get_title_worker(pdf_file: str) -> BatchResult:
+    return get_batch_result(pdf_file, __WORKER_PARAMS)
+
+
+def get_error_batch_result(
+    pdf_file: str, exception: Exception, elapsed: float
+) -> BatchResult:
+    """returns the BatchResult of pdf_file when extracting its title raised exception"""
+    logger.debug("cannot extract title from %s", pdf_file, exc_info=exception)
+    return BatchResult(
+        pdf_file, None, type(exception).__name__, str(exception), elapsed=elapsed
+    )
+
+
+def get_batch_result(pdf_file: str, params: GetTitleParameters) -> BatchResult:
+    """get_title_from_file returning a BatchResult instead of raising"""
+    start = time.perf_counter()
+    try:
+        # the file is not mapped, if it is truncated meanwhile (e.g. it is still
+        # being downloaded), SIGBUS would kill the worker and stop the batch
+        result = get_title_result_from_file(pdf_file, params, use_mmap=False)
+        return BatchResult(
+            pdf_file,
+            result.title,
+            source=result.source,
+            elapsed=time.perf_counter() - start,
+            timings=result.timings,
+            counters=result.counters,
+        )
+
+    # one bad PDF should not stop the batch, pdfminer raises many exception types
+    except Exception as exception:  # pylint: disable=broad-exception-caught
+        return get_error_batch_result(pdf_file, exception, time.perf_counter() - start)
+
+
+def get_titles_from_files(
+    pdf_files: Iterable[str],
+    params: GetTitleParameters,
+    jobs: Optional[int] = None,
+) -> Iterator[BatchResult]:
+    """
+    extracts the titles of pdf_files using jobs worker processes
+    (default is the number of CPUs) and yields the results as they complete,
+    thus the order of the results is not the same as pdf_files
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+
+    if jobs < 1:
+        raise ValueError("jobs should be at least 1")
+
+    # no need for a pool for a single job, this also helps debugging
+    if jobs == 1:
+        for pdf_file in pdf_files:
+            yield get_batch_result(pdf_file, params)
+
+        return
+
+    # the openai algorithm waits for OpenAI, so threads are used instead of
+    # processes, then the rate limits and the usage are shared by all jobs
+    if params.algorithm == ALGO_OPENAI:
+        with ThreadPool(jobs) as pool:
+            yield from pool.imap_unordered(
+                functools.partial(get_batch_result, params=params), pdf_files
+            )
+
+        return
+
+    logging_level = logging.getLogger("pdftitle").getEffectiveLevel()
+    with multiprocessing.Pool(
+        jobs, initializer=__init_worker, initargs=(params, logging_level)
+    ) as pool:
+        yield from pool.imap_unordered(__get_title_worker, pdf_files)
+        # the workers exit normally (instead of being terminated when the pool is
+        # exited), so they run their finalizers e.g. to delete OpenAI assistants
+        pool.close()
+        pool.join()
@@ -0,0 +1,107 @@
+# SPDX-FileCopyrightText: 2024 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+This module has the storage of blocks found by the Device implementation.
+Blocks are kept in columns (arrays of font ids, font sizes, coordinates and text
+offsets) and the text of all blocks is kept in a single buffer, instead of a tuple
+and a list of chars for every block. The algorithms select blocks by operating on
+the columns and use the indices of the blocks.
+"""
+
+from array import array
+import io
+from itertools import compress, repeat
+from operator import eq
+from typing import Iterable, Iterator, List, Tuple
+
+
+# pylint: disable=too-many-instance-attributes
+class BlockStore:
+    """columnar block storage"""
+
+    def __init__(self):
+        # distinct fonts, font_ids are indices to this list
+        self.fonts = []
+        self.__font_index = {}
+        self.font_ids = array("l")
+        self.font_sizes = array("d")
+        # origin of the first glyph
+        self.xs = array("d")
+        self.ys = array("d")
+        # vertical range of the origins of all glyphs
+        self.min_ys = array("d")
+        self.max_ys = array("d")
+        # offsets of the blocks in text buffer
+        self.offsets = array("l")
+        self.__text_buffer = io.StringIO()
+        self.__text_length = 0
+        self.__text = None
+
+    def __len__(self) -> int:
+        return len(self.font_sizes)
+
+    def __iter__(self) -> Iterator[Tuple]:
+        return map(self.__getitem__, range(len(self)))
+
+    def __getitem__(self, index: int) -> Tuple:
+        """returns (font, font_size, x, y, text, (min y, max y)) of the block"""
+        return (
+            self.fonts[self.font_ids[index]],
+            self.font_sizes[index],
+            self.xs[index],
+            self.ys[index],
+            self.get_text(index),
+            (self.min_ys[index], self.max_ys[index]),
+        )
+
+    def add_block(self, font, font_size: float, x: float, y: float) -> None:
+        """adds a new block, its text is added with add_text"""
+        font_id = self.__font_index.get(id(font))
+        if font_id is None:
+            font_id = len(self.fonts)
+            self.fonts.append(font)
+            self.__font_index[id(font)] = font_id
+
+        self.font_ids.append(font_id)
+        self.font_sizes.append(font_size)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.min_ys.append(y)
+        self.max_ys.append(y)
+        self.offsets.append(self.__text_length)
+
+    def add_text(self, text: str, y: float = None) -> None:
+        """adds text to the last block, y is the origin of its glyph"""
+        self.__text_buffer.write(text)
+        self.__text_length = self.__text_length + len(text)
+        self.__text = None
+        if y is not None:
+            if y < self.min_ys[-1]:
+                self.min_ys[-1] = y
+
+            elif y > self.max_ys[-1]:
+                self.max_ys[-1] = y
+
+    def get_text(self, index: int) -> str:
+        """returns the text of the block"""
+        if self.__text is None:
+            self.__text = self.__text_buffer.getvalue()
+
+        if index < 0:
+            index = index + len(self.offsets)
+
+        start = self.offsets[index]
+        if index + 1 < len(self.offsets):
+            return self.__text[start : self.offsets[index + 1]]
+
+        return self.__text[start:]
+
+    def get_texts(self, indices: Iterable[int]) -> List[str]:
+        """returns the texts of the blocks"""
+        return [self.get_text(index) for index in indices]
+
+    def select(self, column: array, value) -> List[int]:
+        """returns the indices of the blocks having value in column"""
+        return list(compress(range(len(column)), map(eq, column, repeat(value))))
@@ -0,0 +1,123 @@
+# SPDX-FileCopyrightText: 2024 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+zero-copy input
+BufferReader is a read-only binary file over an object supporting the buffer
+protocol (bytes, bytearray, memoryview, mmap etc.), so a PDF file in memory can be
+parsed without copying it into a BytesIO. Only the parts read are copied.
+open_pdf_file opens a local file as a memory map, so only the parts of the file
+parsed are read (e.g. not the images of a large scanned PDF).
+If a mapped file is truncated while it is parsed, reading the missing part of the
+map raises SIGBUS, which kills the process (it is not an exception). Thus small
+files are not mapped, and batch mode does not map the files (a worker killed
+by SIGBUS would stop the batch).
+"""
+
+from contextlib import contextmanager
+import io
+import logging
+import mmap
+import os
+from typing import Iterator
+
+
+logger = logging.getLogger(__name__)
+
+# smaller files are read as regular files, mapping does not save much for them
+MMAP_MIN_SIZE = 1024 * 1024
+
+
+class BufferReader(io.RawIOBase):
+    """read-only binary file over an object supporting the buffer protocol"""
+
+    def __init__(self, data):
+        super().__init__()
+        # a memoryview does not copy data, cast is needed if data is not bytes
+        # e.g. an array of integers
+        self.__view = memoryview(data).cast("B")
+        self.__position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.__position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+
+        elif whence == io.SEEK_CUR:
+            position = self.__position + offset
+
+        elif whence == io.SEEK_END:
+            position = len(self.__view) + offset
+
+        else:
+            raise ValueError(f"invalid whence: {whence}")
+
+        if position < 0:
+            raise ValueError(f"negative seek position: {position}")
+
+        self.__position = position
+        return position
+
+    def read(self, size: int = -1) -> bytes:
+        start = min(self.__position, len(self.__view))
+        if size is None or size < 0:
+            end = len(self.__view)
+
+        else:
+            end = min(start + size, len(self.__view))
+
+        self.__position = max(self.__position, end)
+        return self.__view[start:end].tobytes()
+
+    def readall(self) -> bytes:
+        return self.read()
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(memoryview(buffer)))
+        memoryview(buffer).cast("B")[: len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        # the view is released, so the buffer can be changed or closed (e.g. mmap)
+        if not self.closed:
+            self.__view.release()
+
+        super().close()
+
+
+@contextmanager
+def open_pdf_file(pdf_file: str, use_mmap: bool = True) -> Iterator[io.RawIOBase]:
+    """
+    opens pdf_file as a memory map (BufferReader over mmap) for reading
+    if use_mmap is False, the file is smaller than MMAP_MIN_SIZE or it cannot be
+    mapped (e.g. it is a pipe), it is opened as a regular file
+    """
+    with open(pdf_file, "rb") as file_reader:
+        file_map = None
+        if use_mmap and os.fstat(file_reader.fileno()).st_size >= MMAP_MIN_SIZE:
+            try:
+                file_map = mmap.mmap(file_reader.fileno(), 0, access=mmap.ACCESS_READ)
+
+            except (OSError, ValueError) as exception:
+                logger.debug("cannot map %s: %s", pdf_file, exception)
+
+        # not yielded in except, an exception would be chained to the one above
+        if file_map is None:
+            yield file_reader
+            return
+
+        try:
+            with BufferReader(file_map) as buffer_reader:
+                yield buffer_reader
+
+        finally:
+            file_map.close()
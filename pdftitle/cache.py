@@ -0,0 +1,198 @@
+# SPDX-FileCopyrightText: 2024 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+This module has the persistent title cache implementation.
+Titles are kept in an SQLite database. The key of a title is a digest of the content
+of the file, the parameters affecting the title and the pdftitle version, so a
+title is found in the cache only if the same file is processed with the same
+parameters by the same pdftitle version. The cache can be bounded in size, then the
+least recently used titles are removed.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# GetTitleParameters fields not affecting the title
+IGNORED_PARAMETERS = frozenset(
+    [
+        "openai_show_usage",
+        "openai_rpm",
+        "openai_tpm",
+        "openai_timeout",
+        "openai_max_retries",
+        "font_cache_size",
+        "cache_path",
+        "cache_max_size",
+        "cache_bypass",
+    ]
+)
+
+
+def get_default_cache_path() -> str:
+    """returns the default cache path, in XDG_CACHE_HOME or ~/.cache"""
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    if not cache_home:
+        cache_home = os.path.join(os.path.expanduser("~"), ".cache")
+
+    return os.path.join(cache_home, "pdftitle", "titles.sqlite3")
+
+
+def __get_version() -> str:
+    # importlib.metadata is imported only when the cache is used
+    # pylint: disable=import-outside-toplevel
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("pdftitle")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def get_file_digest(pdf_file: io.BufferedReader) -> str:
+    """
+    returns sha256 digest of the content of pdf_file from its current position
+    the position of pdf_file is not changed
+    """
+    position = pdf_file.tell()
+    digest = hashlib.sha256()
+    while True:
+        chunk = pdf_file.read(1 << 20)
+        if not chunk:
+            break
+
+        digest.update(chunk)
+
+    pdf_file.seek(position)
+    return digest.hexdigest()
+
+
+def get_cache_key(file_digest: str, params) -> str:
+    """returns the key of the title of the file with file_digest and params"""
+    fields = {k: v for k, v in vars(params).items() if k not in IGNORED_PARAMETERS}
+    key = json.dumps(
+        {"file": file_digest, "params": fields, "version": __get_version()},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class TitleCache:
+    """title cache in an SQLite database"""
+
+    def __init__(self, path: str, max_size: Optional[int] = None):
+        # max_size is the total size of the keys and the titles in bytes
+        # None means no limit
+        self.path = path
+        self.max_size = max_size
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # sqlite3 is imported only when a cache is opened
+        # pylint: disable=import-outside-toplevel
+        import sqlite3
+
+        # the same connection can be used by many threads, and the same database
+        # by many processes (e.g. batch workers), thus the timeout
+        self.__connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.__lock = threading.Lock()
+        with self.__lock, self.__connection:
+            self.__connection.execute(
+                "CREATE TABLE IF NOT EXISTS titles ("
+                + "key TEXT PRIMARY KEY, title TEXT, size INTEGER, accessed REAL)"
+            )
+            self.__connection.execute(
+                "CREATE INDEX IF NOT EXISTS titles_accessed ON titles (accessed)"
+            )
+
+    def get(self, key: str) -> Tuple[bool, Optional[str]]:
+        """
+        returns (True, title) if key is in the cache, otherwise (False, None)
+        title can be None if no title was found
+        """
+        with self.__lock, self.__connection:
+            row = self.__connection.execute(
+                "SELECT title FROM titles WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return (False, None)
+
+            self.__connection.execute(
+                "UPDATE titles SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+            return (True, row[0])
+
+    def put(self, key: str, title: Optional[str]) -> None:
+        """puts the title to the cache, and evicts titles if necessary"""
+        size = len(key) + (0 if title is None else len(title.encode("utf-8")))
+        with self.__lock, self.__connection:
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO titles VALUES (?, ?, ?, ?)",
+                (key, title, size, time.time()),
+            )
+            if self.max_size is not None:
+                self.__evict()
+
+    def __evict(self) -> None:
+        (total_size,) = self.__connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM titles"
+        ).fetchone()
+        excess = total_size - self.max_size
+        if excess <= 0:
+            return
+
+        keys = []
+        for key, size in self.__connection.execute(
+            "SELECT key, size FROM titles ORDER BY accessed"
+        ):
+            keys.append((key,))
+            excess = excess - size
+            if excess <= 0:
+                break
+
+        logger.info("evicting %d titles from the cache", len(keys))
+        self.__connection.executemany("DELETE FROM titles WHERE key = ?", keys)
+
+    def clear(self) -> None:
+        """removes all titles from the cache"""
+        with self.__lock, self.__connection:
+            self.__connection.execute("DELETE FROM titles")
+
+    def close(self) -> None:
+        """closes the database"""
+        with self.__lock:
+            self.__connection.close()
+
+
+# the caches opened in the process, see get_title_cache
+__TITLE_CACHES = {}
+__TITLE_CACHES_LOCK = threading.Lock()
+
+
+def get_title_cache(path: str, max_size: Optional[int] = None) -> TitleCache:
+    """
+    returns the TitleCache of path, it is opened only once in the process
+    max_size of the cache is updated if it is different
+    """
+    with __TITLE_CACHES_LOCK:
+        title_cache = __TITLE_CACHES.get(path)
+        if title_cache is None:
+            title_cache = TitleCache(path, max_size)
+            __TITLE_CACHES[path] = title_cache
+
+        else:
+            title_cache.max_size = max_size
+
+        return title_cache
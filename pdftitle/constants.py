@@ -8,3 +8,12 @@ ALGO_ORIGINAL = "original"
 ALGO_MAX2 = "max2"
 ALGO_ELIOT = "eliot"
 ALGO_OPENAI = "openai"
+
+# sources of the title, or the algorithm if the title is extracted from the page
+SOURCE_METADATA_STREAM = "metadata_stream"
+SOURCE_DOCUMENT_INFORMATION_DICTIONARY = "document_information_dictionary"
+SOURCE_CACHE = "cache"
+
+# output formats of the command line
+FORMAT_TEXT = "text"
+FORMAT_JSONL = "jsonl"
@@ -13,42 +13,101 @@ The references are from ISO 32000-2.
 import logging
 
 from pdfminer import utils
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LTPage
 from pdfminer.pdfdevice import PDFDevice
 from pdfminer.pdffont import PDFUnicodeNotDefined
 
-from .exceptions import PDFTitleException
+from .blocks import BlockStore
+from .exceptions import ExtractionBudgetExhausted, PDFTitleException
 
 
 logger = logging.getLogger(__name__)
 
 
+# pylint: disable=too-many-instance-attributes
 class TextOnlyDevice(PDFDevice):
     """PDFDevice implementation"""
 
-    def __init__(self, rsrcmgr, missing_char, translation_heuristic):
+    # pylint: disable=too-many-arguments, too-many-positional-arguments
+    def __init__(
+        self,
+        rsrcmgr,
+        missing_char,
+        translation_heuristic,
+        max_glyphs=None,
+        max_operators=None,
+        max_text_depth=None,
+    ):
         super().__init__(rsrcmgr)
         self.last_state = None
-        # contains (font, font_size, string)
-        self.blocks = []
-        # current block
-        # font, font size, glyph y, [chars]
-        self.current_block = None
+        # the last block in blocks is the current block
+        # new chars are added to it if font and font size are the same
+        self.blocks = BlockStore()
+        self.current_font = None
+        self.current_font_size = None
         # replacement missing_char
         self.missing_char = missing_char
         self.translation_heuristic = translation_heuristic
-
-    # at the end of the file, we need to recover last block
+        # extraction budget, None means no limit
+        # interpretation stops when max_glyphs are drawn or when max_operators are
+        # executed, the glyphs drawn below max_text_depth (a fraction of the page
+        # height from the top) are skipped
+        self.max_glyphs = max_glyphs
+        self.max_operators = max_operators
+        self.max_text_depth = max_text_depth
+        self.glyph_count = 0
+        self.operator_count = 0
+        # form xobjects entered and bytes of the content streams interpreted
+        self.xobject_count = 0
+        self.content_bytes = 0
+        # logging level is checked once per page, not for every glyph
+        self.debug = False
+        # glyphs below min_y exceed max_text_depth and are skipped, set in begin_page
+        self.min_y = None
+        # the budget is exhausted or a glyph is skipped
+        self.budget_exhausted = False
+        # cached text rendering matrix, see get_trm
+        self.__trm = None
+        self.__trm_tm = None
+        self.__trm_ctm = None
+        self.__trm_state = None
+        self.__tm_ctm = None
+
+    def begin_page(self, page, ctm):
+        self.debug = logger.isEnabledFor(logging.DEBUG)
+        if self.max_text_depth is not None:
+            # vertical range of the page in device space
+            (x0, y0, x1, y1) = page.mediabox
+            ys = [
+                utils.apply_matrix_pt(ctm, (x, y))[1]
+                for x in (x0, x1)
+                for y in (y0, y1)
+            ]
+            self.min_y = max(ys) - self.max_text_depth * (max(ys) - min(ys))
+            logger.info("min_y: %s", self.min_y)
+
+    def count_operator(self):
+        """count_operator is called by the interpreter for every operator"""
+        if self.max_operators is not None and self.operator_count >= self.max_operators:
+            self.budget_exhausted = True
+            raise ExtractionBudgetExhausted(f"max_operators={self.max_operators}")
+
+        self.operator_count = self.operator_count + 1
+
+    # at the end of the file, the last block is already in blocks
+    # but there should be at least one block
     def recover_last_paragraph(self):
         """recover_last_paragraph"""
-        if self.current_block is None:
+        if len(self.blocks) == 0:
+            if self.budget_exhausted:
+                raise PDFTitleException("no text found within the extraction budget")
+
             raise PDFTitleException(
-                "current block is None, this might be a bug. "
+                "no block is found, this might be a bug. "
                 + "please report it together with the pdf file"
             )
 
-        if len(self.current_block[4]) > 0:
-            self.blocks.append(self.current_block)
-
     # 9.4.4 Text space details
     # displacement after a glyph is painted, horizontal writing mode
     # w0: glyph's horizontal displacement
@@ -65,15 +124,73 @@ class TextOnlyDevice(PDFDevice):
         """new_ty"""
         return (w1 - Tj / 1000) * Tfs + Tc + Tw
 
+    # 9.4.4 Text space details
+    # Trm text rendering matrix
+    # Trm = [...] * Tm * CTM
+    # pylint: disable=invalid-name
+    def get_trm(self, ts):
+        """
+        returns the text rendering matrix
+        it is cached and calculated again only if Tm (except the translations by
+        translate_tm), CTM, Tfs, Th or Trise changes
+        """
+        state = (ts.Tfs, ts.Th, ts.Trise)
+        if (
+            ts.Tm is not self.__trm_tm
+            or self.ctm is not self.__trm_ctm
+            or state != self.__trm_state
+        ):
+            # fmt: off
+            Trm = utils.mult_matrix(
+                    utils.mult_matrix(
+                        (ts.Tfs * ts.Th,    0,              # ,0
+                         0,                 ts.Tfs,         # ,0
+                         0,                 ts.Trise        # ,1
+                         ), ts.Tm), self.ctm)
+
+            # fmt: on
+            if self.debug:
+                logger.debug("Trm %s", Trm)
+            self.__trm = Trm
+            self.__trm_tm = ts.Tm
+            self.__trm_ctm = self.ctm
+            self.__trm_state = state
+            # only the linear part of Tm * CTM is needed in translate_tm
+            self.__tm_ctm = utils.mult_matrix(ts.Tm, self.ctm)[0:4]
+
+        return self.__trm
+
+    # pylint: disable=invalid-name
+    def translate_tm(self, ts, tx, ty):
+        """
+        translates Tm by (tx, ty), and the cached text rendering matrix if it
+        is calculated with the current Tm
+        translating Tm is [1 0 0 1 tx ty] * Tm, thus Trm is translated by
+        [tx ty] * (Tm * CTM) since the rest of Trm does not change
+        """
+        if ts.Tm is self.__trm_tm:
+            (a, b, c, d) = self.__tm_ctm
+            (a0, b0, c0, d0, e0, f0) = self.__trm
+            self.__trm = (a0, b0, c0, d0, e0 + tx * a + ty * c, f0 + tx * b + ty * d)
+            ts.Tm = utils.translate_matrix(ts.Tm, (tx, ty))
+            self.__trm_tm = ts.Tm
+
+        else:
+            ts.Tm = utils.translate_matrix(ts.Tm, (tx, ty))
+
+    # pylint: disable=too-many-branches
     def process_string(self, ts, array):
         """process_string"""
-        logger.debug("process_string ts array=%s", array)
+        if self.debug:
+            logger.debug("process_string ts array=%s", array)
         for obj in array:
-            logger.debug('processing text obj="%s"', obj)
+            if self.debug:
+                logger.debug('processing text obj="%s"', obj)
             # if the obj is a number, it means a translation (Tj)
             if utils.isnumber(obj):
                 Tj = obj
-                logger.debug("processing translation=%s", Tj)
+                if self.debug:
+                    logger.debug("processing translation=%s", Tj)
                 # translating Tm, change tx and ty according to direction
                 # here glyph's displacement (w0, w1) is set to 0
                 if ts.Tf.is_vertical():
@@ -85,7 +202,7 @@ class TextOnlyDevice(PDFDevice):
                     ty = 0
 
                 # update Tm accordingly
-                ts.Tm = utils.translate_matrix(ts.Tm, (tx, ty))
+                self.translate_tm(ts, tx, ty)
                 # if there is a translation, there can be a word boundary
                 # if the displacement due to translation is larger than
                 # factor * the displacement due to space character
@@ -98,69 +215,45 @@ class TextOnlyDevice(PDFDevice):
                     ty_w = self.new_ty(w_space, 0, ts.Tfs, 0, ts.Tw)
                     add_space = False
                     if ts.Tf.is_vertical():
-                        logger.debug(
-                            "w_space=%s ty_w=%s Tj=%s ty=%s", w_space, ty_w, Tj, ty
-                        )
+                        if self.debug:
+                            logger.debug(
+                                "w_space=%s ty_w=%s Tj=%s ty=%s", w_space, ty_w, Tj, ty
+                            )
                         if ty >= (ty_w * factor):
                             add_space = True
 
                     else:
-                        logger.debug(
-                            "w_space=%s tx_w=%s Tj=%s tx=%s", w_space, tx_w, Tj, tx
-                        )
+                        if self.debug:
+                            logger.debug(
+                                "w_space=%s tx_w=%s Tj=%s tx=%s", w_space, tx_w, Tj, tx
+                            )
                         if tx >= (tx_w * factor):
                             add_space = True
 
-                    if add_space and self.current_block is not None:
-                        logger.debug("add space to block due to translation")
+                    if add_space and len(self.blocks) > 0:
+                        if self.debug:
+                            logger.debug("add space to block due to translation")
                         space = ts.Tf.to_unichr(32)
-                        self.current_block[4].append(space)
-
-                    logger.debug(
-                        "w=%s tx=%s ty=%s Tj=%s tx=%s ty=%s",
-                        w_space,
-                        self.new_tx(w_space, 0, ts.Tfs, 0, ts.Tw, ts.Th),
-                        self.new_ty(w_space, 0, ts.Tfs, 0, ts.Tw),
-                        Tj,
-                        self.new_tx(0, Tj, ts.Tfs, 0, ts.Tw, ts.Th),
-                        self.new_ty(0, Tj, ts.Tfs, 0, ts.Tw),
-                    )
+                        self.blocks.add_text(space)
+
+                    if self.debug:
+                        logger.debug(
+                            "w=%s tx=%s ty=%s Tj=%s tx=%s ty=%s",
+                            w_space,
+                            self.new_tx(w_space, 0, ts.Tfs, 0, ts.Tw, ts.Th),
+                            self.new_ty(w_space, 0, ts.Tfs, 0, ts.Tw),
+                            Tj,
+                            self.new_tx(0, Tj, ts.Tfs, 0, ts.Tw, ts.Th),
+                            self.new_ty(0, Tj, ts.Tfs, 0, ts.Tw),
+                        )
 
             else:
-                logger.debug("processing string")
+                if self.debug:
+                    logger.debug("processing string")
                 for cid in ts.Tf.decode(obj):
                     self.draw_cid(ts, cid)
 
-    # pylint: disable=too-many-branches
-    def draw_cid(self, ts, cid):
-        """draw_cid"""
-        logger.debug("drawing cid: %s", cid)
-        # 9.4.4 Text space details
-        # Trm text rendering matrix
-        # Trm = [...] * Tm * CTM
-        # fmt: off
-        Trm = utils.mult_matrix(
-                utils.mult_matrix(
-                    (ts.Tfs * ts.Th,    0,              # ,0
-                     0,                 ts.Tfs,         # ,0
-                     0,                 ts.Trise        # ,1
-                     ), ts.Tm), self.ctm)
-
-        # fmt: on
-        logger.debug("Trm %s", Trm)
-        # note: before v0.10, Trm[1] and Trm[2] is checked to be 0
-        # and if it is not, the character omitted (return from func)
-        # this is correct if only translation Trm[4,5] and
-        # scaling Trm[0,3] exists
-        # but theoretically Trm[1,2] can also have values
-
-        # textstate.Tw is used for spaces, otherwise it is 0
-        if cid == 32:
-            Tw = ts.Tw
-
-        else:
-            Tw = 0
-
+    def __add_glyph(self, ts, Trm, cid):
         try:
             unichar = ts.Tf.to_unichr(cid)
         except PDFUnicodeNotDefined as unicode_not_defined:
@@ -173,25 +266,64 @@ class TextOnlyDevice(PDFDevice):
                     + ", consider using --replace-missing-char option"
                 ) from unicode_not_defined
 
-        (gx, gy) = utils.apply_matrix_pt(Trm, (0, 0))
-        logger.debug("drawing unichar: %s @%d,%d", unichar, gx, gy)
-        tfs = Trm[0]
-        # if there is no current block, create one
-        if self.current_block is None:
-            self.current_block = (ts.Tf, tfs, gx, gy, [unichar])
+        # glyph origin, apply_matrix_pt(Trm, (0, 0))
+        gx = Trm[4]
+        gy = Trm[5]
+        if self.debug:
+            logger.debug("drawing unichar: %s @%d,%d", unichar, gx, gy)
+        if self.max_glyphs is not None and self.glyph_count >= self.max_glyphs:
+            self.budget_exhausted = True
+            raise ExtractionBudgetExhausted(f"max_glyphs={self.max_glyphs}")
+
+        self.glyph_count = self.glyph_count + 1
 
+        tfs = Trm[0]
         # if there is a current block, check if it is the same font and same font size
         # if so, then append the char to the current block
-        elif (self.current_block[0] == ts.Tf) and (self.current_block[1] == tfs):
-            self.current_block[4].append(unichar)
+        if (self.current_font is ts.Tf) and (self.current_font_size == tfs):
+            self.blocks.add_text(unichar, gy)
+
+        # if there is no current block or font and/or font size is different,
+        # a new block is created
+        else:
+            self.blocks.add_block(ts.Tf, tfs, gx, gy)
+            self.blocks.add_text(unichar)
+            self.current_font = ts.Tf
+            self.current_font_size = tfs
+
+        if self.debug:
+            logger.debug("current block: %s", self.blocks[-1])
+
+    def draw_cid(self, ts, cid):
+        """draw_cid"""
+        if self.debug:
+            logger.debug("drawing cid: %s", cid)
+        Trm = self.get_trm(ts)
+        # note: before v0.10, Trm[1] and Trm[2] is checked to be 0
+        # and if it is not, the character omitted (return from func)
+        # this is correct if only translation Trm[4,5] and
+        # scaling Trm[0,3] exists
+        # but theoretically Trm[1,2] can also have values
+
+        # textstate.Tw is used for spaces, otherwise it is 0
+        if cid == 32:
+            Tw = ts.Tw
+
+        else:
+            Tw = 0
+
+        # Trm[5] is the y of the glyph origin
+        if self.min_y is not None and Trm[5] < self.min_y:
+            # the glyph is skipped (not recorded, not counted and its unicode is
+            # not needed), the text above can be drawn later since it is not
+            # necessarily drawn from the top, a skipped glyph ends the current block
+            self.budget_exhausted = True
+            self.current_font = None
+            self.current_font_size = None
 
-        # if font and/or font size is different, a new block is created
         else:
-            self.blocks.append(self.current_block)
-            self.current_block = (ts.Tf, tfs, gx, gy, [unichar])
+            self.__add_glyph(ts, Trm, cid)
 
-        logger.debug("current block: %s", self.current_block)
-        logger.debug("blocks: %s", self.blocks)
         # update text matrix according to glyph's displacement
         w = ts.Tf.char_width(cid)
         # below Tj is set to zero because the translation values in text objects
@@ -205,4 +337,39 @@ class TextOnlyDevice(PDFDevice):
             ty = 0
 
         # update text matrix by the combined displacement
-        ts.Tm = utils.translate_matrix(ts.Tm, (tx, ty))
+        self.translate_tm(ts, tx, ty)
+
+
+class RegionTextConverter(TextConverter):
+    """
+    TextConverter implementation analyzing the layout of only a part of the page
+    layout analysis is the most expensive part of text extraction, and when only
+    the text around a few blocks is needed, the rest of the page is discarded
+    before the analysis
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, rsrcmgr, outfp, laparams=None, region=None):
+        super().__init__(rsrcmgr, outfp, laparams=laparams)
+        # (min y, max y) in device space, None means the whole page
+        self.region = region
+
+    def end_page(self, page):
+        if self.region is not None:
+            (ymin, ymax) = self.region
+            ltpage = LTPage(
+                self.cur_item.pageid, self.cur_item.bbox, self.cur_item.rotate
+            )
+            # keep the items (chars, figures) overlapping with the region
+            ltpage.extend(
+                item for item in self.cur_item if item.y1 >= ymin and item.y0 <= ymax
+            )
+            logger.debug(
+                "%d of %d items are in the region %s",
+                len(ltpage),
+                len(self.cur_item),
+                self.region,
+            )
+            self.cur_item = ltpage
+
+        super().end_page(page)
@@ -7,3 +7,10 @@
 
 class PDFTitleException(Exception):
     """base class for all pdftitle exceptions"""
+
+
+class ExtractionBudgetExhausted(PDFTitleException):
+    """
+    raised by the device or the interpreter to stop the interpretation of the page
+    when the extraction budget is exhausted, it is handled by the interpreter
+    """
@@ -0,0 +1,208 @@
+# SPDX-FileCopyrightText: 2024 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+This module has a PDFResourceManager implementation sharing the fonts between
+documents.
+PDFResourceManager caches the fonts by their object ids, so a font can be reused only
+in the same document. FontCachingResourceManager caches the fonts by their content,
+so the same font embedded in many documents is created only once. The key of a font
+is the base font name and a digest of the font dictionary (including the font
+descriptor, widths and encoding) where the streams (the embedded font program and
+ToUnicode) are only their attributes and lengths. The data of the streams is
+compared only when a font with the same key is in the cache. The cache is bounded
+and the least recently used fonts are removed.
+The references to the document (PDFObjRef and the streams of the font) are removed
+from the cached fonts, so the documents are not kept alive by the cache.
+"""
+
+from array import array
+from collections import OrderedDict
+import hashlib
+import logging
+import threading
+from typing import Optional, Tuple
+
+from pdfminer.pdfinterp import PDFResourceManager
+from pdfminer.pdftypes import PDFObjRef, PDFStream
+from pdfminer.psparser import LIT, PSKeyword, PSLiteral, literal_name
+
+
+logger = logging.getLogger(__name__)
+
+LITERAL_TYPE3 = LIT("Type3")
+
+
+# pylint: disable=too-many-branches
+def __update_digest(digest, obj, visited: set, streams: list) -> None:
+    # the data of the streams is not in the digest, it is appended to streams
+    while isinstance(obj, PDFObjRef):
+        # object ids are not used in the digest, they are different in every document
+        if obj.objid in visited:
+            digest.update(b"R")
+            return
+
+        visited.add(obj.objid)
+        obj = obj.resolve()
+
+    if isinstance(obj, dict):
+        digest.update(b"<<")
+        for key in sorted(obj.keys(), key=str):
+            digest.update(b"/%s " % str(key).encode("utf-8"))
+            __update_digest(digest, obj[key], visited, streams)
+
+        digest.update(b">>")
+
+    elif isinstance(obj, list):
+        # lists of numbers (e.g. Widths and W) are added at once
+        try:
+            numbers = array("d", obj)
+            digest.update(b"[%d numbers " % len(numbers))
+            digest.update(numbers)
+
+        except TypeError:
+            digest.update(b"[")
+            for item in obj:
+                __update_digest(digest, item, visited, streams)
+
+        digest.update(b"]")
+
+    elif isinstance(obj, PDFStream):
+        __update_digest(digest, obj.attrs, visited, streams)
+        # the data is decoded if the stream is already used
+        if obj.rawdata is not None:
+            data = obj.rawdata
+            digest.update(b"raw %d " % len(data))
+
+        else:
+            data = obj.get_data()
+            digest.update(b"data %d " % len(data))
+
+        streams.append(data)
+
+    elif isinstance(obj, bytes):
+        digest.update(b"(%d " % len(obj))
+        digest.update(obj)
+
+    elif isinstance(obj, PSLiteral):
+        digest.update(b"/%s " % str(obj.name).encode("utf-8"))
+
+    elif isinstance(obj, PSKeyword):
+        digest.update(b"K%s " % str(obj.name).encode("utf-8"))
+
+    else:
+        # numbers, booleans and None
+        digest.update(b"%s:%s " % (type(obj).__name__.encode(), str(obj).encode()))
+
+
+def get_font_key(spec: dict) -> Tuple[tuple, tuple]:
+    """
+    returns ((base font name, digest of spec), data of the streams in spec)
+    the first is the key of the font in the cache, the streams are not in the digest
+    (only their attributes and lengths), the data is not copied
+    """
+    digest = hashlib.sha256()
+    streams = []
+    __update_digest(digest, spec, set(), streams)
+    base_font = spec.get("BaseFont")
+    if isinstance(base_font, PSLiteral):
+        base_font = literal_name(base_font)
+
+    return ((base_font, digest.digest()), tuple(streams))
+
+
+def __detach(obj):
+    # returns obj without the references to the document, PDFObjRef is replaced
+    # by a reference without the document and the streams are removed
+    # the fonts use these only when they are created
+    if isinstance(obj, PDFObjRef):
+        return PDFObjRef(None, obj.objid)
+
+    if isinstance(obj, PDFStream):
+        return None
+
+    if isinstance(obj, dict):
+        return {key: __detach(value) for key, value in obj.items()}
+
+    if isinstance(obj, list):
+        return [__detach(item) for item in obj]
+
+    return obj
+
+
+def detach_font(font) -> None:
+    """removes the references to the document from the attributes of font"""
+    for name, value in vars(font).items():
+        if isinstance(value, (PDFObjRef, PDFStream, dict, list)):
+            setattr(font, name, __detach(value))
+
+
+class FontCachingResourceManager(PDFResourceManager):
+    """PDFResourceManager implementation caching the fonts by their content"""
+
+    def __init__(self, max_fonts: int):
+        # fonts are not cached by object ids, see the module docstring
+        super().__init__(caching=False)
+        self.max_fonts = max_fonts
+        self.__fonts = OrderedDict()
+        # the same instance can be used by many threads
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_font(self, objid, spec):
+        # fonts given as direct objects, and the descendant fonts of Type0 fonts
+        # (get_font is called again for them), are not cached
+        # Type3 fonts have glyph descriptions and resources of the document
+        if objid is None or spec.get("Subtype") is LITERAL_TYPE3:
+            return super().get_font(objid, spec)
+
+        (key, streams) = get_font_key(spec)
+        with self.__lock:
+            # the fonts with the same key, as (data of the streams, font)
+            fonts = self.__fonts.get(key)
+            if fonts is not None:
+                self.__fonts.move_to_end(key)
+                for cached_streams, font in fonts:
+                    # bytes are compared only if they have the same length
+                    if cached_streams == streams:
+                        self.hits = self.hits + 1
+                        logger.debug("font %s found in the cache", key[0])
+                        return font
+
+            self.misses = self.misses + 1
+
+        logger.debug("creating font %s", key[0])
+        font = super().get_font(objid, spec)
+        detach_font(font)
+        with self.__lock:
+            self.__fonts.setdefault(key, []).append((streams, font))
+            # the fonts with the same key are removed together
+            while len(self.__fonts) > self.max_fonts:
+                self.__fonts.popitem(last=False)
+
+        return font
+
+
+# the instance shared in the process, see get_shared_resource_manager
+__SHARED_RESOURCE_MANAGER: Optional[FontCachingResourceManager] = None
+__SHARED_RESOURCE_MANAGER_LOCK = threading.Lock()
+
+
+def get_shared_resource_manager(max_fonts: int) -> FontCachingResourceManager:
+    """
+    returns the FontCachingResourceManager shared in the process
+    it is created when this is called for the first time, max_fonts of the cache is
+    updated if it is different
+    """
+    # pylint: disable=global-statement
+    global __SHARED_RESOURCE_MANAGER
+    with __SHARED_RESOURCE_MANAGER_LOCK:
+        if __SHARED_RESOURCE_MANAGER is None:
+            __SHARED_RESOURCE_MANAGER = FontCachingResourceManager(max_fonts)
+
+        else:
+            __SHARED_RESOURCE_MANAGER.max_fonts = max_fonts
+
+        return __SHARED_RESOURCE_MANAGER
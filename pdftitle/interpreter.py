@@ -4,7 +4,8 @@
 
 """
 This module has an Interpreter and TextState implementation.
-Interpreter only interprets the operations relevant for pdftitle and uses a TextState
+Interpreter only interprets the operations relevant for pdftitle (the content stream
+is split by scanner.py) and uses a TextState
 instance.
 Interpreter calls Device implementation for actually (fake) drawing the text.
 The references are from ISO 32000-2.
@@ -13,12 +14,41 @@ The references are from ISO 32000-2.
 import logging
 
 from pdfminer import utils
-from pdfminer.pdfinterp import PDFPageInterpreter, PDFInterpreterError
+from pdfminer.pdfinterp import PDFPageInterpreter
+from pdfminer.pdfinterp import PDFInterpreterError
+from pdfminer.pdftypes import stream_value
 from pdfminer.psparser import literal_name
 
+from .exceptions import ExtractionBudgetExhausted
+from .scanner import iter_operators, parse_operands
+
 
 logger = logging.getLogger(__name__)
 
+# operators not relevant for pdftitle, their operands are discarded
+# 8.4.4 Graphics state operators (except q, Q and cm), Table 56
+# 8.5.2 Path construction operators, Table 58
+# 8.5.3 Path-painting operators, Table 59
+# 8.5.4 Clipping path operators, Table 60
+# 8.6.8 Colour operators, Table 73
+# 8.7.4.2 Shading operator, Table 76
+# 8.9.7 Inline images, Table 90
+# 14.6 Marked content, Table 352
+# 7.8.2 Content streams, compatibility operators, Table 33
+IGNORED_OPERATORS = frozenset(
+    [
+        "w", "J", "j", "M", "d", "ri", "i", "gs",
+        "m", "l", "c", "v", "y", "h", "re",
+        "S", "s", "f", "F", "f*", "B", "B*", "b", "b*", "n",
+        "W", "W*",
+        "CS", "cs", "G", "g", "RG", "rg", "K", "k", "SCN", "scn", "SC", "sc",
+        "sh",
+        "BI", "ID", "EI",
+        "MP", "DP", "BMC", "BDC", "EMC",
+        "BX", "EX",
+    ]
+)  # fmt: skip
+
 
 # 9.3 Text state parameters and operators
 class TextState:
@@ -91,6 +121,7 @@ class TextState:
         self.Tlm = None
 
 
+# a method for every text operator
 # pylint: disable=too-many-public-methods
 class TextOnlyInterpreter(PDFPageInterpreter):
     """PDFPageInterpreter implementation"""
@@ -99,323 +130,143 @@ class TextOnlyInterpreter(PDFPageInterpreter):
         super().__init__(rsrcmgr, device)
         # using TextState above instead of self.textstate:PDFTextState
         self.mpts = TextState()
-        self.log_all_operators = False
-
-    # omit graphics state changing operators
-    def do_w(self, linewidth):
-        """set line width"""
-        if self.log_all_operators:
-            logger.debug("w linewidth=%s", linewidth)
-
-    def do_J(self, linecap):
-        """set line cap style"""
-        if self.log_all_operators:
-            logger.debug("J linecap=%s", linecap)
-
-    def do_j(self, linejoin):
-        """set line join style"""
-        if self.log_all_operators:
-            logger.debug("j linejoin=%s", linejoin)
-
-    def do_M(self, miterlimit):
-        """set miter limit"""
-        if self.log_all_operators:
-            logger.debug("M miterlimit=%s", miterlimit)
-
-    def do_d(self, dash, phase):
-        """set line dash pattern"""
-        if self.log_all_operators:
-            logger.debug("d dash=%s phase=%s", dash, phase)
-
-    def do_ri(self, intent):
-        """set color rendering intent"""
-        if self.log_all_operators:
-            logger.debug("ri intent=%s", intent)
-
-    def do_i(self, flatness):
-        """set flatness tolerance"""
-        if self.log_all_operators:
-            logger.debug("i flatness=%s", flatness)
-
-    def do_gs(self, name):
-        """set parameters from graphics state parameter dictionary"""
-        if self.log_all_operators:
-            logger.debug("gs name=%s", name)
-
-    def do_m(self, x, y):
-        """being new subpath"""
-        if self.log_all_operators:
-            logger.debug("m x=%s y=%s", x, y)
-
-    def do_l(self, x, y):
-        """append straight line segment to path"""
-        if self.log_all_operators:
-            logger.debug("l x=%s y=%s", x, y)
+        # operator name (bytes) to (method, number of operands), see get_operator
+        self.operators = {}
 
-    # pylint: disable=too-many-arguments, too-many-positional-arguments
-    def do_c(self, x1, y1, x2, y2, x3, y3):
-        """append curved segment to path"""
-        if self.log_all_operators:
-            logger.debug("c")
-
-    def do_v(self, x2, y2, x3, y3):
-        """append curved segment to path (initial point replicated)"""
-        if self.log_all_operators:
-            logger.debug("v")
-
-    def do_y(self, x1, y1, x3, y3):
-        """append curved segment to path (final point replicated)"""
-        if self.log_all_operators:
-            logger.debug("y")
-
-    def do_h(self):
-        """close subpath"""
-        if self.log_all_operators:
-            logger.debug("h")
-
-    def do_re(self, x, y, w, h):
-        """append rectangle to path"""
-        if self.log_all_operators:
-            logger.debug("re")
-
-    def do_S(self):
-        """stroke path"""
-        if self.log_all_operators:
-            logger.debug("S")
-
-    def do_s(self):
-        """close and stroke path"""
-        if self.log_all_operators:
-            logger.debug("s")
-
-    def do_f(self):
-        """fill path using nonzero winding number rule"""
-        if self.log_all_operators:
-            logger.debug("f")
-
-    def do_F(self):
-        """fill path using nonzero winding number rule (obsolete)"""
-        if self.log_all_operators:
-            logger.debug("F")
-
-    def do_f_a(self):
-        """fill path using even-odd rule"""
-        if self.log_all_operators:
-            logger.debug("fa")
-
-    def do_B(self):
-        """fill and stroke path using nonzero winding number rule"""
-        if self.log_all_operators:
-            logger.debug("B")
-
-    def do_B_a(self):
-        """fill and stroke path using even-odd rule"""
-        if self.log_all_operators:
-            logger.debug("Ba")
-
-    def do_b(self):
-        """close, fill, and stroke path using nonzero winding number rule"""
-        if self.log_all_operators:
-            logger.debug("b")
-
-    def do_b_a(self):
-        """close, fill, and stroke path using even-odd rule"""
-        if self.log_all_operators:
-            logger.debug("ba")
-
-    def do_n(self):
-        """end path without filling or stroking"""
-        if self.log_all_operators:
-            logger.debug("n")
-
-    def do_W(self):
-        """set clipping path using nonzero winding number rule"""
-        if self.log_all_operators:
-            logger.debug("W")
-
-    def do_W_a(self):
-        """set clipping path using even-odd rule"""
-        if self.log_all_operators:
-            logger.debug("Wa")
-
-    def do_CS(self, name):
-        """set color space for stroking operations"""
-        if self.log_all_operators:
-            logger.debug("CS")
-
-    def do_cs(self, name):
-        """set color space for nonstroking operations"""
-        if self.log_all_operators:
-            logger.debug("cs")
-
-    def do_G(self, gray):
-        """set gray level for stroking operations"""
-        if self.log_all_operators:
-            logger.debug("G")
-
-    def do_g(self, gray):
-        """set gray level for nonstroking operations"""
-        if self.log_all_operators:
-            logger.debug("g")
-
-    def do_RG(self, r, g, b):
-        """set RGB color for stroking operations"""
-        if self.log_all_operators:
-            logger.debug("RG")
-
-    def do_rg(self, r, g, b):
-        """set RGB color for nonstroking operations"""
-        if self.log_all_operators:
-            logger.debug("rg")
-
-    def do_K(self, c, m, y, k):
-        """set CMYK color for stroking operations"""
-        if self.log_all_operators:
-            logger.debug("K")
-
-    def do_k(self, c, m, y, k):
-        """Set CMYK color for nonstroking operations"""
-        if self.log_all_operators:
-            logger.debug("k")
-
-    def do_SCN(self):
-        """set color for stroking operations"""
-        if self.log_all_operators:
-            logger.debug("SCN")
-
-    def do_scn(self):
-        """set color for nonstroking operations"""
-        if self.log_all_operators:
-            logger.debug("scn")
-
-    def do_SC(self):
-        """set color for stroking operations"""
-        if self.log_all_operators:
-            logger.debug("SC")
-
-    def do_sc(self):
-        """set color for nonstroking operations"""
-        if self.log_all_operators:
-            logger.debug("sc")
-
-    def do_sh(self, name):
-        """paint area defined by shading pattern"""
-        if self.log_all_operators:
-            logger.debug("sh")
-
-    def do_BX(self):
-        """begin compatibility section"""
-        if self.log_all_operators:
-            logger.debug("BX")
-
-    def do_EX(self):
-        """end compatibility section"""
-        if self.log_all_operators:
-            logger.debug("EX")
-
-    def do_MP(self, tag):
-        """define marked-content point"""
-        if self.log_all_operators:
-            logger.debug("MP tag=%s", tag)
-
-    def do_DP(self, tag, props):
-        """define marked-content point with property list"""
-        if self.log_all_operators:
-            logger.debug("DP tag=%s props=%s", tag, props)
-
-    def do_BMC(self, tag):
-        """begin marked-content sequence"""
-        if self.log_all_operators:
-            logger.debug("BMC tag=%s", tag)
-
-    def do_BDC(self, tag, props):
-        """begin marked-content sequence with property list"""
-        if self.log_all_operators:
-            logger.debug("BDC tag=%s props=%s", tag, props)
-
-    def do_EMC(self):
-        """end marked-content sequence"""
-        if self.log_all_operators:
-            logger.debug("EMC")
-
-    def do_BI(self):
-        """begin inline image object"""
-        if self.log_all_operators:
-            logger.debug("BI")
-
-    def do_ID(self):
-        """begin inline image data"""
-        if self.log_all_operators:
-            logger.debug("ID")
-
-    def do_EI(self, obj):
-        """end inline image object"""
-        if self.log_all_operators:
-            logger.debug("EI")
+    def process_page(self, page):
+        try:
+            super().process_page(page)
+        except ExtractionBudgetExhausted as budget_exhausted:
+            logger.info("extraction budget is exhausted: %s", budget_exhausted)
+
+    def dup(self):
+        # an interpreter is created for every form xobject, see do_Do
+        self.device.xobject_count = self.device.xobject_count + 1
+        return super().dup()
+
+    def get_operator(self, name):
+        """
+        returns (method, number of operands) implementing the operator
+        number of operands is None if the method takes all the operands
+        returns None if the operator is ignored or not implemented
+        """
+        if name in IGNORED_OPERATORS:
+            return None
+
+        method = "do_" + (name.replace("*", "_a").replace('"', "_w").replace("'", "_q"))
+        func = getattr(self, method, None)
+        if func is None:
+            return None
+
+        return (func, func.__code__.co_argcount - 1)
+
+    # this is similar to PDFPageInterpreter.execute
+    # but the content stream is split into the operators by scanner.iter_operators
+    # and the operands are parsed only for the operators not ignored
+    # every operator is counted for the extraction budget
+    def execute(self, streams):
+        # new pdfminer versions keep the streams of the parent interpreters
+        # to refuse circular references (see PDFPageInterpreter.subinterp)
+        parent_stream_ids = getattr(self, "parent_stream_ids", set())
+        valid_streams = []
+        for obj in streams:
+            stream = stream_value(obj)
+            if stream.objid is not None and stream.objid in parent_stream_ids:
+                logger.warning(
+                    "refusing to execute circular reference to content stream %d",
+                    stream.objid,
+                )
+
+            else:
+                valid_streams.append(stream)
+
+        if hasattr(self, "stream_ids"):
+            self.stream_ids.clear()
+            self.stream_ids.update(
+                stream.objid for stream in valid_streams if stream.objid is not None
+            )
+
+        # streams are divided at token boundaries, 7.8.2 Content streams
+        data = b"\n".join(stream.get_data() for stream in valid_streams)
+        self.device.content_bytes = self.device.content_bytes + len(data)
+        operators = self.operators
+        for operator_name, start, end in iter_operators(data):
+            self.device.count_operator()
+            try:
+                operator = operators[operator_name]
+            except KeyError:
+                operator = self.get_operator(operator_name.decode("latin-1"))
+                operators[operator_name] = operator
+
+            # the operands of ignored operators are not parsed
+            if operator is None:
+                continue
+
+            (func, nargs) = operator
+            if nargs == 0:
+                func()
+                continue
+
+            args = parse_operands(data, start, end)
+            if nargs is None:
+                func(*args)
+
+            elif len(args) >= nargs:
+                func(*args[len(args) - nargs :])
 
     # 9. Text
     # 9.4.1 General and Table 105
     def do_BT(self):
         """begin text object"""
-        logger.debug("BT")
         self.mpts.on_BT()
 
     def do_ET(self):
         """end a text object"""
-        logger.debug("ET")
         self.mpts.on_ET()
 
     # 9.3 Text state parameters and operators
     def do_Tc(self, space):
         """set character spacing"""
-        logger.debug("Tc space=%s", space)
         self.mpts.Tc = space
 
     def do_Tw(self, space):
         """set the word spacing"""
-        logger.debug("Tw space=%s", space)
         self.mpts.Tw = space
 
     def do_Tz(self, scale):
         """set the horizontal scaling"""
-        logger.debug("Tz scale=%s", scale)
         self.mpts.Th = scale * 0.01
 
     def do_TL(self, leading):
         """set the text leading"""
-        logger.debug("TL leading=%s", leading)
         self.mpts.Tl = leading
 
     def do_Tf(self, fontid, fontsize):
         """set the text font"""
-        logger.debug("Tf fontid=%s, fontsize=%s", fontid, fontsize)
         try:
             self.mpts.Tf = self.fontmap[literal_name(fontid)]
-            logger.debug("font=%s", self.mpts.Tf.fontname)
             self.mpts.Tfs = fontsize
         except KeyError as key_error:
             raise PDFInterpreterError(f"Undefined Font id: {fontid}") from key_error
 
     def do_Tr(self, render):
         """set the text rendering mode"""
-        logger.debug("Tr render=%s", render)
         self.mpts.Tmode = render
 
+    # pylint: disable=unused-argument
     def do_Ts(self, rise):
         """Set the text rise"""
-        logger.debug("Ts rise=%s", rise)
+        # text rise is not used, baselines are compared without it
 
     # text-positioning operators
     # 9.4.2 Text-poitioning operators and Table 106
     def do_Td(self, tx, ty):
         """move to the start of the next line"""
-        logger.debug("Td tx=%s, ty=%s", tx, ty)
         self.mpts.Tlm = utils.translate_matrix(self.mpts.Tlm, (tx, ty))
         self.mpts.Tm = self.mpts.Tlm
 
     def do_TD(self, tx, ty):
         """move to the start of the next line, also set leading"""
-        logger.debug("TD tx=%s, ty=%s", tx, ty)
         # TD has the same effect as this code, Table 106
         self.do_TL(-ty)
         self.do_Td(tx, ty)
@@ -423,14 +274,12 @@ class TextOnlyInterpreter(PDFPageInterpreter):
     # pylint: disable=too-many-arguments, too-many-positional-arguments
     def do_Tm(self, a, b, c, d, e, f):
         """set text matrix and text line matrix"""
-        logger.debug("Tm matrix=%s, %s, %s, %s, %s, %s", a, b, c, d, e, f)
         self.mpts.Tlm = (a, b, c, d, e, f)
         self.mpts.Tm = self.mpts.Tlm
 
     # T*
     def do_T_a(self):
         """move to the start of the next text line"""
-        logger.debug("T*")
         # T* has the same effect as this code, Table 106
         self.do_TD(0, -self.mpts.Tl)
 
@@ -442,33 +291,45 @@ class TextOnlyInterpreter(PDFPageInterpreter):
     # if number, it is the number to adjust text position, it translates Tm
     def do_TJ(self, seq):
         """show text, allowing individual glyph positioning"""
-        logger.debug("TJ seq=%s", seq)
         self.device.process_string(self.mpts, seq)
 
     def do_Tj(self, s):
         """show text"""
-        logger.debug("Tj s=%s", s)
         self.do_TJ([s])
 
     def do__q(self, s):
         """move to the next line and show the text"""
-        logger.debug("q s=%s", s)
         # ' has the same effect as this code, Table 107
         self.do_T_a()
         self.do_Tj(s)
 
     def do__w(self, aw, ac, s):
         """move to the next line and show the text"""
-        logger.debug('" aw=%s, ac=%s, s=%s', aw, ac, s)
         # " has the same effect as this code, Table 107
         self.do_Tw(aw)
         self.do_Tc(ac)
         self.do__q(s)
 
-    # include XObject
 
-    def do_Do(self, xobjid_arg):
-        logger.debug("Do xobjid_arg=%s", xobjid_arg)
-        # the method in the super class navigates to XObject and tries to render it
-        # thus calls the appropriate feedback methods here
-        super().do_Do(xobjid_arg)
+class TracingTextOnlyInterpreter(TextOnlyInterpreter):
+    """
+    TextOnlyInterpreter logging every operator and its operands
+    this is used only in debug logging level
+    """
+
+    def get_operator(self, name):
+        operator = super().get_operator(name)
+        if operator is None:
+
+            def ignore(*args):
+                logger.debug("%s %s (ignored)", name, args)
+
+            return (ignore, None)
+
+        (func, nargs) = operator
+
+        def trace(*args):
+            logger.debug("%s %s", name, args)
+            func(*args)
+
+        return (trace, nargs)
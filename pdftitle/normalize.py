@@ -0,0 +1,88 @@
+# SPDX-FileCopyrightText: 2024 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+title normalization
+The steps are str methods or translate tables built once when the module is
+imported, so no step loops over the characters of the title in Python.
+"""
+
+import logging
+import string
+import unicodedata
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+# latin ligatures (ff, fi, fl, ffi, ffl, ft, st) to individual chars
+# see: Unicode Alphabetic Presentation Forms
+# https://unicode.org/charts/PDF/UFB00.pdf
+LIGATURES = str.maketrans(
+    {
+        "ﬀ": "ff",
+        "ﬁ": "fi",
+        "ﬂ": "fl",
+        "ﬃ": "ffi",
+        "ﬄ": "ffl",
+        "ﬅ": "ft",
+        "ﬆ": "st",
+    }
+)
+
+# file names have only lowercase ascii letters, digits and _ (for space)
+# the title is lowercased and encoded to ascii first, so only ascii is mapped here
+__FILE_NAME_CHARS = (string.ascii_lowercase + string.digits + " ").encode("ascii")
+__FILE_NAME_TABLE = bytes.maketrans(b" ", b"_")
+__FILE_NAME_DELETE = bytes(c for c in range(128) if c not in __FILE_NAME_CHARS)
+
+
+def convert_ligatures(text: str) -> str:
+    """converts latin ligatures (ff, fi, fl, ffi, ffl, ft, st) to individual chars"""
+    return text.translate(LIGATURES)
+
+
+def fold_compatibility(text: str) -> str:
+    """
+    replaces the compatibility characters (e.g. ligatures, full-width letters,
+    superscripts) with their equivalents (Unicode normalization form NFKC)
+    """
+    return unicodedata.normalize("NFKC", text)
+
+
+def collapse_whitespace(text: str) -> str:
+    """replaces the whitespace runs with a single space and strips the text"""
+    return " ".join(text.split())
+
+
+def get_file_name(title: str) -> str:
+    """returns the file name (with .pdf extension) for the title"""
+    file_name = title.lower().encode("ascii", "ignore")
+    file_name = file_name.translate(__FILE_NAME_TABLE, __FILE_NAME_DELETE)
+    return file_name.decode("ascii") + ".pdf"
+
+
+def normalize_title(title: Optional[str], params) -> Optional[str]:
+    """
+    returns the title normalized as in params (GetTitleParameters)
+    title case, ligature conversion, compatibility folding and whitespace collapsing
+    are applied in this order if they are enabled
+    """
+    if title is None:
+        return None
+
+    if params.title_case:
+        title = title.title()
+
+    if params.convert_ligatures:
+        title = convert_ligatures(title)
+
+    if params.fold_compatibility:
+        title = fold_compatibility(title)
+
+    if params.collapse_whitespace:
+        title = collapse_whitespace(title)
+
+    logger.info("normalized title: %s", title)
+    return title
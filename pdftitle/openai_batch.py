@@ -0,0 +1,429 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+OpenAI Batch API mode
+The titles of many PDF files are asked to OpenAI with the Batch API instead of
+a request per file. The text at the top of the page of every file (like
+--openai-text, see get_blocks_text_from_io) is a request in a batch input file,
+the batches are submitted, polled until they are finished and their results are
+mapped back to the files.
+The state of the job (the submitted batches, the files of their requests and the
+results) is saved in a JSON file after every step, so an interrupted job is
+continued by running it again with the same state file. The files in a submitted
+batch are not submitted again, the batch is polled. A batch is saved before its
+input file is uploaded and before it is created, so if the job is interrupted
+between these, the input file or the batch is found on OpenAI when the job is
+continued. The input, output and error files of a batch are deleted from OpenAI
+after its results are saved.
+"""
+
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import Iterable, Iterator, Optional, Tuple
+
+from .batch import BatchResult
+from .constants import ALGO_OPENAI
+from .exceptions import PDFTitleException
+from .normalize import normalize_title
+from .openai_gateway import add_openai_usage, get_openai_client
+from .openai_gateway import get_text_request_body
+from .pdftitle import OPENAI_TEXT_MAX_CHARS, GetTitleParameters
+from .pdftitle import get_blocks_text_from_file
+
+
+logger = logging.getLogger(__name__)
+
+# limits of a batch (50000 requests and 200 MB input file)
+# see: https://platform.openai.com/docs/guides/batch
+MAX_REQUESTS = 50000
+MAX_INPUT_SIZE = 190 << 20
+
+# the status of a batch does not change after these
+__FINISHED_STATUSES = frozenset(["completed", "failed", "expired", "cancelled"])
+
+
+def __get_text_parameters(params: GetTitleParameters) -> dict:
+    # the parameters changing the text of a request, a job is not continued with
+    # different parameters, otherwise its results would be mixed
+    return {
+        "page_number": params.page_number,
+        "replace_missing_char": params.replace_missing_char,
+        "max_glyphs": params.max_glyphs,
+        "max_operators": params.max_operators,
+        "max_text_depth": params.max_text_depth,
+        "max_chars": OPENAI_TEXT_MAX_CHARS,
+    }
+
+
+def __load_state(state_path: str, params: GetTitleParameters) -> dict:
+    parameters = __get_text_parameters(params)
+    if not os.path.exists(state_path):
+        return {
+            "model": params.openai_model,
+            "parameters": parameters,
+            # the names of the input files of the job are unique with this
+            "job": os.urandom(8).hex(),
+            "next_id": 0,
+            "batches": [],
+            "results": {},
+        }
+
+    with open(state_path, encoding="utf-8") as file_reader:
+        state = json.load(file_reader)
+
+    if state["model"] != params.openai_model:
+        raise PDFTitleException(
+            f"{state_path} is a batch job of {state['model']} "
+            + f"not {params.openai_model}"
+        )
+
+    saved = state.get("parameters") or {}
+    names = [
+        name
+        for name, value in parameters.items()
+        if name not in saved or saved[name] != value
+    ]
+    if len(names) > 0:
+        raise PDFTitleException(
+            f"{state_path} is a batch job of different parameters: {', '.join(names)}"
+        )
+
+    return state
+
+
+def __save_state(state_path: str, state: dict) -> None:
+    # the state file is replaced at once, so it is not broken if interrupted
+    directory = os.path.dirname(os.path.abspath(state_path))
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=directory, delete=False
+    ) as file_writer:
+        json.dump(state, file_writer)
+
+    os.replace(file_writer.name, state_path)
+
+
+def __init_worker(logging_level: int) -> None:
+    # worker processes are not forked on every platform
+    # so logging level is set explicitly
+    logging.getLogger("pdftitle").setLevel(logging_level)
+
+
+def __get_text(pdf_file: str, params: GetTitleParameters) -> Tuple[str, str, list]:
+    # returns (pdf_file, text, result), result is not None if there is no request
+    try:
+        text = get_blocks_text_from_file(pdf_file, params)
+        if len(text) == 0:
+            return (pdf_file, text, [None, None, None])
+
+        return (pdf_file, text, None)
+
+    # like batch mode, one bad PDF should not stop the others
+    except Exception as exception:  # pylint: disable=broad-exception-caught
+        logger.debug("cannot extract text from %s", pdf_file, exc_info=exception)
+        return (pdf_file, "", [None, type(exception).__name__, str(exception)])
+
+
+def __iter_texts(
+    pdf_files: Iterable[str], params: GetTitleParameters, jobs: int
+) -> Iterator[Tuple[str, str, list]]:
+    get_text = functools.partial(__get_text, params=params)
+    if jobs == 1:
+        yield from map(get_text, pdf_files)
+        return
+
+    logging_level = logging.getLogger("pdftitle").getEffectiveLevel()
+    with multiprocessing.Pool(
+        jobs, initializer=__init_worker, initargs=(logging_level,)
+    ) as pool:
+        yield from pool.imap_unordered(get_text, pdf_files)
+        pool.close()
+        pool.join()
+
+
+def __create_batch(client, state_path: str, state: dict, batch: dict) -> None:
+    batch_object = client.batches.create(
+        input_file_id=batch["input_file_id"],
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    logger.info(
+        "batch %s of %d files is submitted", batch_object.id, len(batch["requests"])
+    )
+    batch["id"] = batch_object.id
+    batch["status"] = batch_object.status
+    __save_state(state_path, state)
+
+
+def __submit(client, state_path: str, state: dict, input_file, requests: dict) -> None:
+    # the batch is saved before every request, see __recover_batches
+    batch = {
+        "id": None,
+        "input_file": f"pdftitle.batch.{state['job']}.{len(state['batches'])}.jsonl",
+        "input_file_id": None,
+        "created_at": None,
+        "status": None,
+        "done": False,
+        "requests": requests,
+    }
+    state["batches"].append(batch)
+    __save_state(state_path, state)
+    input_file.seek(0)
+    file_object = client.files.create(
+        file=(batch["input_file"], input_file), purpose="batch"
+    )
+    logger.debug(file_object)
+    batch["input_file_id"] = file_object.id
+    batch["created_at"] = file_object.created_at
+    __save_state(state_path, state)
+    __create_batch(client, state_path, state, batch)
+
+
+def __find_input_file(client, batch: dict):
+    # returns the uploaded input file of batch or None
+    for file_object in client.files.list(purpose="batch"):
+        if file_object.filename == batch["input_file"]:
+            return file_object
+
+    return None
+
+
+def __find_batch(client, batch: dict):
+    # returns the batch created with the input file of batch or None
+    # the batches are listed from the newest, so the older ones are not listed
+    for batch_object in client.batches.list():
+        if batch_object.input_file_id == batch["input_file_id"]:
+            return batch_object
+
+        if batch_object.created_at < batch["created_at"]:
+            break
+
+    return None
+
+
+def __recover_batches(client, state_path: str, state: dict) -> None:
+    # the batches of an interrupted job which are saved but not created
+    for batch in list(state["batches"]):
+        if batch["id"] is not None:
+            continue
+
+        if batch["input_file_id"] is None:
+            file_object = __find_input_file(client, batch)
+            if file_object is None:
+                # not uploaded, the files of the batch are submitted again
+                logger.info("%s is not uploaded", batch["input_file"])
+                state["batches"].remove(batch)
+                __save_state(state_path, state)
+                continue
+
+            batch["input_file_id"] = file_object.id
+            batch["created_at"] = file_object.created_at
+            __save_state(state_path, state)
+
+        batch_object = __find_batch(client, batch)
+        if batch_object is None:
+            # the input file is uploaded but the batch is not created
+            __create_batch(client, state_path, state, batch)
+            continue
+
+        logger.info("batch %s is found", batch_object.id)
+        batch["id"] = batch_object.id
+        batch["status"] = batch_object.status
+        __save_state(state_path, state)
+
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments
+def __submit_files(
+    client,
+    state_path: str,
+    state: dict,
+    pdf_files: Iterable[str],
+    params: GetTitleParameters,
+    jobs: int,
+) -> None:
+    # the requests are submitted in batches of at most MAX_REQUESTS requests
+    # and MAX_INPUT_SIZE bytes, custom_id of a request is unique in the job
+    requests = {}
+    input_file = tempfile.TemporaryFile()
+    try:
+        for pdf_file, text, result in __iter_texts(pdf_files, params, jobs):
+            if result is not None:
+                state["results"][pdf_file] = result
+                continue
+
+            custom_id = str(state["next_id"])
+            state["next_id"] = state["next_id"] + 1
+            line = json.dumps(
+                {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": get_text_request_body(text, params.openai_model),
+                }
+            ).encode("utf-8")
+            if len(requests) > 0 and (
+                len(requests) >= MAX_REQUESTS
+                or input_file.tell() + len(line) + 1 > MAX_INPUT_SIZE
+            ):
+                __submit(client, state_path, state, input_file, requests)
+                input_file.close()
+                input_file = tempfile.TemporaryFile()
+                requests = {}
+
+            input_file.write(line + b"\n")
+            requests[custom_id] = pdf_file
+
+        if len(requests) > 0:
+            __submit(client, state_path, state, input_file, requests)
+
+        else:
+            __save_state(state_path, state)
+
+    finally:
+        input_file.close()
+
+
+def __get_result(record: dict) -> list:
+    # returns [title, error class, error] of a line of the output or error file
+    response = record.get("response") or {}
+    body = response.get("body") or {}
+    if response.get("status_code") == 200:
+        title = body["choices"][0]["message"]["content"]
+        if title is None or len(title.strip()) == 0:
+            return [None, None, None]
+
+        return [title.strip(), None, None]
+
+    error = record.get("error") or body.get("error") or {}
+    return [None, "OpenAIError", error.get("message", str(error))]
+
+
+def __read_results(client, state: dict, batch: dict, batch_object) -> None:
+    requests = batch["requests"]
+    for file_id in (batch_object.output_file_id, batch_object.error_file_id):
+        if file_id is None:
+            continue
+
+        for line in client.files.content(file_id).text.splitlines():
+            if len(line.strip()) == 0:
+                continue
+
+            record = json.loads(line)
+            response = record.get("response") or {}
+            add_openai_usage((response.get("body") or {}).get("usage"))
+            pdf_file = requests.get(record.get("custom_id"))
+            if pdf_file is not None:
+                state["results"][pdf_file] = __get_result(record)
+
+    # e.g. the requests not completed in an expired batch
+    for pdf_file in requests.values():
+        if pdf_file not in state["results"]:
+            state["results"][pdf_file] = [
+                None,
+                "OpenAIError",
+                f"no result, batch {batch['id']} is {batch_object.status}",
+            ]
+
+
+def __delete_files(client, batch: dict, batch_object) -> None:
+    # the files of a finished batch are not needed after its results are saved
+    file_ids = (
+        batch.get("input_file_id"),
+        batch_object.output_file_id,
+        batch_object.error_file_id,
+    )
+    for file_id in file_ids:
+        if file_id is None:
+            continue
+
+        logger.debug("deleting file %s", file_id)
+        try:
+            client.files.delete(file_id)
+
+        # the results are saved, a file not deleted should not stop the job
+        except Exception as exception:  # pylint: disable=broad-exception-caught
+            logger.warning("cannot delete file %s: %s", file_id, exception)
+
+
+def __wait_batches(client, state_path: str, state: dict, poll_interval: float) -> None:
+    while True:
+        waiting = 0
+        for batch in state["batches"]:
+            if batch["done"]:
+                continue
+
+            batch_object = client.batches.retrieve(batch["id"])
+            logger.debug(batch_object)
+            batch["status"] = batch_object.status
+            if batch_object.status not in __FINISHED_STATUSES:
+                logger.info("batch %s is %s", batch["id"], batch_object.status)
+                waiting = waiting + 1
+                continue
+
+            logger.info("batch %s is %s", batch["id"], batch_object.status)
+            __read_results(client, state, batch, batch_object)
+            batch["done"] = True
+            # saved before the files are deleted, so the results are not read
+            # again (from the deleted files) if the job is interrupted
+            __save_state(state_path, state)
+            __delete_files(client, batch, batch_object)
+
+        if waiting == 0:
+            return
+
+        logger.info("waiting for %d batches", waiting)
+        time.sleep(poll_interval)
+
+
+def get_titles_from_files_openai_batch(
+    pdf_files: Iterable[str],
+    params: GetTitleParameters,
+    state_path: str,
+    jobs: Optional[int] = None,
+    poll_interval: float = 30,
+) -> Iterator[BatchResult]:
+    """
+    asks OpenAI the titles of pdf_files with the Batch API and yields the results
+    in the order of pdf_files after all batches are finished
+    the text of the files is extracted by jobs worker processes (default is the
+    number of CPUs), the state of the job is kept in state_path
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+
+    if jobs < 1:
+        raise ValueError("jobs should be at least 1")
+
+    pdf_files = list(pdf_files)
+    state = __load_state(state_path, params)
+    client = get_openai_client()
+    __recover_batches(client, state_path, state)
+    # the files submitted or with a result in a previous run are skipped
+    submitted = set(state["results"])
+    for batch in state["batches"]:
+        submitted.update(batch["requests"].values())
+
+    __submit_files(
+        client,
+        state_path,
+        state,
+        [pdf_file for pdf_file in pdf_files if pdf_file not in submitted],
+        params,
+        jobs,
+    )
+    __wait_batches(client, state_path, state, poll_interval)
+    for pdf_file in pdf_files:
+        (title, error_class, error) = state["results"][pdf_file]
+        yield BatchResult(
+            pdf_file,
+            normalize_title(title, params),
+            error_class,
+            error,
+            source=ALGO_OPENAI,
+        )
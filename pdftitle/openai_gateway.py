@@ -2,63 +2,511 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-"""openai_gateway"""
+"""
+openai_gateway
+The OpenAI clients are created when they are first used, so importing pdftitle does
+not import openai. An assistant is created once per model in a process and reused,
+the assistants are deleted when the process exits.
+The requests can be limited by a RateLimiter, the timeout and the number of retries
+(with Retry-After or exponential backoff on 429 and 5xx responses) are set with
+RequestOptions. The chat completions (text mode) are retried here, every attempt is
+reserved on the RateLimiter. The requests of file search (the upload, the run and
+its polling) are retried by the openai package, and a title is reserved once.
+The usage of all requests in the process is accumulated, see get_openai_usage.
+"""
 
+import email.utils
 import logging
 import os
-from typing import Optional
-
-from dotenv import load_dotenv
+import asyncio
+import random
+import threading
+import time
+from typing import BinaryIO, Dict, NamedTuple, Optional, Tuple, Union
 
 from .exceptions import PDFTitleException
+from .ratelimit import RateLimiter, get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
-load_dotenv()
+__NOT_READY = (
+    "OpenAI support is not ready, is openai package installed and OPENAI_API_KEY set ?"
+)
 
 __OPENAI_CLIENT = None
+__ASYNC_OPENAI_CLIENT = None
+__CLIENTS_LOCK = threading.Lock()
+
+# model to (assistant id, pid of the process created it)
+# the assistants created by the parent are reused in a forked process
+# but only the process created an assistant deletes it
+__ASSISTANTS: Dict[str, Tuple[str, int]] = {}
+__ASSISTANTS_LOCK = threading.Lock()
+# the finalizer deleting the assistants and the pid of the process registered it
+__ASSISTANTS_FINALIZER = None
+__ASSISTANTS_FINALIZER_PID = None
+
+# usage of the requests in the process, see get_openai_usage
+__USAGE = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+__USAGE_LOCK = threading.Lock()
+
+# estimated tokens of the requests, used by the rate limiter until the actual
+# tokens are known, the instructions and the title are less than 200 tokens
+# and the text is about 4 characters per token
+__FILE_SEARCH_TOKENS = 16000
+__TEXT_REQUEST_TOKENS = 200
+
+# the retries of the chat completions, the same as the openai package
+# a longer Retry-After is not waited, exponential backoff is used instead
+__DEFAULT_MAX_RETRIES = 2
+__INITIAL_RETRY_DELAY = 0.5
+__MAX_RETRY_DELAY = 8.0
+__MAX_RETRY_AFTER = 60.0
+
+
+class RequestOptions(NamedTuple):
+    """timeout (seconds), retries and rate limiter of the OpenAI requests"""
+
+    # None means the default of the openai package
+    timeout: Optional[float] = None
+    max_retries: Optional[int] = None
+    rate_limiter: Optional[RateLimiter] = None
+
 
-try:
-    from openai import OpenAI, OpenAIError
+def get_request_options(params) -> RequestOptions:
+    """returns the RequestOptions of params (GetTitleParameters)"""
+    return RequestOptions(
+        params.openai_timeout,
+        params.openai_max_retries,
+        get_rate_limiter(params.openai_rpm, params.openai_tpm),
+    )
 
+
+__INSTRUCTIONS = "You are an assistant that can process PDF files."
+__QUESTION = (
+    "What is the title of this PDF document ? "
+    + "Please do your best and find a title "
+    + "even if you are not sure and "
+    + "please respond with the title only."
+)
+# text mode, see get_title_from_openai_text
+__TEXT_INSTRUCTIONS = (
+    "You are an assistant finding the titles of documents. "
+    + "The text at the top of the first page of a document is given, every line "
+    + "is a text block as its font size, a tab and its text, from the top "
+    + "of the page. Please do your best and find the title even if you are not "
+    + "sure and please respond with the title only."
+)
+
+
+def __import_openai():
+    # openai is an optional dependency
+    # pylint: disable=import-outside-toplevel
     try:
-        __OPENAI_CLIENT = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-    except OpenAIError:
-        pass
-except ImportError:
-    logger.warning("openai package is not available")
+        import openai
+        from dotenv import load_dotenv
+
+    except ImportError as exception:
+        logger.warning("openai package is not available")
+        raise PDFTitleException(__NOT_READY) from exception
+
+    load_dotenv()
+    return openai
+
+
+def get_openai_client():
+    """
+    returns the OpenAI client of the process, it is created when it is first used
+    the client uses OPENAI_BASE_URL environment variable if it is set
+    (e.g. to use a local mock server)
+    """
+    # pylint: disable=global-statement
+    global __OPENAI_CLIENT
+    with __CLIENTS_LOCK:
+        if __OPENAI_CLIENT is None:
+            openai = __import_openai()
+            try:
+                __OPENAI_CLIENT = openai.OpenAI(
+                    api_key=os.environ.get("OPENAI_API_KEY")
+                )
+            except openai.OpenAIError as exception:
+                raise PDFTitleException(__NOT_READY) from exception
+
+        return __OPENAI_CLIENT
+
+
+def __get_async_openai_client():
+    # pylint: disable=global-statement
+    global __ASYNC_OPENAI_CLIENT
+    with __CLIENTS_LOCK:
+        if __ASYNC_OPENAI_CLIENT is None:
+            openai = __import_openai()
+            try:
+                __ASYNC_OPENAI_CLIENT = openai.AsyncOpenAI(
+                    api_key=os.environ.get("OPENAI_API_KEY")
+                )
+            except openai.OpenAIError as exception:
+                raise PDFTitleException(__NOT_READY) from exception
+
+        return __ASYNC_OPENAI_CLIENT
+
+
+def __delete_assistants() -> None:
+    with __ASSISTANTS_LOCK:
+        pid = os.getpid()
+        models = [model for model, (_, owner) in __ASSISTANTS.items() if owner == pid]
+        assistant_ids = [__ASSISTANTS.pop(model)[0] for model in models]
+
+    for assistant_id in assistant_ids:
+        logger.info("deleting assistant %s", assistant_id)
+        try:
+            get_openai_client().beta.assistants.delete(assistant_id)
+
+        # the process is exiting, the other assistants should still be deleted
+        except Exception as exception:  # pylint: disable=broad-exception-caught
+            logger.warning("cannot delete assistant %s: %s", assistant_id, exception)
+
+
+def __put_assistant(openai_model: str, assistant_id: str) -> str:
+    # returns the assistant of openai_model, it is not assistant_id if another
+    # thread has put an assistant before, called with __ASSISTANTS_LOCK held
+    # pylint: disable=global-statement
+    global __ASSISTANTS_FINALIZER, __ASSISTANTS_FINALIZER_PID
+    pid = os.getpid()
+    (assistant_id, _) = __ASSISTANTS.setdefault(openai_model, (assistant_id, pid))
+    # atexit handlers are not run in the worker processes of multiprocessing
+    # but its finalizers are, and they are also run at exit in the main process
+    # a finalizer is run only in the process registered it, and a forked process
+    # (not by multiprocessing) sees the finalizer of its parent as active
+    # pylint: disable=import-outside-toplevel
+    import multiprocessing.util
+
+    if (
+        __ASSISTANTS_FINALIZER is None
+        or __ASSISTANTS_FINALIZER_PID != pid
+        or not __ASSISTANTS_FINALIZER.still_active()
+    ):
+        __ASSISTANTS_FINALIZER = multiprocessing.util.Finalize(
+            None, __delete_assistants, exitpriority=10
+        )
+        __ASSISTANTS_FINALIZER_PID = pid
+
+    return assistant_id
+
+
+def __get_assistant_id(client, openai_model: str) -> str:
+    # the lock is held while the assistant is created, so it is created only once
+    with __ASSISTANTS_LOCK:
+        if openai_model in __ASSISTANTS:
+            return __ASSISTANTS[openai_model][0]
+
+        assistant = client.beta.assistants.create(
+            name="",
+            instructions=__INSTRUCTIONS,
+            model=openai_model,
+            tools=[{"type": "file_search"}],
+        )
+        logger.debug(assistant)
+        return __put_assistant(openai_model, assistant.id)
+
+
+async def __get_assistant_id_async(client, openai_model: str) -> str:
+    # the lock cannot be held while awaiting, so more than one assistant
+    # can be created at the same time, then only the first one is kept
+    with __ASSISTANTS_LOCK:
+        if openai_model in __ASSISTANTS:
+            return __ASSISTANTS[openai_model][0]
+
+    assistant = await client.beta.assistants.create(
+        name="",
+        instructions=__INSTRUCTIONS,
+        model=openai_model,
+        tools=[{"type": "file_search"}],
+    )
+    logger.debug(assistant)
+    with __ASSISTANTS_LOCK:
+        assistant_id = __put_assistant(openai_model, assistant.id)
+
+    if assistant_id != assistant.id:
+        await client.beta.assistants.delete(assistant.id)
+
+    return assistant_id
+
+
+def __get_title_from_completion(completion) -> Optional[str]:
+    title = completion.choices[0].message.content
+    if title is None or len(title.strip()) == 0:
+        return None
+
+    return title.strip()
+
+
+def __get_title_from_messages(messages: list) -> str:
+    message_content = messages[0].content[0].text
+    # replace annotations to get a human readable text
+    for _, annotation in enumerate(message_content.annotations):
+        message_content.value = message_content.value.replace(annotation.text, "")
+
+    return message_content.value
+
+
+def __with_options(client, options: RequestOptions, max_retries: Optional[int]):
+    # the client with the timeout of options and max_retries
+    kwargs = {}
+    if options.timeout is not None:
+        kwargs["timeout"] = options.timeout
+
+    if max_retries is not None:
+        kwargs["max_retries"] = max_retries
+
+    if len(kwargs) == 0:
+        return client
+
+    return client.with_options(**kwargs)
+
+
+def __reserve(options: RequestOptions, tokens: int) -> float:
+    # returns the seconds to wait for the rate limiter
+    if options.rate_limiter is None:
+        return 0.0
+
+    delay = options.rate_limiter.reserve(tokens)
+    if delay > 0:
+        logger.info("waiting %.3f seconds for the rate limits", delay)
+
+    return delay
+
+
+def __get_retry_after(exception) -> Optional[float]:
+    # returns the seconds in retry-after-ms or retry-after header of the response
+    response = getattr(exception, "response", None)
+    if response is None:
+        return None
+
+    for header, divisor in (("retry-after-ms", 1000), ("retry-after", 1)):
+        value = response.headers.get(header)
+        if value is not None:
+            try:
+                return float(value) / divisor
+            except ValueError:
+                pass
+
+    # retry-after can also be a date
+    date = email.utils.parsedate_tz(response.headers.get("retry-after") or "")
+    if date is None:
+        return None
+
+    return email.utils.mktime_tz(date) - time.time()
+
+
+def __get_retry_delay(
+    openai, exception, options: RequestOptions, tokens: int, attempt: int
+) -> Optional[float]:
+    # returns the seconds to wait before retrying a request failed with exception
+    # or None if it is not retried, the same as the openai package does
+    # (408, 409, 429, 5xx and connection errors, Retry-After or exponential backoff)
+    max_retries = options.max_retries
+    if max_retries is None:
+        max_retries = __DEFAULT_MAX_RETRIES
+
+    if attempt >= max_retries:
+        return None
+
+    if isinstance(exception, openai.APIStatusError):
+        if exception.status_code not in (408, 409, 429) and exception.status_code < 500:
+            return None
+
+    elif not isinstance(exception, openai.APIConnectionError):
+        return None
+
+    retry_after = __get_retry_after(exception)
+    if retry_after is not None and 0 < retry_after <= __MAX_RETRY_AFTER:
+        delay = retry_after
+
+    else:
+        delay = min(__INITIAL_RETRY_DELAY * 2**attempt, __MAX_RETRY_DELAY)
+        delay = delay * (1 - 0.25 * random.random())
+
+    # the tokens of the failed request are reserved again by the next attempt
+    if options.rate_limiter is not None:
+        options.rate_limiter.adjust(-tokens)
+
+    logger.info("retrying the request in %.3f seconds: %s", delay, exception)
+    return delay
+
+
+def __create_completion(client, body: dict, options: RequestOptions, tokens: int):
+    # the request is retried here instead of the openai package (its max_retries
+    # is 0), so every attempt is reserved on the rate limiter
+    openai = __import_openai()
+    attempt = 0
+    while True:
+        time.sleep(__reserve(options, tokens))
+        try:
+            return client.chat.completions.create(**body)
+
+        except openai.OpenAIError as exception:
+            delay = __get_retry_delay(openai, exception, options, tokens, attempt)
+            if delay is None:
+                raise
+
+        time.sleep(delay)
+        attempt = attempt + 1
+
+
+async def __create_completion_async(
+    client, body: dict, options: RequestOptions, tokens: int
+):
+    # the same as __create_completion but async
+    openai = __import_openai()
+    attempt = 0
+    while True:
+        await asyncio.sleep(__reserve(options, tokens))
+        try:
+            return await client.chat.completions.create(**body)
+
+        except openai.OpenAIError as exception:
+            delay = __get_retry_delay(openai, exception, options, tokens, attempt)
+            if delay is None:
+                raise
+
+        await asyncio.sleep(delay)
+        attempt = attempt + 1
+
+
+def __get_usage_value(usage, name: str) -> int:
+    # usage is an object in the responses, a dict in the batch results
+    if isinstance(usage, dict):
+        return usage.get(name) or 0
+
+    return getattr(usage, name, None) or 0
+
+
+def add_openai_usage(usage) -> int:
+    """adds the usage of a request to the usage of the process, returns its tokens"""
+    with __USAGE_LOCK:
+        __USAGE["requests"] = __USAGE["requests"] + 1
+        if usage is None:
+            return 0
+
+        for name in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            __USAGE[name] = __USAGE[name] + __get_usage_value(usage, name)
+
+        return __get_usage_value(usage, "total_tokens")
+
+
+def get_openai_usage() -> Dict[str, int]:
+    """
+    returns the number of requests and the prompt, completion and total tokens
+    used in the process
+    """
+    with __USAGE_LOCK:
+        return dict(__USAGE)
+
+
+def format_openai_usage(usage: Dict[str, int]) -> str:
+    """returns the usage (see get_openai_usage) as text"""
+    return (
+        f"Requests: {usage['requests']}, "
+        + f"Completion: {usage['completion_tokens']}, "
+        + f"Prompt: {usage['prompt_tokens']}, "
+        + f"Total: {usage['total_tokens']} tokens"
+    )
+
+
+def __add_usage(
+    usage, options: RequestOptions, estimated_tokens: int, openai_show_usage: bool
+) -> None:
+    tokens = add_openai_usage(usage)
+    if usage is not None and options.rate_limiter is not None:
+        options.rate_limiter.adjust(tokens - estimated_tokens)
+
+    if openai_show_usage:
+        __show_usage(usage)
+
+
+def __show_usage(usage) -> None:
+    if usage is None:
+        print("Usage is not available")
+        return
+
+    print(
+        f"Completion: {__get_usage_value(usage, 'completion_tokens')}, "
+        + f"Prompt: {__get_usage_value(usage, 'prompt_tokens')}, "
+        + f"Total: {__get_usage_value(usage, 'total_tokens')} tokens"
+    )
 
 
 def get_title_from_openai(
-    pdf_data: bytes, openai_model: str, openai_show_usage: bool
+    pdf_data: Union[bytes, BinaryIO],
+    openai_model: str,
+    openai_show_usage: bool,
+    options: RequestOptions = RequestOptions(),
 ) -> Optional[str]:
-    """ask OpenAI the title"""
-    if __OPENAI_CLIENT is None:
-        raise PDFTitleException(
-            "OpenAI support is not ready, is openai package installed and OPENAI_API_KEY set ?"
+    """
+    ask OpenAI the title
+    pdf_data can be a binary file, then it is uploaded in chunks (not read at once)
+    """
+    client = __with_options(get_openai_client(), options, options.max_retries)
+    time.sleep(__reserve(options, __FILE_SEARCH_TOKENS))
+    file_object = None
+    try:
+        file_object = client.files.create(
+            file=("pdftitle.arg.pdf", pdf_data), purpose="assistants"
         )
+        logger.debug(file_object)
+        assistant_id = __get_assistant_id(client, openai_model)
+        thread = client.beta.threads.create(
+            messages=[
+                {
+                    "role": "user",
+                    "content": __QUESTION,
+                    "attachments": [
+                        {"file_id": file_object.id, "tools": [{"type": "file_search"}]}
+                    ],
+                }
+            ]
+        )
+        logger.debug(thread)
+        run = client.beta.threads.runs.create_and_poll(
+            thread_id=thread.id, assistant_id=assistant_id
+        )
+        logger.debug(run)
+        messages = list(
+            client.beta.threads.messages.list(thread_id=thread.id, run_id=run.id)
+        )
+        logger.debug(messages)
+        __add_usage(run.usage, options, __FILE_SEARCH_TOKENS, openai_show_usage)
+        return __get_title_from_messages(messages)
+    finally:
+        if file_object is not None:
+            client.files.delete(file_object.id)
 
+
+async def get_title_from_openai_async(
+    pdf_data: Union[bytes, BinaryIO],
+    openai_model: str,
+    openai_show_usage: bool,
+    options: RequestOptions = RequestOptions(),
+) -> Optional[str]:
+    """
+    ask OpenAI the title, the same as get_title_from_openai but using AsyncOpenAI
+    pdf_data can be a binary file, then it is uploaded in chunks (not read at once)
+    """
+    client = __with_options(__get_async_openai_client(), options, options.max_retries)
+    await asyncio.sleep(__reserve(options, __FILE_SEARCH_TOKENS))
     file_object = None
     try:
-        file_object = __OPENAI_CLIENT.files.create(
+        file_object = await client.files.create(
             file=("pdftitle.arg.pdf", pdf_data), purpose="assistants"
         )
         logger.debug(file_object)
-        assistant = __OPENAI_CLIENT.beta.assistants.create(
-            name="",
-            instructions="You are an assistant that can process PDF files.",
-            model=openai_model,
-            tools=[{"type": "file_search"}],
-        )
-        logger.debug(assistant)
-        thread = __OPENAI_CLIENT.beta.threads.create(
+        assistant_id = await __get_assistant_id_async(client, openai_model)
+        thread = await client.beta.threads.create(
             messages=[
                 {
                     "role": "user",
-                    "content": "What is the title of this PDF document ? "
-                    + "Please do your best and find a title "
-                    + "even if you are not sure and "
-                    + "please respond with the title only.",
+                    "content": __QUESTION,
                     "attachments": [
                         {"file_id": file_object.id, "tools": [{"type": "file_search"}]}
                     ],
@@ -66,28 +514,70 @@ def get_title_from_openai(
             ]
         )
         logger.debug(thread)
-        run = __OPENAI_CLIENT.beta.threads.runs.create_and_poll(
-            thread_id=thread.id, assistant_id=assistant.id
+        run = await client.beta.threads.runs.create_and_poll(
+            thread_id=thread.id, assistant_id=assistant_id
         )
         logger.debug(run)
-        messages = list(
-            __OPENAI_CLIENT.beta.threads.messages.list(
+        messages = [
+            message
+            async for message in client.beta.threads.messages.list(
                 thread_id=thread.id, run_id=run.id
             )
-        )
+        ]
         logger.debug(messages)
-        message_content = messages[0].content[0].text
-        # replace annotations to get a human readable text
-        for _, annotation in enumerate(message_content.annotations):
-            message_content.value = message_content.value.replace(annotation.text, "")
-
-        if openai_show_usage:
-            print(
-                f"Completion: {run.usage.completion_tokens}, "
-                + "Prompt: {run.usage.prompt_tokens}, "
-                + "Total: {run.usage.total_tokens} tokens"
-            )
-        return message_content.value
+        __add_usage(run.usage, options, __FILE_SEARCH_TOKENS, openai_show_usage)
+        return __get_title_from_messages(messages)
     finally:
         if file_object is not None:
-            __OPENAI_CLIENT.files.delete(file_object.id)
+            await client.files.delete(file_object.id)
+
+
+def get_text_request_body(text: str, openai_model: str) -> dict:
+    """
+    returns the body of the chat completion request asking the title of the text
+    at the top of the page, it is also used in the requests of a batch
+    """
+    return {
+        "model": openai_model,
+        "messages": [
+            {"role": "system", "content": __TEXT_INSTRUCTIONS},
+            {"role": "user", "content": text},
+        ],
+    }
+
+
+def get_title_from_openai_text(
+    text: str,
+    openai_model: str,
+    openai_show_usage: bool,
+    options: RequestOptions = RequestOptions(),
+) -> Optional[str]:
+    """
+    ask OpenAI the title of the text at the top of the page
+    (see pdftitle.get_blocks_text_from_io) in a single request
+    """
+    client = __with_options(get_openai_client(), options, 0)
+    estimated_tokens = len(text) // 4 + __TEXT_REQUEST_TOKENS
+    completion = __create_completion(
+        client, get_text_request_body(text, openai_model), options, estimated_tokens
+    )
+    logger.debug(completion)
+    __add_usage(completion.usage, options, estimated_tokens, openai_show_usage)
+    return __get_title_from_completion(completion)
+
+
+async def get_title_from_openai_text_async(
+    text: str,
+    openai_model: str,
+    openai_show_usage: bool,
+    options: RequestOptions = RequestOptions(),
+) -> Optional[str]:
+    """ask OpenAI the title, the same as get_title_from_openai_text but async"""
+    client = __with_options(__get_async_openai_client(), options, 0)
+    estimated_tokens = len(text) // 4 + __TEXT_REQUEST_TOKENS
+    completion = await __create_completion_async(
+        client, get_text_request_body(text, openai_model), options, estimated_tokens
+    )
+    logger.debug(completion)
+    __add_usage(completion.usage, options, estimated_tokens, openai_show_usage)
+    return __get_title_from_completion(completion)
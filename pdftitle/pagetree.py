@@ -0,0 +1,142 @@
+# SPDX-FileCopyrightText: 2024 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+This module has the page lookup implementation.
+A page is found by descending the page tree using the number of leaf nodes (Count)
+of the page tree nodes, so only the nodes on the path to the page are resolved.
+If the page tree is broken, pages are searched linearly like pdfminer does.
+The references are from ISO 32000-2.
+"""
+
+import logging
+from typing import Optional
+
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import PDFObjRef, dict_value, int_value, list_value
+from pdfminer.psparser import LIT
+
+from .exceptions import PDFTitleException
+
+
+logger = logging.getLogger(__name__)
+
+LITERAL_PAGE = LIT("Page")
+LITERAL_PAGES = LIT("Pages")
+
+
+class PageTreeError(PDFTitleException):
+    """page tree is not consistent, raised and handled in this module"""
+
+
+def __get_type(node: dict) -> object:
+    node_type = node.get("Type")
+    # some files use lower case, see pdfminer #64
+    if node_type is None:
+        node_type = node.get("type")
+
+    return node_type
+
+
+def get_page_count(doc: PDFDocument) -> Optional[int]:
+    """
+    returns the number of pages (Count of the page tree root)
+    returns None if the document has no page tree
+    """
+    if "Pages" not in doc.catalog:
+        return None
+
+    root = dict_value(doc.catalog["Pages"])
+    if "Count" not in root:
+        return None
+
+    return int_value(root["Count"])
+
+
+# 7.7.3 Page tree
+# pylint: disable=too-many-branches
+def __find_page(doc: PDFDocument, page_number: int) -> PDFPage:
+    # inheritable attributes, 7.7.3.4 Inheritance of page attributes
+    attrs = {}
+    node_ref = doc.catalog["Pages"]
+    # index of the page in the subtree of node
+    index = page_number - 1
+    visited = set()
+    while True:
+        if not isinstance(node_ref, PDFObjRef):
+            raise PageTreeError("page tree node is not an indirect object")
+
+        if node_ref.objid in visited:
+            raise PageTreeError("page tree has a cycle")
+
+        visited.add(node_ref.objid)
+        node = dict_value(doc.getobj(node_ref.objid)).copy()
+        for k, v in attrs.items():
+            if k not in node:
+                node[k] = v
+
+        node_type = __get_type(node)
+        if node_type is LITERAL_PAGE:
+            if index != 0:
+                raise PageTreeError("Count does not match the page tree")
+
+            logger.debug("page %d is %s", page_number, node_ref.objid)
+            return PDFPage(doc, node_ref.objid, node, None)
+
+        if node_type is not LITERAL_PAGES:
+            raise PageTreeError(f"unknown page tree node type: {node_type}")
+
+        attrs = {k: v for k, v in node.items() if k in PDFPage.INHERITABLE_ATTRS}
+        next_node_ref = None
+        for kid_ref in list_value(node.get("Kids", [])):
+            kid = dict_value(kid_ref)
+            if __get_type(kid) is LITERAL_PAGES:
+                if "Count" not in kid:
+                    raise PageTreeError("page tree node has no Count")
+
+                count = int_value(kid["Count"])
+
+            else:
+                count = 1
+
+            if index < count:
+                next_node_ref = kid_ref
+                break
+
+            index = index - count
+
+        if next_node_ref is None:
+            raise PageTreeError("Count does not match the page tree")
+
+        node_ref = next_node_ref
+
+
+def get_page(doc: PDFDocument, page_number: int) -> PDFPage:
+    """
+    returns the page (page_number starts from 1)
+    raises PDFTitleException if the page does not exist
+    """
+    page_count = get_page_count(doc)
+    logger.info("page count: %s", page_count)
+    if page_count is not None and page_count > 0:
+        if page_number < 1 or page_number > page_count:
+            raise PDFTitleException("specified page does not exist")
+
+        try:
+            return __find_page(doc, page_number)
+        except PageTreeError as page_tree_error:
+            logger.warning("%s, searching the page linearly", page_tree_error)
+
+    # the page tree is missing or broken
+    current_page_number = 0
+    for page in PDFPage.create_pages(doc):
+        current_page_number = current_page_number + 1
+        if current_page_number == page_number:
+            return page
+
+    if current_page_number == 0:
+        raise PDFTitleException("file has no pages")
+
+    raise PDFTitleException("specified page does not exist")
@@ -4,262 +4,323 @@
 
 """pdftitle"""
 
+# pylint: disable=too-many-lines
+
 import argparse
-from importlib.metadata import version
+import bisect
+import contextlib
 import io
+import itertools
+import json
 import logging
 import os
-import string
+import re
+import sys
 import traceback
-from typing import Optional, List
-
-from pdfminer.converter import TextConverter
-from pdfminer.layout import LAParams
-from pdfminer.pdfdevice import PDFDevice
-from pdfminer.pdfdocument import PDFDocument
-from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
-from pdfminer.pdfpage import PDFPage
-from pdfminer.pdfparser import PDFParser
+from typing import TYPE_CHECKING, Iterator, Optional, List, Tuple
 
 from .constants import ALGO_ORIGINAL, ALGO_MAX2, ALGO_ELIOT, ALGO_OPENAI
+from .constants import SOURCE_CACHE, SOURCE_DOCUMENT_INFORMATION_DICTIONARY
+from .constants import SOURCE_METADATA_STREAM, FORMAT_TEXT, FORMAT_JSONL
 from .exceptions import PDFTitleException
-from .device import TextOnlyDevice
-from .interpreter import TextOnlyInterpreter
-from .metadata import get_title_from_document_information_dictionary
-from .metadata import get_title_from_metadata_stream
-from .openai_gateway import get_title_from_openai
+from .buffer import BufferReader, open_pdf_file
+
+# convert_ligatures is imported for the compatibility, it was defined here before
+from .normalize import convert_ligatures  # pylint: disable=unused-import
+from .normalize import get_file_name, normalize_title
+from .result import TitleResult, STAGE_ALGORITHM, STAGE_CACHE, STAGE_INTERPRETATION
+from .result import STAGE_LAYOUT, STAGE_METADATA, STAGE_NORMALIZATION, STAGE_OPEN
+from .result import STAGE_OPENAI, STAGE_PAGE, STAGE_SPACES, STAGE_XREF
+
+# pdfminer (and the modules of pdftitle using it), openai_gateway and cache (sqlite3)
+# are imported in the functions using them, so the command line starts fast, e.g. for --version
+# or when the title is found in the metadata the page is not interpreted
+# these are only for the type annotations
+if TYPE_CHECKING:
+    from pdfminer.pdfdevice import PDFDevice
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfinterp import PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    from .blocks import BlockStore
 
 
 logger = logging.getLogger(__name__)
 
 
-def __get_title_by_original_algorithm(device: PDFDevice) -> str:
+# every algorithm returns the title and the indices of the blocks used for the title
+def __get_title_by_original_algorithm(device: "PDFDevice") -> Tuple[str, List[int]]:
+    blocks = device.blocks
     # find max font size
-    max_tfs = max(device.blocks, key=lambda x: x[1])[1]
+    max_tfs = max(blocks.font_sizes)
     logger.info("max_tfs: %s", max_tfs)
     # find max blocks with max font size
-    max_blocks = list(filter(lambda x: x[1] == max_tfs, device.blocks))
+    max_blocks = blocks.select(blocks.font_sizes, max_tfs)
     # find the one with the highest y coordinate
     # this is the most close to top
-    max_y = max(max_blocks, key=lambda x: x[3])[3]
+    max_y = max(map(blocks.ys.__getitem__, max_blocks))
     logger.info("max_y: %s", max_y)
-    found_blocks = list(filter(lambda x: x[3] == max_y, max_blocks))
+    found_blocks = [index for index in max_blocks if blocks.ys[index] == max_y]
     logger.info("found blocks")
 
-    for block in found_blocks:
-        logger.info(block)
+    for index in found_blocks:
+        logger.info(blocks[index])
 
-    block = found_blocks[0]
-    title = "".join(block[4]).strip()
-    return title
+    index = found_blocks[0]
+    title = blocks.get_text(index).strip()
+    return title, [index]
 
 
-def __get_title_by_max2_algorithm(device: PDFDevice) -> str:
+def __get_title_by_max2_algorithm(device: "PDFDevice") -> Tuple[str, List[int]]:
+    blocks = device.blocks
     # find max font size
-    all_tfs = sorted(list(map(lambda x: x[1], device.blocks)), reverse=True)
-    max_tfs = all_tfs[0]
+    max_tfs = max(blocks.font_sizes)
     logger.info("max_tfs: %s", max_tfs)
-    selected_blocks = []
-    max2_tfs = -1
-    for block in device.blocks:
-        if max2_tfs == -1:
-            if block[1] == max_tfs:
-                selected_blocks.append(block)
-            elif len(selected_blocks) > 0:  # max is added
-                selected_blocks.append(block)
-                max2_tfs = block[1]
-        else:
-            if block[1] == max_tfs or block[1] == max2_tfs:
-                selected_blocks.append(block)
-            else:
-                break
+    # the first block with max font size
+    # and the consecutive blocks with max or the font size of the next block
+    start = blocks.font_sizes.index(max_tfs)
+    selected_blocks = [start]
+    max2_tfs = None
+    for index in range(start + 1, len(blocks)):
+        font_size = blocks.font_sizes[index]
+        if max2_tfs is None:
+            if font_size != max_tfs:  # max is added
+                max2_tfs = font_size
+
+        elif font_size not in (max_tfs, max2_tfs):
+            break
 
-    logger.info("selected blocks")
-    for block in selected_blocks:
-        logger.info(block)
+        selected_blocks.append(index)
 
-    title = []
-    for block in selected_blocks:
-        title.append("".join(block[4]))
+    logger.info("selected blocks")
+    for index in selected_blocks:
+        logger.info(blocks[index])
 
-    title = "".join(title)
-    return title
+    title = "".join(blocks.get_texts(selected_blocks))
+    return title, selected_blocks
 
 
-def __get_title_by_eliot_algorithm(device: PDFDevice, eliot_tfs: List[int]) -> str:
+def __get_title_by_eliot_algorithm(
+    device: "PDFDevice", eliot_tfs: List[int]
+) -> Tuple[str, List[int]]:
+    blocks = device.blocks
     logger.info("eliot-tfs: %s", eliot_tfs)
     # get all font sizes
-    all_tfs = sorted(set(map(lambda x: x[1], device.blocks)), reverse=True)
+    all_tfs = sorted(set(blocks.font_sizes), reverse=True)
     logger.info("all_tfs: %s", all_tfs)
     selected_blocks = []
     for tfs_index in eliot_tfs:
-        current_tfs_index = all_tfs[tfs_index]
-        for block in device.blocks:
-            if block[1] == current_tfs_index:
-                selected_blocks.append(block)
+        selected_blocks.extend(blocks.select(blocks.font_sizes, all_tfs[tfs_index]))
 
     # sort the selected blocks
     # y min first, then x min if y min is the same
-    selected_blocks = sorted(selected_blocks, key=lambda block: (-block[3], block[2]))
+    selected_blocks = sorted(
+        selected_blocks, key=lambda index: (-blocks.ys[index], blocks.xs[index])
+    )
 
-    for block in selected_blocks:
-        logger.info(block)
+    for index in selected_blocks:
+        logger.info(blocks[index])
 
-    title = []
-    for block in selected_blocks:
-        title.append("".join(block[4]))
+    title = "".join(blocks.get_texts(selected_blocks))
+    return title, selected_blocks
 
-    title = "".join(title)
-    return title
 
+def __get_pdfdocument(
+    pdf_file: io.BufferedReader, result: Optional[TitleResult] = None
+) -> "PDFDocument":
+    # pylint: disable=import-outside-toplevel
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfparser import PDFParser
 
-def __get_pdfdocument(pdf_file: io.BufferedReader) -> PDFDocument:
-    return PDFDocument(PDFParser(pdf_file))
+    if result is None:
+        return PDFDocument(PDFParser(pdf_file))
+
+    # cross-reference table and trailer are read when the document is created
+    with result.stage(STAGE_XREF):
+        return PDFDocument(PDFParser(pdf_file))
 
 
 # pylint: disable=too-many-locals
 def __get_pdfdevice(
-    doc: PDFDocument,
-    page_number: int,
-    replace_missing_char: Optional[str],
-    translation_heuristic: bool,
-) -> (PDFDevice, io.StringIO):
+    doc: "PDFDocument",
+    params: "GetTitleParameters",
+    result: Optional[TitleResult] = None,
+) -> ("PDFDevice", "PDFPage"):
+    # pylint: disable=import-outside-toplevel
+    from pdfminer.pdfinterp import PDFResourceManager
+    from .device import TextOnlyDevice
+    from .fontcache import get_shared_resource_manager
+    from .interpreter import TextOnlyInterpreter, TracingTextOnlyInterpreter
+    from .pagetree import get_page
+
+    if result is None:
+        result = TitleResult()
+
+    if params.font_cache_size:
+        resource_manager = get_shared_resource_manager(params.font_cache_size)
+
+    else:
+        resource_manager = PDFResourceManager()
 
-    resource_manager = PDFResourceManager()
     device = TextOnlyDevice(
-        resource_manager, replace_missing_char, translation_heuristic
+        resource_manager,
+        params.replace_missing_char,
+        params.translation_heuristic,
+        max_glyphs=params.max_glyphs,
+        max_operators=params.max_operators,
+        max_text_depth=params.max_text_depth,
     )
-    interpreter = TextOnlyInterpreter(resource_manager, device)
+    # operators are logged only in debug logging level
+    if logger.isEnabledFor(logging.DEBUG):
+        interpreter = TracingTextOnlyInterpreter(resource_manager, device)
 
-    first_page = io.StringIO()
-    converter = TextConverter(resource_manager, first_page, laparams=LAParams())
-    page_interpreter = PDFPageInterpreter(resource_manager, converter)
+    else:
+        interpreter = TextOnlyInterpreter(resource_manager, device)
 
-    current_page_number = 0
+    with result.stage(STAGE_PAGE):
+        page = get_page(doc, params.page_number)
 
-    # list objects in verbose mode
-    logger.info("<<< PDF objects >>>")
-    for xref in doc.xrefs:
-        for objid in xref.get_objids():
-            obj = doc.getobj(objid)
-            if isinstance(obj, dict):
-                logger.info("pdfobj %s: %s %s", objid, obj.get("Type"), obj)
+    logger.info("processing page %d", params.page_number)
+    with result.stage(STAGE_INTERPRETATION):
+        interpreter.process_page(page)
+
+    logger.info(
+        "%d operators executed, %d glyphs drawn",
+        device.operator_count,
+        device.glyph_count,
+    )
+    result.counters.update(
+        operators=device.operator_count,
+        glyphs=device.glyph_count,
+        blocks=len(device.blocks),
+        xobjects=device.xobject_count,
+        content_bytes=device.content_bytes,
+    )
+
+    device.recover_last_paragraph()
+
+    return device, page
+
+
+# the text of the blocks sent to OpenAI in text mode is limited to about this length
+OPENAI_TEXT_MAX_CHARS = 2000
 
-            else:
-                logger.info("pdfobj %s: %s %s", objid, type(obj).__name__, obj)
-
-    logger.info("<<< >>>")
-
-    for page in PDFPage.create_pages(doc):
-        current_page_number = current_page_number + 1
-        logger.info("page %d", current_page_number)
-        if current_page_number == page_number:
-            logger.info("processing page %d", current_page_number)
-            interpreter.process_page(page)
-            page_interpreter.process_page(page)
-            current_page_number = -1
-            break
 
-    if current_page_number == 0:
-        raise PDFTitleException("file has no pages")
+def __get_region(
+    blocks: "BlockStore", indices: List[int]
+) -> Optional[Tuple[float, float]]:
+    """returns the vertical range of the page (in device space) around blocks"""
+    region = None
+    for index in indices:
+        font_size = abs(blocks.font_sizes[index])
+        # cannot find a region for text without a vertical size, e.g. rotated
+        if font_size == 0:
+            return None
 
-    if current_page_number > 0:
-        raise PDFTitleException("specified page does not exist")
+        # glyph origins are on the baseline, font size above and below covers
+        # the glyphs of the block and the lines just before and after it
+        ymin = blocks.min_ys[index] - font_size
+        ymax = blocks.max_ys[index] + font_size
+        if region is not None:
+            ymin = min(ymin, region[0])
+            ymax = max(ymax, region[1])
 
+        region = (ymin, ymax)
+
+    return region
+
+
+def __get_page_text(
+    resource_manager: "PDFResourceManager",
+    page: "PDFPage",
+    region: Optional[Tuple[float, float]],
+) -> str:
+    """
+    returns the text of the page by layout analysis
+    if region is given, only the text in this vertical range of the page is analyzed
+    """
+    # layout analysis is not needed if the title has spaces
+    # pylint: disable=import-outside-toplevel
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter
+    from .device import RegionTextConverter
+
+    page_text = io.StringIO()
+    converter = RegionTextConverter(
+        resource_manager, page_text, laparams=LAParams(), region=region
+    )
+    PDFPageInterpreter(resource_manager, converter).process_page(page)
     converter.close()
-    first_page_text = first_page.getvalue()
-    first_page.close()
-    device.recover_last_paragraph()
+    return page_text.getvalue()
 
-    return device, first_page_text
-
-
-def __retrieve_spaces(
-    first_page,
-    title_without_space,
-    p=0,  # pylint: disable=invalid-name
-    t=0,  # pylint: disable=invalid-name
-    result="",
-):
-    """retrieve_spaces"""
-    while True:
-        logger.debug("p: %d, t: %d, result: %s", p, t, result)
-        # Stop condition : all the first page has been explored or
-        #  we have explored all the letters of the title
-
-        if p >= len(first_page) or t >= len(title_without_space):
-            return result
-
-        if first_page[p].lower() == title_without_space[t].lower():
-            result += first_page[p]
-            t += 1
-
-        elif t != 0:
-            # Add spaces if there is space or a wordwrap
-            if first_page[p] == " " or first_page[p] == "\n":
-                result += " "
-            # If letter p-1 in page corresponds to letter t-1 in title,
-            #  but letter p does not corresponds to letter p,
-            # we are not exploring the title in the page
-            else:
-                t = 0
-                result = ""
 
-        p += 1
+def iter_pdf_objects(doc: "PDFDocument") -> Iterator[Tuple[int, object]]:
+    """
+    yields (objid, obj) for all objects in the document
+    objects are resolved one at a time only when they are requested, this is only
+    for diagnostics, title extraction does not need all the objects
+    """
+    # pylint: disable=import-outside-toplevel
+    from pdfminer.pdftypes import PDFObjectNotFound
+
+    for xref in doc.xrefs:
+        for objid in xref.get_objids():
+            try:
+                yield objid, doc.getobj(objid)
+            except PDFObjectNotFound:
+                logger.debug("pdfobj %s not found", objid)
+
+
+__NON_WHITESPACE = re.compile(r"\S+")
+__WHITESPACES = re.compile(r"\s+")
+
+
+def __get_page_position(words: list, lowered: List[str], ends: List[int], i: int):
+    # returns the position in the text of the page of the char at i in the text
+    # without white-space, words are the matches of __NON_WHITESPACE, lowered are
+    # the words in lower case and ends are the end positions of lowered words
+    index = bisect.bisect_right(ends, i)
+    offset = i - (ends[index] - len(lowered[index]))
+    word = words[index].group()
+    if len(lowered[index]) != len(word):
+        # a char becomes more than one char in lower case (e.g. U+0130)
+        for position, char in enumerate(word):
+            offset = offset - len(char.lower())
+            if offset < 0:
+                return words[index].start() + position
+
+    return words[index].start() + offset
 
 
-def convert_ligatures(text: str) -> str:
+def __retrieve_spaces(page_text: str, title_without_space: str) -> str:
     """
-    converts latin ligatures (ff, fi, fl, ffi, ffl, ft, st) to individual chars
-    see: Unicode Alphabetic Presentation Forms
-    https://unicode.org/charts/PDF/UFB00.pdf
+    returns the title with the white-space in the text of the page
+    the title is searched (ignoring case) in the text of the page without white-space,
+    and the text of the page where it is found is returned with every white-space
+    sequence replaced by a space
+    returns empty string if the title is not found
     """
-    converted = []
-    for single_character in text:
-        ch_as_utf8 = bytes(single_character, "utf-8")
-        if ch_as_utf8 == b"\xef\xac\x80":
-            converted.append("f")
-            converted.append("f")
-
-        elif ch_as_utf8 == b"\xef\xac\x81":
-            converted.append("f")
-            converted.append("i")
-
-        elif ch_as_utf8 == b"\xef\xac\x82":
-            converted.append("f")
-            converted.append("l")
-
-        elif ch_as_utf8 == b"\xef\xac\x83":
-            converted.append("f")
-            converted.append("f")
-            converted.append("i")
-
-        elif ch_as_utf8 == b"\xef\xac\x84":
-            converted.append("f")
-            converted.append("f")
-            converted.append("l")
-
-        elif ch_as_utf8 == b"\xef\xac\x85":
-            converted.append("f")
-            converted.append("t")
-
-        elif ch_as_utf8 == b"\xef\xac\x86":
-            converted.append("s")
-            converted.append("t")
+    title = title_without_space.lower()
+    if len(title) == 0:
+        return ""
 
-        else:
-            converted.append(single_character)
+    words = list(__NON_WHITESPACE.finditer(page_text))
+    lowered = [word.group().lower() for word in words]
+    # str.find is linear in the length of the text
+    start = "".join(lowered).find(title)
+    logger.debug("title found at %d in the text of the page", start)
+    if start < 0:
+        return ""
 
-    return "".join(converted)
+    ends = list(itertools.accumulate(map(len, lowered)))
+    first = __get_page_position(words, lowered, ends, start)
+    last = __get_page_position(words, lowered, ends, start + len(title) - 1)
+    return __WHITESPACES.sub(" ", page_text[first : last + 1])
 
 
 def __get_new_file_name(title: str) -> str:
     # Change the title to a more pleasant file name
     logger.info("title for change file name: %s", title)
-    new_name = title.lower()  # Lower case name
-    valid_chars = set(string.ascii_lowercase + string.digits + " ")
-    new_name = "".join(c for c in new_name if c in valid_chars)
-    new_name = new_name.replace(" ", "_") + ".pdf"
+    new_name = get_file_name(title)
     logger.info("new file name: %s", new_name)
     return new_name
 
@@ -281,7 +342,7 @@ def change_file_name(pdf_file: str, title: str) -> str:
 class GetTitleParameters:
     """parameters used by get_title methods"""
 
-    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
     def __init__(
         self,
         use_document_information_dictionary: bool = False,
@@ -293,6 +354,22 @@ class GetTitleParameters:
         eliot_tfs: str = "0",
         openai_model: str = "gpt-4o-mini",
         openai_show_usage: bool = False,
+        openai_text: bool = False,
+        openai_rpm: Optional[int] = None,
+        openai_tpm: Optional[int] = None,
+        openai_timeout: Optional[float] = None,
+        openai_max_retries: Optional[int] = None,
+        max_glyphs: Optional[int] = None,
+        max_operators: Optional[int] = None,
+        max_text_depth: Optional[float] = None,
+        font_cache_size: Optional[int] = None,
+        cache_path: Optional[str] = None,
+        cache_max_size: Optional[int] = None,
+        cache_bypass: bool = False,
+        title_case: bool = False,
+        convert_ligatures: bool = False,  # pylint: disable=redefined-outer-name
+        fold_compatibility: bool = False,
+        collapse_whitespace: bool = False,
     ):
         self.use_document_information_dictionary = use_document_information_dictionary
         self.use_metadata_stream = use_metadata_stream
@@ -303,78 +380,289 @@ class GetTitleParameters:
         self.eliot_tfs = eliot_tfs
         self.openai_model = openai_model
         self.openai_show_usage = openai_show_usage
-
-
-def get_title_from_doc(doc: PDFDocument, params: GetTitleParameters) -> Optional[str]:
-    """get_title_from_doc"""
-
-    metadata_stream_title = get_title_from_metadata_stream(doc)
-    logger.debug("dc:title in metadata streams: %s", metadata_stream_title)
-
-    document_info_dict_title = get_title_from_document_information_dictionary(doc)
-    logger.debug(
-        "Title in document information dictionary: %s", document_info_dict_title
-    )
-
+        # send the text of the blocks at the top of the page (see
+        # get_blocks_text_from_io) to OpenAI instead of uploading the file
+        self.openai_text = openai_text
+        # limits of the OpenAI requests in the process, requests and tokens per
+        # minute, the timeout of a request in seconds and the number of retries
+        # of a failed request, None means no limit or the default of openai
+        self.openai_rpm = openai_rpm
+        self.openai_tpm = openai_tpm
+        self.openai_timeout = openai_timeout
+        self.openai_max_retries = openai_max_retries
+        # extraction budget, the interpretation of the page stops
+        # after max_glyphs glyphs or max_operators operators, and the glyphs below
+        # max_text_depth (fraction of the page height from the top, 0 to 1) are
+        # skipped, None means no limit
+        self.max_glyphs = max_glyphs
+        self.max_operators = max_operators
+        self.max_text_depth = max_text_depth
+        # fonts are cached in a resource manager shared in the process
+        # and reused by the next documents, None means no cache
+        self.font_cache_size = font_cache_size
+        # titles are cached in the file cache_path (None means no cache)
+        # cache_max_size is in bytes (None means no limit)
+        # if cache_bypass is True, the title is not looked up but put to the cache
+        self.cache_path = cache_path
+        self.cache_max_size = cache_max_size
+        self.cache_bypass = cache_bypass
+        # normalization of the title, see normalize.normalize_title
+        # the command line converts the ligatures by default, the API does not
+        self.title_case = title_case
+        self.convert_ligatures = convert_ligatures
+        self.fold_compatibility = fold_compatibility
+        self.collapse_whitespace = collapse_whitespace
+
+
+# pylint: disable=too-many-branches
+def __get_title_from_doc(
+    doc: "PDFDocument", params: GetTitleParameters, result: TitleResult
+) -> None:
+    # pylint: disable=import-outside-toplevel
+    from .metadata import get_title_from_document_information_dictionary
+    from .metadata import get_title_from_metadata_stream
+
+    # metadata sources in priority order
     # metadata streams are the current method
-    if params.use_metadata_stream and metadata_stream_title is not None:
-        logger.info("using the title from metadata stream")
-        return metadata_stream_title
-
     # using document information dictionary is depreceated for title
-    if (
-        params.use_document_information_dictionary
-        and document_info_dict_title is not None
-    ):
-        logger.info("using the title from document information dictionary")
-        return document_info_dict_title
+    metadata_sources = [
+        (
+            SOURCE_METADATA_STREAM,
+            params.use_metadata_stream,
+            get_title_from_metadata_stream,
+        ),
+        (
+            SOURCE_DOCUMENT_INFORMATION_DICTIONARY,
+            params.use_document_information_dictionary,
+            get_title_from_document_information_dictionary,
+        ),
+    ]
+
+    # a source is parsed only if it is used, or to log its title in debug level
+    debug = logger.isEnabledFor(logging.DEBUG)
+    for source, use_source, get_title_from_source in metadata_sources:
+        if use_source or debug:
+            with result.stage(STAGE_METADATA):
+                title = get_title_from_source(doc)
+
+            logger.debug("title in %s: %s", source, title)
+            if use_source and title is not None:
+                logger.info("using the title from %s", source)
+                result.title = title
+                result.source = source
+                return
 
     # pdf may not allow extraction
     if not doc.is_extractable:
         raise PDFTitleException("PDF does not allow extraction")
 
-    device, first_page_text = __get_pdfdevice(
-        doc,
-        params.page_number,
-        params.replace_missing_char,
-        params.translation_heuristic,
-    )
+    device, page = __get_pdfdevice(doc, params, result)
 
-    logger.info("all blocks")
-    for block in device.blocks:
-        logger.info(block)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("all blocks")
+        for block in device.blocks:
+            logger.info(block)
 
     logger.info("algorithm: %s", params.algorithm)
 
-    if params.algorithm == ALGO_ORIGINAL:
-        title = __get_title_by_original_algorithm(device)
+    with result.stage(STAGE_ALGORITHM):
+        if params.algorithm == ALGO_ORIGINAL:
+            title, title_blocks = __get_title_by_original_algorithm(device)
 
-    elif params.algorithm == ALGO_MAX2:
-        title = __get_title_by_max2_algorithm(device)
+        elif params.algorithm == ALGO_MAX2:
+            title, title_blocks = __get_title_by_max2_algorithm(device)
 
-    elif params.algorithm == ALGO_ELIOT:
-        title = __get_title_by_eliot_algorithm(device, params.eliot_tfs)
+        elif params.algorithm == ALGO_ELIOT:
+            title, title_blocks = __get_title_by_eliot_algorithm(
+                device, params.eliot_tfs
+            )
 
-    else:
-        raise PDFTitleException("unsupported ALGO")
+        else:
+            raise PDFTitleException("unsupported ALGO")
 
     logger.info("title before space correction: %s", title)
 
     # Retrieve missing spaces if needed
     # warning: if you use eliot algorithm with multiple tfs
     # this procedure may not work
+    # the layout analysis of the page is needed only for this
+    # and only the text around the title is analyzed
     if " " not in title:
-        title_with_spaces = __retrieve_spaces(first_page_text, title)
+        with result.stage(STAGE_LAYOUT):
+            page_text = __get_page_text(
+                device.rsrcmgr, page, __get_region(device.blocks, title_blocks)
+            )
+
+        with result.stage(STAGE_SPACES):
+            title_with_spaces = __retrieve_spaces(page_text, title)
+
         # the procedure above may return empty string
         # in that case, leave the title as it is
         if len(title_with_spaces) > 0:
             title = title_with_spaces
 
     # Remove duplcate spaces if any are present
-    if "  " in title:
-        title = " ".join(title.split())
+    with result.stage(STAGE_NORMALIZATION):
+        if "  " in title:
+            title = " ".join(title.split())
+
+    result.title = title
+    result.source = params.algorithm
+
+
+def get_title_from_doc(doc: "PDFDocument", params: GetTitleParameters) -> Optional[str]:
+    """get_title_from_doc"""
+    result = TitleResult()
+    __get_title_from_doc(doc, params, result)
+    with result.stage(STAGE_NORMALIZATION):
+        return normalize_title(result.title, params)
+
+
+def __get_blocks_text(device: "PDFDevice") -> str:
+    # the blocks from the top of the page, a block per line as font size and text
+    blocks = device.blocks
+    lines = []
+    length = 0
+    for index in sorted(
+        range(len(blocks)), key=lambda index: (-blocks.ys[index], blocks.xs[index])
+    ):
+        text = " ".join(blocks.get_text(index).split())
+        if len(text) == 0:
+            continue
+
+        line = f"{blocks.font_sizes[index]:.1f}\t{text}"
+        length = length + len(line) + 1
+        if length > OPENAI_TEXT_MAX_CHARS and len(lines) > 0:
+            break
 
-    return title
+        lines.append(line)
+
+    return "\n".join(lines)
+
+
+def get_blocks_text_from_io(
+    pdf_file: io.BufferedReader,
+    params: GetTitleParameters,
+    result: Optional[TitleResult] = None,
+) -> str:
+    """
+    returns the text of the blocks at the top of the page, a block per line as its
+    font size and text separated by a tab, this is sent to OpenAI in text mode
+    """
+    doc = __get_pdfdocument(pdf_file, result)
+    # pdf may not allow extraction
+    if not doc.is_extractable:
+        raise PDFTitleException("PDF does not allow extraction")
+
+    device, _ = __get_pdfdevice(doc, params, result)
+    return __get_blocks_text(device)
+
+
+def get_blocks_text_from_file(pdf_file: str, params: GetTitleParameters) -> str:
+    """returns the text of the blocks, see get_blocks_text_from_io"""
+    with open_pdf_file(pdf_file) as file_reader:
+        return get_blocks_text_from_io(file_reader, params)
+
+
+def __get_title_from_io(
+    pdf_file: io.BufferedReader,
+    params: GetTitleParameters,
+    result: TitleResult,
+) -> None:
+    if params.algorithm == ALGO_OPENAI:
+        # pylint: disable=import-outside-toplevel
+        from .openai_gateway import get_request_options
+        from .openai_gateway import get_title_from_openai, get_title_from_openai_text
+
+        if params.openai_text:
+            text = get_blocks_text_from_io(pdf_file, params, result)
+            logger.info("text sent to OpenAI:\n%s", text)
+            if len(text) > 0:
+                with result.stage(STAGE_OPENAI):
+                    result.title = get_title_from_openai_text(
+                        text,
+                        params.openai_model,
+                        params.openai_show_usage,
+                        get_request_options(params),
+                    )
+
+        else:
+            # the file is uploaded from its current position, it is not read here
+            with result.stage(STAGE_OPENAI):
+                result.title = get_title_from_openai(
+                    pdf_file,
+                    params.openai_model,
+                    params.openai_show_usage,
+                    get_request_options(params),
+                )
+
+        result.source = ALGO_OPENAI
+
+    else:
+        __get_title_from_doc(__get_pdfdocument(pdf_file, result), params, result)
+
+    # the title is normalized before it is put to the cache
+    with result.stage(STAGE_NORMALIZATION):
+        result.title = normalize_title(result.title, params)
+
+
+def __get_title_result_from_io(
+    pdf_file: io.BufferedReader,
+    params: GetTitleParameters,
+    result: TitleResult,
+) -> TitleResult:
+    if params.cache_path is None:
+        __get_title_from_io(pdf_file, params, result)
+        return result
+
+    # pylint: disable=import-outside-toplevel
+    from .cache import get_cache_key, get_file_digest, get_title_cache
+
+    with result.stage(STAGE_CACHE):
+        title_cache = get_title_cache(params.cache_path, params.cache_max_size)
+        key = get_cache_key(get_file_digest(pdf_file), params)
+        (found, title) = (False, None)
+        if not params.cache_bypass:
+            (found, title) = title_cache.get(key)
+
+    if found:
+        logger.info("title found in the cache: %s", title)
+        result.title = title
+        result.source = SOURCE_CACHE
+        return result
+
+    __get_title_from_io(pdf_file, params, result)
+    # no title from OpenAI can be a temporary failure, so it is asked again next time
+    if result.title is None and result.source == ALGO_OPENAI:
+        return result
+
+    with result.stage(STAGE_CACHE):
+        title_cache.put(key, result.title)
+
+    return result
+
+
+def get_title_result_from_io(
+    pdf_file: io.BufferedReader,
+    params: GetTitleParameters,
+) -> TitleResult:
+    """
+    returns the TitleResult, the title, its source and the time spent in every
+    stage of the extraction
+    """
+    return __get_title_result_from_io(pdf_file, params, TitleResult())
+
+
+def get_title_and_source_from_io(
+    pdf_file: io.BufferedReader,
+    params: GetTitleParameters,
+) -> Tuple[Optional[str], str]:
+    """
+    returns the title and its source, a SOURCE_ constant (the title is in the
+    metadata or in the cache) or the algorithm
+    """
+    result = get_title_result_from_io(pdf_file, params)
+    return (result.title, result.source)
 
 
 def get_title_from_io(
@@ -382,12 +670,7 @@ def get_title_from_io(
     params: GetTitleParameters,
 ) -> Optional[str]:
     """get_title_from_io"""
-    if params.algorithm == ALGO_OPENAI:
-        return get_title_from_openai(
-            pdf_file.read(), params.openai_model, params.openai_show_usage
-        )
-
-    return get_title_from_doc(__get_pdfdocument(pdf_file), params)
+    return get_title_result_from_io(pdf_file, params).title
 
 
 def get_title_from_file(
@@ -395,13 +678,290 @@ def get_title_from_file(
     params: GetTitleParameters,
 ) -> Optional[str]:
     """get_title_from_file"""
-    with open(pdf_file, "rb") as file_reader:
-        return get_title_from_io(file_reader, params)
+    return get_title_result_from_file(pdf_file, params).title
+
+
+def get_title_and_source_from_file(
+    pdf_file: str,
+    params: GetTitleParameters,
+) -> Tuple[Optional[str], str]:
+    """returns the title and its source, see get_title_and_source_from_io"""
+    result = get_title_result_from_file(pdf_file, params)
+    return (result.title, result.source)
+
+
+def get_title_result_from_file(
+    pdf_file: str,
+    params: GetTitleParameters,
+    use_mmap: bool = True,
+) -> TitleResult:
+    """
+    returns the TitleResult, see get_title_result_from_io
+    the time spent opening (mapping) the file is the open stage
+    if use_mmap is False, the file is not mapped, see buffer.open_pdf_file
+    """
+    result = TitleResult()
+    with contextlib.ExitStack() as exit_stack:
+        with result.stage(STAGE_OPEN):
+            file_reader = exit_stack.enter_context(open_pdf_file(pdf_file, use_mmap))
+
+        return __get_title_result_from_io(file_reader, params, result)
+
+
+def get_title_result_from_bytes(pdf_data, params: GetTitleParameters) -> TitleResult:
+    """
+    returns the TitleResult, see get_title_result_from_io
+    pdf_data is bytes or any object supporting the buffer protocol (e.g. bytearray,
+    memoryview, mmap), it is not copied
+    """
+    with BufferReader(pdf_data) as buffer_reader:
+        return get_title_result_from_io(buffer_reader, params)
+
+
+def get_title_and_source_from_bytes(
+    pdf_data, params: GetTitleParameters
+) -> Tuple[Optional[str], str]:
+    """returns the title and its source, see get_title_result_from_bytes"""
+    result = get_title_result_from_bytes(pdf_data, params)
+    return (result.title, result.source)
+
+
+def get_title_from_bytes(pdf_data, params: GetTitleParameters) -> Optional[str]:
+    """returns the title, see get_title_result_from_bytes"""
+    return get_title_result_from_bytes(pdf_data, params).title
+
+
+def configure_logging(verbose: int) -> int:
+    """
+    configures logging for the command line, verbose is the number of -v arguments
+    returns the logging level of pdftitle
+    """
+    # set default level to warning
+    logging_format = "%(levelname)s/%(filename)s: %(message)s"
+    logging.basicConfig(level=logging.WARNING, format=logging_format)
+    # set the level of `pdftitle` to what is requested
+    logging_level = logging.WARNING
+    if verbose == 1:
+        logging_level = logging.INFO
+
+    elif verbose >= 2:
+        logging_level = logging.DEBUG
+
+    logging.getLogger("pdftitle").setLevel(logging_level)
+    return logging_level
+
+
+def __get_params_from_args(args: argparse.Namespace) -> GetTitleParameters:
+    # prepare eliot_tfs
+    eliot_tfs = None
+    if args.algo == ALGO_ELIOT:
+        logger.info("args.eliot_tfs: %s", args.eliot_tfs)
+        eliot_tfs = args.eliot_tfs.split(",")
+        logger.info("eliot_tfs: %s", eliot_tfs)
+        # convert to list of ints
+        eliot_tfs = list(map(int, eliot_tfs))
+        logger.info("final eliot_tfs: %s", eliot_tfs)
 
+    else:
+        eliot_tfs = [0]
+
+    return GetTitleParameters(
+        use_document_information_dictionary=(
+            args.use_metadata or args.use_document_information_dictionary
+        ),
+        use_metadata_stream=args.use_metadata or args.use_metadata_stream,
+        page_number=args.page_number,
+        replace_missing_char=args.replace_missing_char,
+        translation_heuristic=args.translation_heuristic,
+        algorithm=args.algo,
+        eliot_tfs=eliot_tfs,
+        openai_model=args.openai_model,
+        openai_show_usage=args.openai_show_usage,
+        openai_text=args.openai_text,
+        openai_rpm=args.openai_rpm,
+        openai_tpm=args.openai_tpm,
+        openai_timeout=args.openai_timeout,
+        openai_max_retries=args.openai_max_retries,
+        max_glyphs=args.max_glyphs,
+        max_operators=args.max_operators,
+        max_text_depth=args.max_text_depth,
+        font_cache_size=args.font_cache_size,
+        cache_path=__get_cache_path(args),
+        cache_max_size=args.cache_max_size,
+        cache_bypass=args.cache_bypass,
+        title_case=args.title_case,
+        convert_ligatures=not args.do_not_convert_ligatures,
+        fold_compatibility=args.fold_compatibility,
+        collapse_whitespace=args.collapse_whitespace,
+    )
+
+
+def __get_cache_path(args: argparse.Namespace) -> Optional[str]:
+    # --cache without a file is the default file, cache module is imported only then
+    if args.cache is True:
+        # pylint: disable=import-outside-toplevel
+        from .cache import get_default_cache_path
+
+        return get_default_cache_path()
 
-# pylint: disable=too-many-statements, too-many-branches
+    return args.cache
+
+
+def __print_record(args: argparse.Namespace, params: GetTitleParameters, result) -> int:
+    # prints the result (a BatchResult) as a JSON line, returns 1 if there is no title
+    record = {
+        "path": result.path,
+        "title": None,
+        "source": result.source,
+        # the page is used only by the algorithms other than openai
+        # and by openai in text mode (also with the Batch API)
+        "page": (
+            params.page_number
+            if result.source in (ALGO_ORIGINAL, ALGO_MAX2, ALGO_ELIOT)
+            or (
+                result.source == ALGO_OPENAI
+                and (params.openai_text or args.openai_batch is not None)
+            )
+            else None
+        ),
+        "elapsed": None if result.elapsed is None else round(result.elapsed, 6),
+        "error_class": result.error_class,
+        "error": result.error,
+    }
+    if args.timings:
+        record["timings"] = {
+            stage: [round(wall, 6), round(cpu, 6)]
+            for stage, (wall, cpu) in (result.timings or {}).items()
+        }
+        # an error result has no timings and no counters, both are empty then
+        record["counters"] = result.counters or {}
+
+    retval = 1
+    if result.title is not None:
+        record["title"] = result.title
+        retval = 0
+        if args.change_name:
+            try:
+                record["new_path"] = change_file_name(result.path, record["title"])
+            except PDFTitleException as exception:
+                record["error_class"] = type(exception).__name__
+                record["error"] = str(exception)
+                retval = 1
+
+    # every record is written immediately for the consumers reading the output
+    print(json.dumps(record), flush=True)
+    return retval
+
+
+# pylint: disable=too-many-branches
+def __run_batch(args: argparse.Namespace) -> int:
+    # batch module is imported here because it imports this module
+    # pylint: disable=import-outside-toplevel,cyclic-import
+    from .batch import get_titles_from_files, iter_pdf_files, read_file_list
+
+    jobs = args.jobs
+    if args.pdf is not None:
+        # a single file with --format jsonl
+        pdf_files = iter([args.pdf])
+        jobs = 1
+
+    else:
+        pdf_files = iter_pdf_files(args.batch or [])
+
+    if args.files_from is not None:
+        pdf_files = itertools.chain(
+            pdf_files, iter_pdf_files(read_file_list(args.files_from, args.null))
+        )
+
+    # the result is 1 if title cannot be found for any of the files
+    retval = 0
+    params = __get_params_from_args(args)
+    # the usage of all OpenAI requests is printed at the end (to stderr)
+    # instead of before every title, not to be mixed with the output
+    show_usage = params.openai_show_usage
+    params.openai_show_usage = False
+    if args.openai_batch is not None:
+        # pylint: disable=import-outside-toplevel,cyclic-import
+        from .openai_batch import get_titles_from_files_openai_batch
+
+        results = get_titles_from_files_openai_batch(
+            pdf_files, params, args.openai_batch, jobs, args.openai_batch_interval
+        )
+
+    else:
+        results = get_titles_from_files(pdf_files, params, jobs)
+
+    for result in results:
+        if args.format == FORMAT_JSONL:
+            retval = max(retval, __print_record(args, params, result))
+
+        elif result.error is not None:
+            print(
+                f"{result.path}: {result.error_class}: {result.error}",
+                file=sys.stderr,
+            )
+            retval = 1
+
+        elif result.title is None:
+            print(f"{result.path}: no title found", file=sys.stderr)
+            retval = 1
+
+        else:
+            title = result.title
+            if args.change_name:
+                try:
+                    title = change_file_name(result.path, title)
+                except PDFTitleException as exception:
+                    print(f"{result.path}: {exception}", file=sys.stderr)
+                    retval = 1
+                    continue
+
+            print(f"{result.path}\t{title}")
+
+    if show_usage:
+        # pylint: disable=import-outside-toplevel
+        from .openai_gateway import format_openai_usage, get_openai_usage
+
+        print(
+            f"OpenAI usage: {format_openai_usage(get_openai_usage())}", file=sys.stderr
+        )
+
+    return retval
+
+
+class _VersionAction(argparse.Action):
+    # argparse version action, but the version is found only if --version is given
+    # importlib.metadata takes a considerable part of the start up time
+
+    def __init__(self, option_strings, dest, **kwargs):
+        super().__init__(
+            option_strings,
+            dest,
+            nargs=0,
+            default=argparse.SUPPRESS,
+            help="show program's version number and exit",
+            **kwargs,
+        )
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        # pylint: disable=import-outside-toplevel
+        from importlib.metadata import version
+
+        print(version("pdftitle"))
+        parser.exit()
+
+
+# pylint: disable=too-many-statements, too-many-branches, too-many-locals
 def run() -> None:
     """run command line"""
+    # pdftitle serve has its own arguments
+    if sys.argv[1:2] == ["serve"]:
+        # server module is imported here because it imports this module
+        # pylint: disable=import-outside-toplevel,cyclic-import
+        from .server import serve
+
+        return serve(sys.argv[2:])
+
     try:
         # use parameters for default values to have them at a single place
         params = GetTitleParameters()
@@ -412,14 +972,61 @@ def run() -> None:
         )
         parser.add_argument(
             "--version",
-            action="version",
-            version=version("pdftitle"),
+            action=_VersionAction,
         )
         parser.add_argument(
             "-p",
             "--pdf",
             help="pdf file to extract title",
-            required=True,
+            required=False,
+        )
+        parser.add_argument(
+            "-b",
+            "--batch",
+            nargs="+",
+            metavar="PATH",
+            help="pdf files or directories (searched recursively for .pdf files) "
+            + "to extract titles in batch mode",
+            required=False,
+        )
+        parser.add_argument(
+            "--files-from",
+            metavar="FILE",
+            help="read the pdf files to extract titles in batch mode from FILE, "
+            + "one per line, use - for stdin",
+            required=False,
+        )
+        parser.add_argument(
+            "-0",
+            "--null",
+            action="store_true",
+            help="the pdf files in --files-from are separated by NUL not newline",
+            default=False,
+        )
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            help="number of worker processes in batch mode "
+            + "(default is the number of CPUs)",
+            required=False,
+            default=None,
+        )
+        parser.add_argument(
+            "--format",
+            help="output format, text (default) prints only the title, "
+            + "jsonl prints a JSON object per file with the path, title, source, "
+            + "page, elapsed time (seconds) and error as soon as the file is processed",
+            required=False,
+            default=FORMAT_TEXT,
+            choices=[FORMAT_TEXT, FORMAT_JSONL],
+        )
+        parser.add_argument(
+            "--timings",
+            help="add the time (wall and cpu in seconds) spent in every stage "
+            + "of the extraction and the counters (e.g. glyphs) to jsonl output",
+            action="store_true",
+            default=False,
         )
         parser.add_argument(
             "-c",
@@ -434,6 +1041,20 @@ def run() -> None:
             action="store_true",
             default=False,
         )
+        parser.add_argument(
+            "--fold-compatibility",
+            help="replace Unicode compatibility characters like full-width letters "
+            + "with their equivalents (NFKC)",
+            action="store_true",
+            default=params.fold_compatibility,
+        )
+        parser.add_argument(
+            "--collapse-whitespace",
+            help="replace the whitespace runs in the title with a single space, "
+            + "also in the titles from the metadata",
+            action="store_true",
+            default=params.collapse_whitespace,
+        )
         parser.add_argument(
             "-l",
             "--list-blocks",
@@ -441,6 +1062,12 @@ def run() -> None:
             help="list the found blocks",
             default=False,
         )
+        parser.add_argument(
+            "--dump-objects",
+            action="store_true",
+            help="print all the objects in the pdf file (for diagnostics)",
+            default=False,
+        )
         parser.add_argument(
             "-t",
             "--title-case",
@@ -473,6 +1100,62 @@ def run() -> None:
             default=params.openai_model,
             choices=["gpt-4o", "gpt-4o-mini"],
         )
+        parser.add_argument(
+            "--openai-text",
+            help="send the text at the top of the page with the font sizes "
+            + "to OpenAI instead of uploading the pdf file",
+            required=False,
+            action="store_true",
+            default=params.openai_text,
+        )
+        parser.add_argument(
+            "--openai-batch",
+            metavar="STATE_FILE",
+            help="ask the titles in batch mode with OpenAI Batch API "
+            + "(the text at the top of the page like --openai-text), "
+            + "the job is saved in STATE_FILE and continued if it is interrupted",
+            required=False,
+            default=None,
+        )
+        parser.add_argument(
+            "--openai-batch-interval",
+            help="check the status of the batches every this many seconds "
+            + "(default is 30)",
+            required=False,
+            type=float,
+            default=30,
+        )
+        parser.add_argument(
+            "--openai-rpm",
+            help="send at most this many requests per minute to OpenAI "
+            + "(in batch mode the requests of all jobs are limited together)",
+            required=False,
+            type=int,
+            default=params.openai_rpm,
+        )
+        parser.add_argument(
+            "--openai-tpm",
+            help="use at most this many tokens per minute of OpenAI",
+            required=False,
+            type=int,
+            default=params.openai_tpm,
+        )
+        parser.add_argument(
+            "--openai-timeout",
+            help="timeout of a request to OpenAI in seconds",
+            required=False,
+            type=float,
+            default=params.openai_timeout,
+        )
+        parser.add_argument(
+            "--openai-max-retries",
+            help="retry a failed request to OpenAI (e.g. 429 or 5xx) "
+            + "this many times with Retry-After or exponential backoff "
+            + "(with --openai-text every retry is limited by --openai-rpm)",
+            required=False,
+            type=int,
+            default=params.openai_max_retries,
+        )
         parser.add_argument(
             "--openai-show-usage",
             help="output OpenAI usage/cost before the title",
@@ -519,6 +1202,71 @@ def run() -> None:
             type=int,
             default=params.page_number,
         )
+        parser.add_argument(
+            "--max-glyphs",
+            help="stop interpreting the page after this many glyphs",
+            required=False,
+            type=int,
+            default=params.max_glyphs,
+        )
+        parser.add_argument(
+            "--max-operators",
+            help="stop interpreting the page after this many operators",
+            required=False,
+            type=int,
+            default=params.max_operators,
+        )
+        parser.add_argument(
+            "--max-text-depth",
+            help="skip the glyphs below this fraction of the page height "
+            + "from the top (0 to 1)",
+            required=False,
+            type=float,
+            default=params.max_text_depth,
+        )
+        parser.add_argument(
+            "--font-cache-size",
+            help="cache this many fonts and reuse them for the next files, "
+            + "useful in batch mode when the files use the same fonts",
+            required=False,
+            type=int,
+            default=params.font_cache_size,
+        )
+        parser.add_argument(
+            "--cache",
+            help="cache the titles in this file and use them if the same file "
+            + "is processed again with the same options, "
+            + "default file is $XDG_CACHE_HOME/pdftitle/titles.sqlite3 "
+            + "(or ~/.cache/pdftitle/titles.sqlite3)",
+            metavar="CACHE_FILE",
+            nargs="?",
+            # the default file, see __get_cache_path
+            const=True,
+            required=False,
+            default=params.cache_path,
+        )
+        parser.add_argument(
+            "--cache-max-size",
+            help="remove the least recently used titles "
+            + "if the cache is larger than this (bytes)",
+            required=False,
+            type=int,
+            default=params.cache_max_size,
+        )
+        parser.add_argument(
+            "--cache-bypass",
+            help="do not use the titles in the cache, but update the cache",
+            action="store_true",
+            required=False,
+            default=params.cache_bypass,
+        )
+        parser.add_argument(
+            "--cache-clear",
+            help="remove all titles from the cache",
+            action="store_true",
+            required=False,
+            default=False,
+        )
         parser.add_argument(
             "--translation-heuristic",
             help="enable translation heuristic",
@@ -527,21 +1275,53 @@ def run() -> None:
             default=params.translation_heuristic,
         )
         args = parser.parse_args()
-        # configure logging
-        # set default level to warning
-        logging_format = "%(levelname)s/%(filename)s: %(message)s"
-        logging.basicConfig(level=logging.WARNING, format=logging_format)
-        # set the level of `pdftitle` to what is requested
-        logging_level = logging.WARNING
-        if args.verbose == 1:
-            logging_level = logging.INFO
-
-        elif args.verbose >= 2:
-            logging_level = logging.DEBUG
-
-        logging.getLogger("pdftitle").setLevel(logging_level)
+        configure_logging(args.verbose)
         logger.info(args)
 
+        batch_mode = args.batch is not None or args.files_from is not None
+        # --cache-clear can be used alone or before processing the files
+        if args.cache_clear:
+            # pylint: disable=import-outside-toplevel
+            from .cache import TitleCache, get_default_cache_path
+
+            title_cache = TitleCache(__get_cache_path(args) or get_default_cache_path())
+            title_cache.clear()
+            title_cache.close()
+            if args.pdf is None and not batch_mode:
+                return 0
+
+        if args.pdf is None and not batch_mode:
+            parser.error(
+                "one of the arguments -p/--pdf -b/--batch --files-from is required"
+            )
+
+        if args.pdf is not None and batch_mode:
+            parser.error("argument -p/--pdf: not allowed in batch mode")
+
+        if args.list_blocks and batch_mode:
+            parser.error("argument -l/--list-blocks: not allowed in batch mode")
+
+        if args.dump_objects and batch_mode:
+            parser.error("argument --dump-objects: not allowed in batch mode")
+
+        if (args.list_blocks or args.dump_objects) and args.format != FORMAT_TEXT:
+            parser.error("argument --format: only text is allowed")
+
+        if args.openai_batch is not None and not batch_mode:
+            parser.error("argument --openai-batch: only allowed in batch mode")
+
+        if args.openai_batch is not None and args.algo != ALGO_OPENAI:
+            parser.error("argument --openai-batch: only allowed with -a openai")
+
+        for name in ("jobs", "openai_rpm", "openai_tpm"):
+            if getattr(args, name) is not None and getattr(args, name) < 1:
+                parser.error(
+                    f"argument --{name.replace('_', '-')}: should be at least 1"
+                )
+
+        if args.timings and args.format != FORMAT_JSONL:
+            parser.error("argument --timings: only allowed with --format jsonl")
+
         # list blocks if -l is given
         # this is called early because there is no need to support this with algorithms
         # and no API function needed
@@ -552,53 +1332,37 @@ def run() -> None:
                 if not doc.is_extractable:
                     raise PDFTitleException("PDF does not allow extraction")
 
-                device, _ = __get_pdfdevice(
-                    doc,
-                    params.page_number,
-                    params.replace_missing_char,
-                    params.translation_heuristic,
-                )
+                device, _ = __get_pdfdevice(doc, params)
 
                 # this is for formatting properly the output
                 max_num_int_digits = None
-                for block in sorted(device.blocks, key=lambda x: x[1], reverse=True):
-                    font_size = block[1]
+                blocks = device.blocks
+                for index in sorted(
+                    range(len(blocks)),
+                    key=blocks.font_sizes.__getitem__,
+                    reverse=True,
+                ):
+                    font_size = blocks.font_sizes[index]
                     if max_num_int_digits is None:
                         max_num_int_digits = max(1, len(str(int(font_size))))
-                    str_array = block[4]
                     format_str = f"%0{4+max_num_int_digits}.3f: %s"
-                    print(format_str % (font_size, "".join(str_array).strip()))
+                    print(format_str % (font_size, blocks.get_text(index).strip()))
 
-        else:
-            # prepare eliot_tfs
-            eliot_tfs = None
-            if args.algo == ALGO_ELIOT:
-                logger.info("args.eliot_tfs: %s", args.eliot_tfs)
-                eliot_tfs = args.eliot_tfs.split(",")
-                logger.info("eliot_tfs: %s", eliot_tfs)
-                # convert to list of ints
-                eliot_tfs = list(map(int, eliot_tfs))
-                logger.info("final eliot_tfs: %s", eliot_tfs)
+        # dump objects if --dump-objects is given
+        elif args.dump_objects:
+            with open(args.pdf, "rb") as pdf_file:
+                for objid, obj in iter_pdf_objects(__get_pdfdocument(pdf_file)):
+                    if isinstance(obj, dict):
+                        print(f"pdfobj {objid}: {obj.get('Type')} {obj}")
 
-            else:
-                eliot_tfs = [0]
-
-            title = get_title_from_file(
-                args.pdf,
-                GetTitleParameters(
-                    use_document_information_dictionary=(
-                        args.use_metadata or args.use_document_information_dictionary
-                    ),
-                    use_metadata_stream=args.use_metadata or args.use_metadata_stream,
-                    page_number=args.page_number,
-                    replace_missing_char=args.replace_missing_char,
-                    translation_heuristic=args.translation_heuristic,
-                    algorithm=args.algo,
-                    eliot_tfs=eliot_tfs,
-                    openai_model=args.openai_model,
-                    openai_show_usage=args.openai_show_usage,
-                ),
-            )
+                    else:
+                        print(f"pdfobj {objid}: {type(obj).__name__} {obj}")
+
+        elif batch_mode or args.format == FORMAT_JSONL:
+            return __run_batch(args)
+
+        else:
+            title = get_title_from_file(args.pdf, __get_params_from_args(args))
 
             logger.info("title: :%s", title)
 
@@ -606,18 +1370,6 @@ def run() -> None:
             if title is None:
                 return 1
 
-            # use title case if asked for
-            if args.title_case:
-                logger.info("before title case: %s", title)
-                title = title.title()
-                logger.info("after title case: %s", title)
-
-            # convert ligatures unless disabled
-            if not args.do_not_convert_ligatures:
-                logger.info("before convert ligatures: %s", title)
-                title = convert_ligatures(title)
-                logger.info("after convert ligatures: %s", title)
-
             # change file name if -c is given
             if args.change_name:
                 new_name = change_file_name(args.pdf, title)
@@ -0,0 +1,107 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+rate limiter of the OpenAI requests
+RateLimiter has two token buckets, requests per minute and tokens per minute,
+refilled continuously. A request reserves one request and its estimated tokens,
+the buckets can go below zero, then the request waits until they are refilled.
+So the waiting requests are served in the order they are reserved, and the
+reservation is corrected when the actual tokens are known.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+
+class RateLimiter:
+    """requests per minute (rpm) and tokens per minute (tpm) limiter"""
+
+    def __init__(
+        self,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        # None means no limit, clock returns the time in seconds (e.g. for tests)
+        if rpm is not None and rpm < 1:
+            raise ValueError("rpm should be at least 1")
+
+        if tpm is not None and tpm < 1:
+            raise ValueError("tpm should be at least 1")
+
+        self.rpm = rpm
+        self.tpm = tpm
+        # buckets are full at the start, they are in requests and tokens
+        self.__requests = float(rpm or 0)
+        self.__tokens = float(tpm or 0)
+        self.__clock = clock
+        self.__updated = clock()
+        self.__lock = threading.Lock()
+
+    def __refill(self) -> None:
+        now = self.__clock()
+        elapsed = now - self.__updated
+        self.__updated = now
+        if self.rpm is not None:
+            self.__requests = min(self.rpm, self.__requests + elapsed * self.rpm / 60)
+
+        if self.tpm is not None:
+            self.__tokens = min(self.tpm, self.__tokens + elapsed * self.tpm / 60)
+
+    def reserve(self, tokens: int) -> float:
+        """
+        reserves a request of the estimated tokens
+        returns the seconds to wait before sending the request
+        """
+        with self.__lock:
+            self.__refill()
+            delay = 0.0
+            if self.rpm is not None:
+                self.__requests = self.__requests - 1
+                delay = max(delay, -self.__requests * 60 / self.rpm)
+
+            if self.tpm is not None:
+                # a request larger than tpm would never be sent
+                self.__tokens = self.__tokens - min(tokens, self.tpm)
+                delay = max(delay, -self.__tokens * 60 / self.tpm)
+
+            return delay
+
+    def adjust(self, tokens: int) -> None:
+        """
+        corrects the tokens of a reservation, tokens is the actual tokens used
+        minus the estimated tokens (negative if less tokens are used)
+        """
+        if self.tpm is None:
+            return
+
+        with self.__lock:
+            self.__refill()
+            self.__tokens = min(self.tpm, self.__tokens - tokens)
+
+
+# the rate limiters of the process, see get_rate_limiter
+__RATE_LIMITERS: Dict[Tuple[Optional[int], Optional[int]], RateLimiter] = {}
+__RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(
+    rpm: Optional[int] = None, tpm: Optional[int] = None
+) -> Optional[RateLimiter]:
+    """
+    returns the RateLimiter of rpm and tpm shared in the process
+    (by all threads), or None if there is no limit
+    """
+    if rpm is None and tpm is None:
+        return None
+
+    with __RATE_LIMITERS_LOCK:
+        rate_limiter = __RATE_LIMITERS.get((rpm, tpm))
+        if rate_limiter is None:
+            rate_limiter = RateLimiter(rpm, tpm)
+            __RATE_LIMITERS[(rpm, tpm)] = rate_limiter
+
+        return rate_limiter
@@ -0,0 +1,67 @@
+# SPDX-FileCopyrightText: 2024 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+title extraction result
+TitleResult has the title, its source, the time spent in every stage of the
+extraction and the counters of the work done, to find out why the extraction of a
+file is slow.
+"""
+
+from contextlib import contextmanager
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+
+# stages in the order they are run, not all stages are run for every file
+# e.g. if the title is found in the metadata, the page is not interpreted
+# open is the opening (and mapping) of the file, only when a path is given
+STAGE_OPEN = "open"
+STAGE_CACHE = "cache"
+STAGE_XREF = "xref"
+STAGE_METADATA = "metadata"
+STAGE_PAGE = "page"
+STAGE_INTERPRETATION = "interpretation"
+STAGE_ALGORITHM = "algorithm"
+STAGE_LAYOUT = "layout"
+STAGE_SPACES = "spaces"
+STAGE_NORMALIZATION = "normalization"
+STAGE_OPENAI = "openai"
+
+
+# pylint: disable=too-few-public-methods
+class TitleResult:
+    """result of title extraction with the timings of the stages and the counters"""
+
+    def __init__(self):
+        self.title: Optional[str] = None
+        # a SOURCE_ constant or the algorithm, see get_title_and_source_from_io
+        self.source: Optional[str] = None
+        # stage to (wall time, cpu time) in seconds
+        self.timings: Dict[str, Tuple[float, float]] = {}
+        # operators executed, glyphs drawn, blocks produced, form xobjects entered
+        # and the bytes of the (decoded) content streams interpreted
+        self.counters: Dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """measures the time spent in the with block as the stage name"""
+        # cpu time of the thread, the stages are run in the same thread
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+
+        finally:
+            (stage_wall, stage_cpu) = self.timings.get(name, (0.0, 0.0))
+            self.timings[name] = (
+                stage_wall + time.perf_counter() - wall,
+                stage_cpu + time.thread_time() - cpu,
+            )
+
+    def __repr__(self):
+        return (
+            f"<TitleResult: title={self.title!r}, source={self.source}, "
+            + f"timings={self.timings}, counters={self.counters}>"
+        )
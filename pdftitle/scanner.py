@@ -0,0 +1,300 @@
+# SPDX-FileCopyrightText: 2024 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+This module has a content stream scanner.
+The content stream is split into the operators and the ranges of their operands
+without creating the objects of the operands. The operands are parsed later only for
+the operators used by pdftitle, so the operands of path construction, color and
+marked content operators and the inline images are skipped without creating any
+objects.
+The references are from ISO 32000-2.
+"""
+
+import re
+from typing import Iterator, List, Tuple
+
+from pdfminer.psparser import KWD, LIT, literal_name
+
+
+# 7.2.3 Character set
+__WHITESPACE = rb"\0\t\n\f\r "
+__REGULAR = rb"[^\0\t\n\f\r ()<>\[\]{}/%]"
+
+# any number of operands followed by an operator
+# literal strings with nested (balanced) parentheses are not matched here
+__OPERANDS_AND_OPERATOR = re.compile(
+    rb"(?:"
+    + rb"[\0\t\n\f\r ]+"
+    + rb"|%[^\r\n]*"
+    + rb"|[-+]?(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+)"
+    + rb"|/"
+    + __REGULAR
+    + rb"*"
+    + rb"|<[0-9A-Fa-f\0\t\n\f\r ]*>"
+    + rb"|<<|>>|\[|\]|\{|\}"
+    + rb"|\([^()\\]*(?:\\.[^()\\]*)*\)"
+    + rb"|(?:true|false|null)(?!"
+    + __REGULAR
+    + rb")"
+    + rb")*"
+    + rb"("
+    + __REGULAR
+    + rb"+)?",
+    re.DOTALL,
+)
+
+# a single token of an operand
+__TOKEN = re.compile(
+    rb"[\0\t\n\f\r ]*(?:"
+    + rb"(%[^\r\n]*)"
+    + rb"|([-+]?(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+))"
+    + rb"|/("
+    + __REGULAR
+    + rb"*)"
+    + rb"|<([0-9A-Fa-f\0\t\n\f\r ]*)>"
+    + rb"|(<<|\[|\{)"
+    + rb"|(>>|\]|\})"
+    + rb"|(\()"
+    + rb"|("
+    + __REGULAR
+    + rb"+)"
+    + rb"|(.)"
+    + rb")",
+    re.DOTALL,
+)
+
+__STRING_DELIMITERS = re.compile(rb"[()\\]")
+__NAME_ESCAPE = re.compile(rb"#([0-9A-Fa-f]{2})")
+__OCTAL = re.compile(rb"[0-7]{1,3}")
+__WHITESPACES = re.compile(rb"[" + __WHITESPACE + rb"]+")
+# 8.9.7 Inline images, the end of the image data
+__END_OF_INLINE_IMAGE = re.compile(rb"EI(?:[" + __WHITESPACE + rb"]|$)")
+__ASCII85_FILTER = re.compile(
+    rb"/(?:F|Filter)[\0\t\n\f\r ]*\[?[\0\t\n\f\r ]*/A(?:85|SCII85Decode)"
+)
+
+# 7.3.4.2 Literal strings, Table 3
+__ESCAPES = {
+    ord("n"): b"\n",
+    ord("r"): b"\r",
+    ord("t"): b"\t",
+    ord("b"): b"\b",
+    ord("f"): b"\f",
+    ord("("): b"(",
+    ord(")"): b")",
+    ord("\\"): b"\\",
+}
+
+
+def __skip_string(data: bytes, pos: int) -> int:
+    # pos is after the opening parenthesis, returns the position after the closing
+    depth = 1
+    while True:
+        m = __STRING_DELIMITERS.search(data, pos)
+        if m is None:
+            return len(data)
+
+        pos = m.end()
+        c = data[pos - 1]
+        if c == 0x5C:
+            # escaped char is skipped
+            pos = pos + 1
+
+        elif c == 0x28:
+            depth = depth + 1
+
+        else:
+            depth = depth - 1
+            if depth == 0:
+                return pos
+
+
+def __skip_inline_image(data: bytes, pos: int, image_dict: bytes) -> int:
+    # pos is after ID, returns the position after the image data
+    # the end is searched like pdfminer does, ASCII85 encoded data ends with ~>
+    if __ASCII85_FILTER.search(image_dict) is not None:
+        end = data.find(b"~>", pos)
+        return len(data) if end < 0 else end + 2
+
+    m = __END_OF_INLINE_IMAGE.search(data, pos + 1)
+    if m is None:
+        return len(data)
+
+    # EI is returned as the next operator
+    return m.start()
+
+
+def iter_operators(data: bytes) -> Iterator[Tuple[bytes, int, int]]:
+    """
+    yields (operator, start, end) for every operator in the content stream data
+    data[start:end] has the operands of the operator, see parse_operands
+    """
+    pos = 0
+    start = 0
+    length = len(data)
+    while pos < length:
+        m = __OPERANDS_AND_OPERATOR.match(data, pos)
+        pos = m.end()
+        operator = m.group(1)
+        if operator is not None:
+            end = m.start(1)
+            yield (operator, start, end)
+            if operator == b"ID":
+                pos = __skip_inline_image(data, pos, data[start:end])
+
+            start = pos
+
+        elif pos < length:
+            if data[pos] == 0x28:
+                pos = __skip_string(data, pos + 1)
+
+            else:
+                # not a valid token, e.g. unbalanced > or ), it is skipped
+                pos = pos + 1
+
+
+def __parse_string(data: bytes, pos: int) -> Tuple[bytes, int]:
+    # pos is after the opening parenthesis
+    # returns the string and the position after the closing parenthesis
+    parts = []
+    depth = 1
+    while True:
+        m = __STRING_DELIMITERS.search(data, pos)
+        if m is None:
+            parts.append(data[pos:])
+            return (b"".join(parts), len(data))
+
+        parts.append(data[pos : m.start()])
+        pos = m.end()
+        c = data[pos - 1]
+        if c == 0x5C:
+            if pos >= len(data):
+                continue
+
+            c = data[pos]
+            octal = __OCTAL.match(data, pos)
+            if octal is not None:
+                parts.append(bytes((int(octal.group(), 8) & 0xFF,)))
+                pos = octal.end()
+
+            elif c in __ESCAPES:
+                parts.append(__ESCAPES[c])
+                pos = pos + 1
+
+            elif c == 0x0D and data[pos + 1 : pos + 2] == b"\n":
+                # \ at the end of line, line continues
+                pos = pos + 2
+
+            else:
+                # like pdfminer, the char after \ is omitted
+                # this also handles \ at the end of line (\r or \n)
+                pos = pos + 1
+
+        elif c == 0x28:
+            depth = depth + 1
+            parts.append(b"(")
+
+        else:
+            depth = depth - 1
+            if depth == 0:
+                return (b"".join(parts), pos)
+
+            parts.append(b")")
+
+
+def __parse_name(name: bytes) -> object:
+    # 7.3.5 Name objects
+    if b"#" in name:
+        name = __NAME_ESCAPE.sub(lambda m: bytes((int(m.group(1), 16),)), name)
+
+    try:
+        return LIT(str(name, "utf-8"))
+    except UnicodeDecodeError:
+        return LIT(name)
+
+
+def __end_container(kind: bytes, objs: List) -> object:
+    if kind == b"<<":
+        return {literal_name(k): v for (k, v) in zip(objs[0::2], objs[1::2])}
+
+    return objs
+
+
+# pylint: disable=too-many-branches
+def parse_operands(data: bytes, start: int, end: int) -> List:
+    """
+    returns the operands in data[start:end] as the objects pdfminer creates,
+    numbers as int or float, names as PSLiteral, strings as bytes, arrays as
+    lists, dictionaries as dicts and null as None
+    unlike pdfminer, a hexadecimal string of odd length is padded with 0 (7.3.4.3)
+    """
+    # stack of (kind, objects) of the arrays and dictionaries, the first is the root
+    stack = [(None, [])]
+    objs = stack[-1][1]
+    pos = start
+    while pos < end:
+        m = __TOKEN.match(data, pos, end)
+        if m is None:
+            break
+
+        pos = m.end()
+        kind = m.lastindex
+        if kind is None or kind == 1:
+            # white-space at the end or a comment
+            continue
+
+        token = m.group(kind)
+        if kind == 2:
+            if b"." in token:
+                objs.append(float(token))
+
+            else:
+                objs.append(int(token))
+
+        elif kind == 3:
+            objs.append(__parse_name(token))
+
+        elif kind == 4:
+            digits = __WHITESPACES.sub(b"", token)
+            if len(digits) % 2 == 1:
+                digits = digits + b"0"
+
+            objs.append(bytes.fromhex(digits.decode("ascii")))
+
+        elif kind == 5:
+            stack.append((token, []))
+            objs = stack[-1][1]
+
+        elif kind == 6:
+            if len(stack) > 1:
+                (container_kind, container_objs) = stack.pop()
+                objs = stack[-1][1]
+                objs.append(__end_container(container_kind, container_objs))
+
+        elif kind == 7:
+            (string, pos) = __parse_string(data, pos)
+            objs.append(string)
+
+        elif kind == 8:
+            if token == b"true":
+                objs.append(True)
+
+            elif token == b"false":
+                objs.append(False)
+
+            elif token == b"null":
+                # 7.3.9 Null object, pdfminer's PDFContentParser returns it as an
+                # operator instead
+                objs.append(None)
+
+            else:
+                objs.append(KWD(token))
+
+    # unterminated arrays and dictionaries
+    while len(stack) > 1:
+        (container_kind, container_objs) = stack.pop()
+        stack[-1][1].append(__end_container(container_kind, container_objs))
+
+    return stack[0][1]
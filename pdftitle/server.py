@@ -0,0 +1,460 @@
+# SPDX-FileCopyrightText: 2024 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+HTTP service (pdftitle serve)
+The titles are extracted by a pool of worker processes started (and importing
+pdftitle and pdfminer) once when the service starts, so a request does not pay the
+startup cost of the command line tool.
+
+POST /title with the PDF file as the body extracts its title, the parameters
+(GetTitleParameters fields e.g. algorithm, page_number) are given in the query
+string. POST /title with a JSON object (Content-Type: application/json) extracts the
+title of the file in its path field (a path on the server, only if --allow-paths is
+given), the parameters are given in the same object. The response is a JSON object,
+the title (or null) and its source, or the error. GET /health returns the status.
+
+At most jobs + max_queue requests are accepted at the same time, the others are
+rejected with 503. Requests larger than max_body_size are rejected with 413. On
+SIGTERM or SIGINT, no new requests are accepted and the service stops after the
+requests in progress are completed.
+"""
+
+# the arguments are similar to the command line arguments of pdftitle
+# pylint: disable=duplicate-code
+
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib.metadata import version
+import json
+import logging
+import multiprocessing
+import multiprocessing.pool
+import os
+import signal
+import threading
+from typing import Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from .cache import get_default_cache_path
+from .constants import ALGO_ORIGINAL, ALGO_MAX2, ALGO_ELIOT, ALGO_OPENAI
+from .pdftitle import GetTitleParameters, configure_logging
+from .pdftitle import get_title_and_source_from_bytes
+from .pdftitle import get_title_and_source_from_file
+
+
+logger = logging.getLogger(__name__)
+
+
+def __parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+
+    value = str(value).lower()
+    if value in ("1", "true", "yes"):
+        return True
+
+    if value in ("0", "false", "no"):
+        return False
+
+    raise ValueError(f"not a boolean: {value}")
+
+
+def __parse_algorithm(value) -> str:
+    if value not in (ALGO_ORIGINAL, ALGO_MAX2, ALGO_ELIOT, ALGO_OPENAI):
+        raise ValueError(f"unsupported algorithm: {value}")
+
+    return value
+
+
+def __parse_eliot_tfs(value) -> list:
+    # a list or a string separated by comma like the --eliot-tfs argument
+    if isinstance(value, str):
+        value = value.split(",")
+
+    return list(map(int, value))
+
+
+def __parse_optional(parse):
+    # empty string or null means None (no limit)
+    return lambda value: None if value in ("", None) else parse(value)
+
+
+# GetTitleParameters fields a request can set, and how they are parsed
+# the fields not listed here (e.g. cache) are the options of the service
+__REQUEST_PARAMETERS = {
+    "use_document_information_dictionary": __parse_bool,
+    "use_metadata_stream": __parse_bool,
+    "page_number": int,
+    "replace_missing_char": __parse_optional(str),
+    "translation_heuristic": __parse_bool,
+    "algorithm": __parse_algorithm,
+    "eliot_tfs": __parse_eliot_tfs,
+    "openai_model": str,
+    "openai_text": __parse_bool,
+    "max_glyphs": __parse_optional(int),
+    "max_operators": __parse_optional(int),
+    "max_text_depth": __parse_optional(float),
+    "title_case": __parse_bool,
+    "convert_ligatures": __parse_bool,
+    "fold_compatibility": __parse_bool,
+    "collapse_whitespace": __parse_bool,
+}
+
+
+def get_params_from_request(
+    params: GetTitleParameters, fields: dict
+) -> GetTitleParameters:
+    """
+    returns a copy of params with the fields of the request
+    raises ValueError if a field is unknown or its value is not valid
+    """
+    request_params = GetTitleParameters()
+    vars(request_params).update(vars(params))
+    for name, value in fields.items():
+        parse = __REQUEST_PARAMETERS.get(name)
+        if parse is None:
+            raise ValueError(f"unknown parameter: {name}")
+
+        try:
+            setattr(request_params, name, parse(value))
+        except (TypeError, ValueError) as exception:
+            raise ValueError(f"invalid {name}: {exception}") from exception
+
+    return request_params
+
+
+# this is run in the worker processes
+def get_title_result(
+    pdf_data: Optional[bytes], pdf_path: Optional[str], params: GetTitleParameters
+) -> Tuple[int, dict]:
+    """returns the HTTP status and the response of the title of pdf_data or pdf_path"""
+    try:
+        if pdf_path is None:
+            (title, source) = get_title_and_source_from_bytes(pdf_data, params)
+
+        else:
+            (title, source) = get_title_and_source_from_file(pdf_path, params)
+
+        return (200, {"title": title, "source": source})
+
+    except FileNotFoundError as exception:
+        return (404, {"error_class": type(exception).__name__, "error": str(exception)})
+
+    # like batch mode, one bad PDF should not stop the worker
+    except Exception as exception:  # pylint: disable=broad-exception-caught
+        logger.debug("cannot extract title", exc_info=True)
+        return (422, {"error_class": type(exception).__name__, "error": str(exception)})
+
+
+def __init_worker(logging_level: int) -> None:
+    # the service is stopped by the main process, see serve
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    logging.getLogger("pdftitle").setLevel(logging_level)
+
+
+class TitleRequestHandler(BaseHTTPRequestHandler):
+    """handles the requests of TitleServer"""
+
+    server_version = f"pdftitle/{version('pdftitle')}"
+    # HTTP/1.1 for Expect: 100-continue, but connections are closed after a response
+    protocol_version = "HTTP/1.1"
+    # a client cannot keep a thread (and the shutdown) waiting forever
+    timeout = 60
+
+    def send_json(self, status: int, response: dict) -> None:
+        """sends response as JSON with the HTTP status"""
+        body = json.dumps(response).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status: int, error: str) -> None:
+        """sends the error as JSON with the HTTP status"""
+        self.send_json(status, {"error_class": None, "error": error})
+
+    def handle_expect_100(self) -> bool:
+        # large requests are rejected before the client sends them
+        length = self.headers["Content-Length"]
+        if length is not None and length.isdigit():
+            if int(length) > self.server.max_body_size:
+                self.send_error_json(413, "request is too large")
+                return False
+
+        return super().handle_expect_100()
+
+    # pylint: disable=invalid-name
+    def do_GET(self) -> None:
+        """GET /health"""
+        if urlsplit(self.path).path != "/health":
+            self.send_error_json(404, "not found")
+            return
+
+        self.send_json(200, {"status": "ok"})
+
+    # pylint: disable=invalid-name,too-many-return-statements
+    def do_POST(self) -> None:
+        """POST /title"""
+        url = urlsplit(self.path)
+        if url.path != "/title":
+            self.send_error_json(404, "not found")
+            return
+
+        try:
+            length = int(self.headers["Content-Length"])
+        except (TypeError, ValueError):
+            self.send_error_json(411, "Content-Length is required")
+            return
+
+        if length < 0:
+            self.send_error_json(400, "invalid Content-Length")
+            return
+
+        if length > self.server.max_body_size:
+            self.send_error_json(413, "request is too large")
+            return
+
+        body = self.rfile.read(length)
+        fields = dict(parse_qsl(url.query))
+        pdf_data = None
+        pdf_path = None
+        try:
+            if self.headers.get_content_type() == "application/json":
+                request = json.loads(body)
+                if not isinstance(request, dict):
+                    raise ValueError("request should be a JSON object")
+
+                pdf_path = request.pop("path", None)
+                if not isinstance(pdf_path, str):
+                    raise ValueError("path is required")
+
+                fields.update(request)
+
+            else:
+                pdf_data = body
+
+            params = get_params_from_request(self.server.params, fields)
+
+        except ValueError as exception:
+            self.send_error_json(400, str(exception))
+            return
+
+        if pdf_path is not None:
+            pdf_path = self.server.get_allowed_path(pdf_path)
+            if pdf_path is None:
+                self.send_error_json(403, "path is not allowed")
+                return
+
+        (status, response) = self.server.get_title(pdf_data, pdf_path, params)
+        self.send_json(status, response)
+
+    # pylint: disable=redefined-builtin
+    def log_message(self, format, *args) -> None:
+        logger.info("%s " + format, self.address_string(), *args)
+
+
+# pylint: disable=too-many-instance-attributes
+class TitleServer(ThreadingHTTPServer):
+    """HTTP server extracting the titles with a pool of worker processes"""
+
+    # requests in progress are completed in server_close
+    daemon_threads = False
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        server_address: Tuple[str, int],
+        pool: multiprocessing.pool.Pool,
+        params: GetTitleParameters,
+        jobs: int,
+        max_queue: int = 64,
+        max_body_size: int = 64 << 20,
+        request_timeout: Optional[float] = None,
+        path_root: Optional[str] = None,
+    ):
+        super().__init__(server_address, TitleRequestHandler)
+        self.params = params
+        self.max_body_size = max_body_size
+        # the response is 504 after request_timeout seconds, None means no limit
+        self.request_timeout = request_timeout
+        # the paths in the requests should be in path_root, None means no paths
+        self.path_root = None if path_root is None else os.path.realpath(path_root)
+        self.__pool = pool
+        # a slot is released when the title is extracted, not when the response is
+        # sent (which can be earlier because of request_timeout)
+        self.__slots = threading.BoundedSemaphore(jobs + max_queue)
+
+    def get_allowed_path(self, pdf_path: str) -> Optional[str]:
+        """returns the real path of pdf_path if it is in path_root, otherwise None"""
+        if self.path_root is None:
+            return None
+
+        pdf_path = os.path.realpath(os.path.join(self.path_root, pdf_path))
+        if os.path.commonpath([self.path_root, pdf_path]) != self.path_root:
+            return None
+
+        return pdf_path
+
+    def get_title(
+        self,
+        pdf_data: Optional[bytes],
+        pdf_path: Optional[str],
+        params: GetTitleParameters,
+    ) -> Tuple[int, dict]:
+        """returns the HTTP status and the response, see get_title_result"""
+        # the slot is released by the callbacks below
+        # pylint: disable=consider-using-with
+        if not self.__slots.acquire(blocking=False):
+            return (503, {"error_class": None, "error": "too many requests"})
+
+        try:
+            async_result = self.__pool.apply_async(
+                get_title_result,
+                (pdf_data, pdf_path, params),
+                callback=lambda _: self.__slots.release(),
+                error_callback=lambda _: self.__slots.release(),
+            )
+
+        except ValueError:
+            # the pool is closed
+            self.__slots.release()
+            return (503, {"error_class": None, "error": "service is stopping"})
+
+        try:
+            return async_result.get(self.request_timeout)
+        except multiprocessing.TimeoutError:
+            return (504, {"error_class": None, "error": "timeout"})
+
+
+def serve(argv) -> int:
+    """runs pdftitle serve with the command line arguments argv"""
+    params = GetTitleParameters()
+    parser = argparse.ArgumentParser(
+        prog="pdftitle serve",
+        description="extracts the titles from PDF files over HTTP.",
+        epilog="",
+    )
+    parser.add_argument(
+        "--host",
+        help="address to listen on (default is 127.0.0.1)",
+        default="127.0.0.1",
+    )
+    parser.add_argument(
+        "--port",
+        help="port to listen on (default is 8000, 0 selects a free port)",
+        type=int,
+        default=8000,
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="number of worker processes (default is the number of CPUs)",
+        default=None,
+    )
+    parser.add_argument(
+        "--max-queue",
+        type=int,
+        help="number of requests waiting for a worker, "
+        + "more requests are rejected with 503 (default is 64)",
+        default=64,
+    )
+    parser.add_argument(
+        "--max-body-size",
+        type=int,
+        help="larger requests are rejected with 413 (bytes, default is 64 MiB)",
+        default=64 << 20,
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="respond with 504 if the title is not extracted in this many seconds",
+        default=None,
+    )
+    parser.add_argument(
+        "--allow-paths",
+        metavar="DIR",
+        help="allow the requests to give the path of a file in DIR "
+        + "instead of its content",
+        default=None,
+    )
+    parser.add_argument(
+        "--font-cache-size",
+        help="cache this many fonts in every worker and reuse them for the next files",
+        type=int,
+        default=params.font_cache_size,
+    )
+    parser.add_argument(
+        "--cache",
+        help="cache the titles in this file, "
+        + f"default file is {get_default_cache_path()}",
+        metavar="CACHE_FILE",
+        nargs="?",
+        const=get_default_cache_path(),
+        default=params.cache_path,
+    )
+    parser.add_argument(
+        "--cache-max-size",
+        help="remove the least recently used titles "
+        + "if the cache is larger than this (bytes)",
+        type=int,
+        default=params.cache_max_size,
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        help="enable verbose logging, use -vv for debug logging",
+        default=0,
+    )
+    args = parser.parse_args(argv)
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("argument -j/--jobs: should be at least 1")
+
+    logging_level = configure_logging(args.verbose)
+
+    jobs = args.jobs or os.cpu_count() or 1
+    params.font_cache_size = args.font_cache_size
+    params.cache_path = args.cache
+    params.cache_max_size = args.cache_max_size
+    # the pool is started before the socket is created, so the workers do not have it
+    with multiprocessing.Pool(
+        jobs, initializer=__init_worker, initargs=(logging_level,)
+    ) as pool:
+        server = TitleServer(
+            (args.host, args.port),
+            pool,
+            params,
+            jobs,
+            args.max_queue,
+            args.max_body_size,
+            args.timeout,
+            args.allow_paths,
+        )
+
+        # shutdown waits for serve_forever, so it cannot be called in this thread
+        def stop(signum, _):
+            logger.info("stopping, signal %d", signum)
+            threading.Thread(target=server.shutdown).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        (host, port) = server.server_address[:2]
+        print(f"serving on http://{host}:{port}", flush=True)
+        try:
+            server.serve_forever()
+        finally:
+            # waits for the requests in progress
+            server.server_close()
+
+        pool.close()
+        pool.join()
+
+    logger.info("stopped")
+    return 0